@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Cache disque des pièces jointes Confluence, adressé par contenu.
+
+Les images Gliffy téléchargées sont conservées entre deux exécutions
+(migration relancée, passe --force, téléchargement après migration). Une
+pièce jointe n'est téléchargée à nouveau que si sa version a changé dans
+Confluence.
+
+Organisation sur disque :
+- objects/ab/abcdef... : contenus, nommés par leur SHA-256 (un contenu
+  partagé par plusieurs pages n'est stocké qu'une fois)
+- index.db : base SQLite (page, attachment, version) -> SHA-256, type MIME,
+  et taille / date de dernier accès de chaque contenu
+
+Fonctionnalités :
+- Clé (ID de page, ID d'attachment, version de l'attachment) : une entrée
+  dont la version ne correspond plus est ignorée puis remplacée
+- Vérification du SHA-256 à la lecture (un fichier altéré est écarté)
+- Taille totale bornée, éviction des contenus les moins récemment utilisés (LRU)
+- Revalidation par la version de l'attachment (GET /content/{id}?expand=version)
+- Statistiques (hits, misses, octets économisés, évictions)
+
+Auteur: Sanae Basraoui
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+import requests
+
+
+# Dossier du cache par défaut
+DEFAULT_CACHE_DIR = '.attachment_cache'
+
+# Taille maximale par défaut du cache (octets)
+DEFAULT_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    page_id TEXT NOT NULL,
+    attachment_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    mime_type TEXT,
+    PRIMARY KEY (page_id, attachment_id)
+);
+CREATE INDEX IF NOT EXISTS idx_entries_sha256 ON entries (sha256);
+
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_blobs_last_access ON blobs (last_access);
+"""
+
+
+class AttachmentCache:
+    """Cache LRU des pièces jointes, stockées par SHA-256."""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        """
+        Ouvre (ou crée) le cache.
+
+        Args:
+            cache_dir: Dossier du cache
+            max_bytes: Taille totale maximale des contenus conservés
+        """
+        self.cache_dir = Path(cache_dir)
+        self.objects_dir = self.cache_dir / 'objects'
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max(0, int(max_bytes))
+
+        # Connexion partagée entre threads : les accès sont sérialisés par le verrou
+        self.conn = sqlite3.connect(str(self.cache_dir / 'index.db'), check_same_thread=False)
+        self.lock = threading.RLock()
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.executescript(SCHEMA)
+            self.conn.commit()
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'stored': 0,
+            'evicted': 0,
+            'bytes_saved': 0
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def _object_path(self, sha256: str) -> Path:
+        return self.objects_dir / sha256[:2] / sha256
+
+    def get(self, page_id: str, attachment_id: str, version: int) -> Optional[Tuple[bytes, str]]:
+        """
+        Retourne (contenu, type MIME) si la version en cache est celle demandée, sinon None.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT version, sha256, mime_type FROM entries WHERE page_id = ? AND attachment_id = ?',
+                (str(page_id), str(attachment_id))
+            ).fetchone()
+        if not row or row[0] != version:
+            self.stats['misses'] += 1
+            return None
+
+        sha256, mime_type = row[1], row[2]
+        try:
+            content = self._object_path(sha256).read_bytes()
+        except OSError:
+            content = None
+        if content is None or hashlib.sha256(content).hexdigest() != sha256:
+            # Fichier supprimé ou altéré : l'entrée est retirée et l'attachment sera retéléchargé
+            self._discard(sha256)
+            self.stats['misses'] += 1
+            return None
+
+        with self.lock, self.conn:
+            self.conn.execute('UPDATE blobs SET last_access = ? WHERE sha256 = ?', (time.time(), sha256))
+        self.stats['hits'] += 1
+        self.stats['bytes_saved'] += len(content)
+        return (content, mime_type)
+
+    def put(self, page_id: str, attachment_id: str, version: int, content: bytes, mime_type: str) -> str:
+        """
+        Enregistre une version d'attachment et retourne son SHA-256.
+
+        Le contenu n'est écrit que s'il n'est pas déjà présent ; le cache est
+        ensuite réduit à max_bytes en évinçant les contenus les plus anciens.
+        """
+        sha256 = hashlib.sha256(content).hexdigest()
+        path = self._object_path(sha256)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            # Écriture atomique : un contenu partiellement écrit n'est jamais visible
+            tmp_path = path.with_name(f"{sha256}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(content)
+            os.replace(tmp_path, path)
+
+        with self.lock, self.conn:
+            previous = self.conn.execute(
+                'SELECT sha256 FROM entries WHERE page_id = ? AND attachment_id = ?',
+                (str(page_id), str(attachment_id))
+            ).fetchone()
+            self.conn.execute(
+                'INSERT INTO blobs (sha256, size, last_access) VALUES (?, ?, ?) '
+                'ON CONFLICT(sha256) DO UPDATE SET last_access = excluded.last_access',
+                (sha256, len(content), time.time())
+            )
+            self.conn.execute(
+                'INSERT OR REPLACE INTO entries (page_id, attachment_id, version, sha256, mime_type) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (str(page_id), str(attachment_id), version, sha256, mime_type)
+            )
+            # L'ancienne version n'est plus référencée par aucune entrée : inutile de la conserver
+            stale = previous[0] if previous and previous[0] != sha256 else None
+            if stale and self.conn.execute('SELECT 1 FROM entries WHERE sha256 = ?', (stale,)).fetchone():
+                stale = None
+        if stale:
+            self._discard(stale)
+        self.stats['stored'] += 1
+        self._evict()
+        return sha256
+
+    def fetch(
+        self,
+        page_id: str,
+        attachment_id: str,
+        version: Optional[int],
+        download: Callable[[], Tuple[Optional[bytes], Optional[str], Optional[str]]]
+    ) -> Tuple[Optional[bytes], Optional[str], Optional[str]]:
+        """
+        Retourne l'attachment depuis le cache, sinon le télécharge et l'enregistre.
+
+        Args:
+            version: Version actuelle de l'attachment (None = inconnue, pas de cache)
+            download: Fonction de téléchargement retournant (contenu, type MIME, erreur)
+
+        Returns:
+            Tuple (contenu, type MIME, message d'erreur)
+        """
+        if version is None:
+            return download()
+
+        cached = self.get(page_id, attachment_id, version)
+        if cached:
+            return (cached[0], cached[1], None)
+
+        content, mime_type, error = download()
+        if content:
+            try:
+                self.put(page_id, attachment_id, version, content, mime_type)
+            except (OSError, sqlite3.Error) as e:
+                print(f"     ⚠️  Impossible d'enregistrer l'attachment {attachment_id} dans le cache: {e}")
+        return (content, mime_type, error)
+
+    def _discard(self, sha256: str):
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM entries WHERE sha256 = ?', (sha256,))
+            self.conn.execute('DELETE FROM blobs WHERE sha256 = ?', (sha256,))
+        try:
+            self._object_path(sha256).unlink()
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Supprime les contenus les moins récemment utilisés au-delà de max_bytes."""
+        with self.lock:
+            total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            evicted = []
+            for sha256, size in self.conn.execute('SELECT sha256, size FROM blobs ORDER BY last_access'):
+                if total <= self.max_bytes:
+                    break
+                evicted.append(sha256)
+                total -= size
+            for sha256 in evicted:
+                self._discard(sha256)
+        self.stats['evicted'] += len(evicted)
+
+    def get_stats(self) -> dict:
+        """Retourne les compteurs du cache et sa taille actuelle."""
+        with self.lock:
+            count, size = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs').fetchone()
+        return dict(self.stats, objects=count, size_bytes=size)
+
+    def print_stats(self):
+        """Affiche les statistiques du cache."""
+        stats = self.get_stats()
+        print(f"\n💾 Cache des pièces jointes ({self.cache_dir}):")
+        print(f"  • Trouvées en cache: {stats['hits']} ({stats['bytes_saved'] / 1_000_000:.1f} MB non retéléchargés)")
+        print(f"  • Téléchargées: {stats['misses']}")
+        print(f"  • Évincées: {stats['evicted']}")
+        print(f"  • Taille du cache: {stats['size_bytes'] / 1_000_000:.1f} MB ({stats['objects']} fichier(s))")
+
+
+def get_attachment_version(http, api_base: str, attachment_id: str) -> Optional[int]:
+    """
+    Lit la version actuelle d'un attachment (métadonnées seules, sans le contenu).
+
+    Args:
+        http: RequestExecutor du client Confluence
+        api_base: URL de base de l'API REST
+        attachment_id: ID de l'attachment ('att123' ou '123')
+
+    Returns:
+        Optional[int]: Numéro de version, ou None si l'ID n'est pas un ID
+        d'attachment (nom de fichier Data Center) ou si la lecture échoue
+    """
+    if not attachment_id:
+        return None
+    candidates = [attachment_id]
+    if attachment_id.startswith('att') and attachment_id[3:].isdigit():
+        candidates.append(attachment_id[3:])
+    elif not attachment_id.isdigit():
+        return None
+
+    for candidate in candidates:
+        try:
+            response = http.get(f"{api_base}/content/{candidate}", params={'expand': 'version'})
+        except requests.exceptions.RequestException:
+            return None
+        if response.status_code == 200:
+            try:
+                return int(response.json()['version']['number'])
+            except (ValueError, KeyError, TypeError):
+                return None
+    return None
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Index des pièces jointes des pages Confluence.
+
+Les pièces jointes d'une page sont listées une seule fois par exécution ;
+toutes les recherches suivantes (ID → métadonnées, nom → ID, fichier frère
+.png/.svg/.gliffy d'un diagramme) se font dans l'index en mémoire.
+
+Fonctionnalités :
+- Recherche par ID, avec ou sans le préfixe 'att'
+- Recherche par titre exact et fichiers frères (diagramme 'plan' → 'plan.png')
+- Recherche souple (nom contenu dans le titre) pour le fallback Data Center
+- Version de chaque pièce jointe (revalidation du cache des téléchargements)
+- Index par page conservés pour l'exécution, nombre de pages borné (LRU)
+
+Auteur: Sanae Basraoui
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# Extensions recherchées pour l'image d'un diagramme, par ordre de préférence
+# ('' = titre exact : nom du diagramme sur Data Center)
+IMAGE_EXTENSIONS = ('.png', '.svg', '', '.gliffy')
+
+# Extensions recherchées pour le fichier .gliffy (JSON) d'un diagramme
+GLIFFY_EXTENSIONS = ('', '.gliffy')
+
+# Nombre de pages dont l'index est conservé en mémoire
+DEFAULT_MAX_PAGES = 128
+
+
+def _normalize_id(attachment_id: str) -> str:
+    """ID sans le préfixe 'att' ('att123' et '123' désignent la même pièce jointe)."""
+    attachment_id = str(attachment_id)
+    if attachment_id.startswith('att') and attachment_id[3:].isdigit():
+        return attachment_id[3:]
+    return attachment_id
+
+
+class AttachmentIndex:
+    """Pièces jointes d'une page, indexées par ID et par titre."""
+
+    def __init__(self, attachments: List[Dict]):
+        """
+        Args:
+            attachments: Pièces jointes de la page (résultats de /child/attachment)
+        """
+        self.attachments = attachments
+        self.by_id = {}
+        self.by_title = {}
+        for att in attachments:
+            att_id = att.get('id')
+            if att_id:
+                self.by_id.setdefault(_normalize_id(att_id), att)
+            title = att.get('title')
+            if title:
+                # Le premier du listing l'emporte, comme lors d'un parcours de la liste
+                self.by_title.setdefault(title, att)
+
+    def __len__(self) -> int:
+        return len(self.attachments)
+
+    def get(self, attachment_id: str) -> Optional[Dict]:
+        """Retourne les métadonnées d'une pièce jointe à partir de son ID."""
+        if not attachment_id:
+            return None
+        return self.by_id.get(_normalize_id(attachment_id))
+
+    def version(self, attachment_id: str) -> Optional[int]:
+        """Retourne le numéro de version d'une pièce jointe (None si inconnue)."""
+        att = self.get(attachment_id)
+        if not att:
+            return None
+        try:
+            return int(att['version']['number'])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def find_title(self, name: str, extensions: Tuple[str, ...] = IMAGE_EXTENSIONS) -> Optional[Dict]:
+        """
+        Recherche une pièce jointe par son titre exact ou celui d'un fichier frère.
+
+        'plan', 'plan.gliffy' ou 'plan.png' retrouvent tous 'plan.png' en
+        premier lorsque extensions commence par '.png'.
+
+        Args:
+            name: Nom du diagramme ou titre d'une pièce jointe
+            extensions: Extensions essayées, par ordre de préférence
+
+        Returns:
+            Optional[Dict]: Métadonnées de la pièce jointe trouvée
+        """
+        name = (name or '').strip()
+        if not name:
+            return None
+        bases = [name]
+        lower = name.lower()
+        for ext in IMAGE_EXTENSIONS:
+            if ext and lower.endswith(ext) and len(name) > len(ext):
+                bases.append(name[:-len(ext)])
+                break
+        for ext in extensions:
+            for base in bases:
+                att = self.by_title.get(base + ext)
+                if att:
+                    return att
+        return None
+
+    def search_title(self, name: str, extensions: Tuple[str, ...] = IMAGE_EXTENSIONS) -> Optional[Dict]:
+        """
+        Recherche souple : premier titre contenant le nom et portant l'une des extensions.
+
+        Returns:
+            Optional[Dict]: Métadonnées de la pièce jointe trouvée
+        """
+        name = (name or '').strip().lower()
+        if not name:
+            return None
+        for ext in extensions:
+            if not ext:
+                continue
+            for att in self.attachments:
+                title = att.get('title', '').lower()
+                if name in title and title.endswith(ext):
+                    return att
+        return None
+
+
+class AttachmentIndexes:
+    """Index des pièces jointes par page, construits à la demande (une liste par page et par exécution)."""
+
+    def __init__(self, list_attachments: Callable[[str], List[Dict]], max_pages: int = DEFAULT_MAX_PAGES):
+        """
+        Args:
+            list_attachments: Fonction listant les pièces jointes d'une page
+            max_pages: Nombre de pages dont l'index est conservé
+        """
+        self.list_attachments = list_attachments
+        self.max_pages = max(1, int(max_pages))
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'listed': 0, 'reused': 0}
+
+    def get(self, page_id: str) -> AttachmentIndex:
+        """Retourne l'index d'une page, en listant ses pièces jointes au premier appel."""
+        page_id = str(page_id)
+        with self._lock:
+            index = self._indexes.get(page_id)
+            if index is not None:
+                self._indexes.move_to_end(page_id)
+                self.stats['reused'] += 1
+                return index
+
+        index = AttachmentIndex(self.list_attachments(page_id))
+        with self._lock:
+            self._indexes[page_id] = index
+            self._indexes.move_to_end(page_id)
+            while len(self._indexes) > self.max_pages:
+                self._indexes.popitem(last=False)
+            self.stats['listed'] += 1
+        return index
+
+    def invalidate(self, page_id: str):
+        """Oublie l'index d'une page (pièces jointes ajoutées ou modifiées)."""
+        with self._lock:
+            self._indexes.pop(str(page_id), None)
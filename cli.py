@@ -17,8 +17,13 @@ Auteur: Sanae Basraoui
 import argparse
 import sys
 from pathlib import Path
-from confluence_scanner import ConfluenceScanner
-from gliffy_migrator import GliffyMigrator
+from confluence_base import DISCOVERY_MODES
+from confluence_scanner import ConfluenceScanner, GLIFFY_DETECTION_MODES
+from inventory_store import DEFAULT_INVENTORY_DB
+from gliffy_migrator import GliffyMigrator, DEFAULT_PIPELINE_DEPTH
+from migration_journal import DEFAULT_JOURNAL_FILE
+from attachment_cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_MAX_BYTES
+from confluence_http import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
 from web_converter import run_server
 
 
@@ -33,6 +38,10 @@ def parse_common_args(parser):
     - --url : URL de base de Confluence (requis)
     - --username : Nom d'utilisateur ou email Confluence (requis)
     - --token : Token API Confluence (requis)
+    - --max-retries : Nombre maximal de réessais par requête HTTP
+    - --rate-limit : Débit maximal en requêtes par seconde
+    - --pool-size / --pool-block : Dimensionnement du pool de connexions
+    - --connect-timeout / --read-timeout : Timeouts HTTP par requête
     """
     parser.add_argument(
         '--url',
@@ -49,6 +58,41 @@ def parse_common_args(parser):
         required=True,
         help='Token API Confluence'
     )
+    parser.add_argument(
+        '--max-retries',
+        type=int,
+        default=5,
+        help='Nombre maximal de réessais par requête HTTP (429, 5xx, erreurs réseau) (défaut: 5)'
+    )
+    parser.add_argument(
+        '--rate-limit',
+        type=float,
+        default=50.0,
+        help='Débit maximal en requêtes par seconde ; réduit automatiquement si le serveur renvoie 429/503 (défaut: 50)'
+    )
+    parser.add_argument(
+        '--pool-size',
+        type=int,
+        default=None,
+        help='Nombre de connexions keep-alive conservées par hôte (défaut: max(10, workers))'
+    )
+    parser.add_argument(
+        '--pool-block',
+        action='store_true',
+        help='Attendre qu\'une connexion du pool se libère au lieu d\'ouvrir une connexion supplémentaire'
+    )
+    parser.add_argument(
+        '--connect-timeout',
+        type=float,
+        default=DEFAULT_CONNECT_TIMEOUT,
+        help=f'Timeout de connexion en secondes (défaut: {DEFAULT_CONNECT_TIMEOUT:g})'
+    )
+    parser.add_argument(
+        '--read-timeout',
+        type=float,
+        default=DEFAULT_READ_TIMEOUT,
+        help=f'Timeout de lecture en secondes (défaut: {DEFAULT_READ_TIMEOUT:g})'
+    )
 
 
 def cmd_scan(args):
@@ -68,21 +112,51 @@ def cmd_scan(args):
             - page: ID de page spécifique (optionnel)
             - format: Format d'export (txt/json)
             - output: Nom du fichier de sortie
+            - workers: Nombre de requêtes parallèles
+            - async_concurrency: Requêtes simultanées en mode asyncio (optionnel)
+            - incremental: Ne re-télécharger que les pages modifiées (optionnel)
+            - db: Base SQLite de l'inventaire
+            - gliffy_detection: Détection des Gliffy par recherche CQL ou dans le contenu
+            - max_retries: Nombre maximal de réessais par requête HTTP
+            - rate_limit: Débit maximal en requêtes par seconde
+            - pool_size, pool_block: Configuration du pool de connexions
+            - connect_timeout, read_timeout: Timeouts HTTP
     
     Returns:
         int: Code de retour (0 = succès, 1 = erreur)
     """
+    if args.incremental and args.async_concurrency:
+        print("❌ --incremental n'est pas compatible avec --async-concurrency")
+        return 1
+    
     scanner = ConfluenceScanner(
         confluence_url=args.url,
         username=args.username,
         api_token=args.token,
         spaces=args.spaces,
-        page_id=args.page
+        page_id=args.page,
+        workers=args.workers,
+        max_retries=args.max_retries,
+        rate_limit=args.rate_limit,
+        pool_maxsize=args.pool_size,
+        pool_block=args.pool_block,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        incremental=args.incremental,
+        db_path=args.db,
+        gliffy_detection=args.gliffy_detection
     )
     
-    inventory = scanner.scan()
+    if args.async_concurrency:
+        try:
+            total_pages = scanner.scan_with_asyncio(args.async_concurrency)
+        except ImportError as e:
+            print(e)
+            return 1
+    else:
+        total_pages = scanner.scan()
     
-    if not inventory:
+    if not total_pages:
         print("❌ Aucune page trouvée")
         return 1
     
@@ -93,7 +167,7 @@ def cmd_scan(args):
         # Par défaut, exporter uniquement le TXT dans reports/
         scanner.export_txt()
     
-    print(f"\n✅ {len(inventory)} page(s) inventoriée(s)")
+    print(f"\n✅ {total_pages} page(s) inventoriée(s)")
     return 0
 
 
@@ -113,6 +187,20 @@ def cmd_migrate(args):
             - page: ID de page spécifique (optionnel)
             - report: Nom du fichier de rapport (optionnel)
             - force: Forcer la réinsertion même si déjà présent (optionnel)
+            - journal: Journal des pages traitées
+            - resume: Reprendre la dernière migration interrompue (optionnel)
+            - batch_updates: Une seule mise à jour par page (optionnel)
+            - cache_dir, cache_size, no_cache: Cache des pièces jointes téléchargées
+            - compress_workers: Processus de compression des images
+            - pipeline_depth: Pages préparées à l'avance pendant la compression
+            - quantize_png: Quantification 256 couleurs des PNG trop grands (optionnel)
+            - upload_images: Images jointes aux pages au lieu du base64 (optionnel)
+            - discovery: Découverte des pages par recherche CQL ou parcours complet
+            - workers: Nombre de requêtes parallèles pour la pagination
+            - max_retries: Nombre maximal de réessais par requête HTTP
+            - rate_limit: Débit maximal en requêtes par seconde
+            - pool_size, pool_block: Configuration du pool de connexions
+            - connect_timeout, read_timeout: Timeouts HTTP
     
     Returns:
         int: Code de retour (0 = succès)
@@ -123,7 +211,24 @@ def cmd_migrate(args):
         api_token=args.token,
         spaces=args.spaces,
         page_id=args.page,
-        force=args.force
+        force=args.force,
+        workers=args.workers,
+        max_retries=args.max_retries,
+        rate_limit=args.rate_limit,
+        pool_maxsize=args.pool_size,
+        pool_block=args.pool_block,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        journal_file=args.journal,
+        resume=args.resume,
+        batch_updates=args.batch_updates,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        cache_max_bytes=args.cache_size * 1024 * 1024,
+        compress_workers=args.compress_workers,
+        pipeline_depth=args.pipeline_depth,
+        quantize_images=args.quantize_png,
+        upload_images=args.upload_images,
+        discovery=args.discovery
     )
     
     report = migrator.migrate()
@@ -176,6 +281,11 @@ Exemples d'utilisation:
   # Scanner un espace spécifique
   python cli.py scan --url https://confluence.example.com --username user --token TOKEN --spaces DEV PROD
 
+  # Scanner tout Confluence avec 8 requêtes en parallèle
+  python cli.py scan --url https://confluence.example.com --username user --token TOKEN --workers 8
+  python cli.py scan --url https://confluence.example.com --username user --token TOKEN --async-concurrency 200
+  python cli.py scan --url https://confluence.example.com --username user --token TOKEN --incremental
+
   # Scanner une page spécifique
   python cli.py scan --url https://confluence.example.com --username user --token TOKEN --page 123456
 
@@ -191,6 +301,15 @@ Exemples d'utilisation:
   # Forcer la réinsertion des images (même si déjà présentes)
   python cli.py migrate --url https://confluence.example.com --username user --token TOKEN --spaces DEV --force
 
+  # Reprendre une migration interrompue (pages déjà journalisées ignorées)
+  python cli.py migrate --url https://confluence.example.com --username user --token TOKEN --resume
+
+  # Une seule mise à jour (nouvelle version) par page, quel que soit le nombre de diagrammes
+  python cli.py migrate --url https://confluence.example.com --username user --token TOKEN --spaces DEV --batch-updates
+
+  # Relancer une migration sans cache local des images
+  python cli.py migrate --url https://confluence.example.com --username user --token TOKEN --spaces DEV --force --no-cache
+
   # Lancer l'interface web de conversion
   python cli.py web --host 0.0.0.0 --port 5000
         """
@@ -224,6 +343,35 @@ Exemples d'utilisation:
         default='confluence_inventory',
         help='Nom du fichier de sortie (sans extension) (défaut: confluence_inventory). Le fichier .txt sera dans reports/'
     )
+    scan_parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Nombre de requêtes parallèles (pagination et espaces) (défaut: 1 = séquentiel)'
+    )
+    scan_parser.add_argument(
+        '--async-concurrency',
+        type=int,
+        metavar='N',
+        help='Scanner avec le client asyncio (aiohttp requis) en gardant jusqu\'à N requêtes simultanées (ex: 200)'
+    )
+    scan_parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Ne re-télécharger que les pages modifiées depuis le dernier scan (état conservé dans --db)'
+    )
+    scan_parser.add_argument(
+        '--db',
+        default=DEFAULT_INVENTORY_DB,
+        help=f'Base SQLite de l\'inventaire, écrite au fil du scan (défaut: {DEFAULT_INVENTORY_DB})'
+    )
+    scan_parser.add_argument(
+        '--gliffy-detection',
+        choices=GLIFFY_DETECTION_MODES,
+        default='cql',
+        help='Détection des Gliffy : recherche CQL "macro = gliffy", seul le contenu des pages Gliffy est téléchargé (cql), '
+             'ou lecture du contenu de toutes les pages (body) (défaut: %(default)s)'
+    )
     
     # Commande migrate
     migrate_parser = subparsers.add_parser(
@@ -250,6 +398,72 @@ Exemples d'utilisation:
         action='store_true',
         help='Forcer la réinsertion des images même si elles existent déjà (ignore l\'idempotence)'
     )
+    migrate_parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Nombre de requêtes parallèles pour la pagination (défaut: 1 = séquentiel)'
+    )
+    migrate_parser.add_argument(
+        '--journal',
+        default=DEFAULT_JOURNAL_FILE,
+        help=f'Journal des pages traitées, écrit au fil de la migration (défaut: {DEFAULT_JOURNAL_FILE})'
+    )
+    migrate_parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Reprendre la dernière migration interrompue sans retraiter les pages déjà journalisées'
+    )
+    migrate_parser.add_argument(
+        '--batch-updates',
+        action='store_true',
+        help='Insérer toutes les images d\'une page en une seule mise à jour (un PUT par page au lieu d\'un par diagramme)'
+    )
+    migrate_parser.add_argument(
+        '--cache-dir',
+        default=DEFAULT_CACHE_DIR,
+        help=f'Dossier du cache des images téléchargées, réutilisées tant que leur version ne change pas (défaut: {DEFAULT_CACHE_DIR})'
+    )
+    migrate_parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=DEFAULT_CACHE_MAX_BYTES // (1024 * 1024),
+        help='Taille maximale du cache en MB ; les images les moins récemment utilisées sont évincées (défaut: %(default)s)'
+    )
+    migrate_parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Désactiver le cache des images téléchargées'
+    )
+    migrate_parser.add_argument(
+        '--compress-workers',
+        type=int,
+        default=None,
+        help='Processus de compression des grandes images, en parallèle des téléchargements et mises à jour (défaut: nombre de cœurs, 0 = dans le processus principal)'
+    )
+    migrate_parser.add_argument(
+        '--pipeline-depth',
+        type=int,
+        default=None,
+        help=f'Pages préparées à l\'avance (images téléchargées) pendant la compression ; chacune garde ses images en mémoire (défaut: min(compress-workers, {DEFAULT_PIPELINE_DEPTH}))'
+    )
+    migrate_parser.add_argument(
+        '--quantize-png',
+        action='store_true',
+        help='Réduire les PNG trop grands à une palette de 256 couleurs avant de les redimensionner (adapté aux diagrammes en aplats)'
+    )
+    migrate_parser.add_argument(
+        '--upload-images',
+        action='store_true',
+        help='Joindre les images exportées aux pages et les référencer (<ac:image>) au lieu de les inclure en base64 dans le contenu'
+    )
+    migrate_parser.add_argument(
+        '--discovery',
+        choices=DISCOVERY_MODES,
+        default='cql',
+        help='Pages à traiter : recherche CQL des pages Gliffy, seules celles-ci sont téléchargées (cql), '
+             'ou toutes les pages de chaque espace (scan) (défaut: %(default)s)'
+    )
     
     # Commande web
     web_parser = subparsers.add_parser(
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Client Confluence asynchrone (asyncio) pour les scans à forte concurrence.
+
+Ce module fournit un équivalent asynchrone des lectures de ConfluenceBase,
+construit sur aiohttp. Un seul processus peut ainsi garder plusieurs
+centaines de requêtes en vol sur une grosse instance Cloud, là où les
+threads au-dessus de requests plafonnent rapidement.
+
+Fonctionnalités :
+- AsyncConfluence : get_all_spaces, get_all_pages, get_page_details, get_attachments
+- Recherche des pages Gliffy côté serveur (CQL `macro = gliffy`, iter_gliffy_pages)
+- Concurrence bornée par un sémaphore (nombre de requêtes en vol)
+- Pagination spéculative : plusieurs fenêtres start/limit demandées en parallèle,
+  restituées dans l'ordre des offsets
+- Réessais sur 429/502/503/504 et erreurs réseau, avec Retry-After et backoff
+- Dépendance optionnelle : aiohttp (pip install aiohttp)
+
+Auteur: Sanae Basraoui
+"""
+
+import asyncio
+import random
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from confluence_base import GLIFFY_CQL, FETCH_PROFILES
+from confluence_http import (
+    RETRYABLE_STATUS_CODES,
+    THROTTLE_STATUS_CODES,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    parse_retry_after,
+)
+
+# Essayer d'importer aiohttp pour le client asynchrone
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+
+# Nombre de requêtes en vol par défaut
+DEFAULT_CONCURRENCY = 100
+
+
+class AsyncConfluenceError(Exception):
+    """Erreur d'une requête asynchrone (code HTTP final ou erreur réseau)."""
+
+    def __init__(self, message: str, status: Optional[int] = None, details: str = ''):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+class AsyncConfluence:
+    """
+    Client asynchrone en lecture pour l'API REST de Confluence.
+
+    S'utilise comme gestionnaire de contexte asynchrone :
+
+        async with AsyncConfluence(url, username, token) as client:
+            spaces = await client.get_all_spaces()
+    """
+
+    def __init__(
+        self,
+        confluence_url: str,
+        username: Optional[str],
+        api_token: str,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        prefetch_windows: int = 4,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+    ):
+        """
+        Initialise le client (la session aiohttp est ouverte par `async with`).
+
+        Args:
+            confluence_url: URL de base de Confluence
+            username: Nom d'utilisateur (ou email pour Cloud), None pour un PAT Data Center
+            api_token: Token API ou PAT
+            concurrency: Nombre maximal de requêtes en vol
+            prefetch_windows: Fenêtres de pagination demandées en parallèle par listing
+            max_retries: Nombre maximal de réessais par requête
+            backoff_base: Délai de base du backoff exponentiel (secondes)
+            backoff_max: Délai maximal entre deux tentatives (secondes)
+            connect_timeout: Timeout de connexion (secondes)
+            read_timeout: Timeout de lecture (secondes)
+        """
+        if not AIOHTTP_AVAILABLE:
+            raise ImportError("❌ aiohttp n'est pas installé. Installez-le avec: pip install aiohttp")
+
+        self.confluence_url = confluence_url.rstrip('/')
+        self.concurrency = max(1, int(concurrency))
+        self.prefetch_windows = max(1, int(prefetch_windows))
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = (connect_timeout, read_timeout)
+
+        # Même détection Cloud / Server / Data Center que ConfluenceBase
+        is_cloud = 'atlassian.net' in self.confluence_url.lower()
+        if is_cloud:
+            if not username:
+                raise ValueError("❌ L'adresse email (--username) est obligatoire pour Confluence Cloud.")
+            if '/wiki' in self.confluence_url.lower():
+                self.api_base = f"{self.confluence_url.rstrip('/wiki')}/wiki/rest/api"
+            else:
+                self.api_base = f"{self.confluence_url}/wiki/rest/api"
+        else:
+            self.api_base = f"{self.confluence_url}/rest/api"
+
+        self.headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json'
+        }
+        if username:
+            self.auth = aiohttp.BasicAuth(username, api_token)
+        else:
+            # PAT Data Center seul : authentification Bearer
+            self.auth = None
+            self.headers['Authorization'] = f'Bearer {api_token}'
+
+        self.session = None
+        self._slots = None
+        self._in_flight = 0
+        self.stats = {
+            'requests': 0,
+            'retries': 0,
+            'throttled': 0,
+            'network_errors': 0,
+            'backoff_wait_seconds': 0.0,
+            'max_in_flight': 0,
+        }
+
+    async def __aenter__(self):
+        connect_timeout, read_timeout = self.timeout
+        self.session = aiohttp.ClientSession(
+            auth=self.auth,
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout),
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+        )
+        # Le sémaphore est créé dans la boucle d'événements qui l'utilise
+        self._slots = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+        self.session = None
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Délai avant la prochaine tentative : Retry-After si fourni, sinon backoff avec jitter."""
+        delay = parse_retry_after(retry_after)
+        if delay is not None:
+            return min(self.backoff_max, delay) + random.uniform(0, 0.5)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def _sleep(self, delay: float):
+        if delay > 0:
+            self.stats['backoff_wait_seconds'] += delay
+            await asyncio.sleep(delay)
+
+    async def get_json(self, url: str, params: Optional[Dict] = None) -> Dict:
+        """
+        Exécute un GET et retourne le JSON, avec réessais.
+
+        Le sémaphore n'est tenu que pendant la requête : une tâche en attente
+        de backoff ne consomme pas de place de concurrence.
+
+        Raises:
+            AsyncConfluenceError: code HTTP d'erreur final ou erreur réseau persistante
+        """
+        attempt = 0
+        while True:
+            retry_after = None
+            async with self._slots:
+                self._in_flight += 1
+                self.stats['requests'] += 1
+                self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self._in_flight)
+                try:
+                    async with self.session.get(url, params=params) as response:
+                        status = response.status
+                        if status == 200:
+                            return await response.json(content_type=None)
+                        retry_after = response.headers.get('Retry-After')
+                        details = (await response.text())[:200]
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    self.stats['network_errors'] += 1
+                    if attempt >= self.max_retries:
+                        raise AsyncConfluenceError(f"Erreur réseau: {e}") from e
+                    status = None
+                finally:
+                    self._in_flight -= 1
+
+            if status is not None:
+                if status in THROTTLE_STATUS_CODES:
+                    self.stats['throttled'] += 1
+                if status not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                    raise AsyncConfluenceError(f"HTTP {status}", status=status, details=details)
+
+            self.stats['retries'] += 1
+            await self._sleep(self._backoff_delay(attempt, retry_after))
+            attempt += 1
+
+    async def _fetch_results_window(self, url: str, params: Dict, start: int, limit: int) -> Tuple[List[Dict], Optional[Exception]]:
+        """Récupère une fenêtre de résultats ; retourne (résultats, erreur)."""
+        window_params = dict(params)
+        window_params['start'] = start
+        window_params['limit'] = limit
+        try:
+            data = await self.get_json(url, window_params)
+            return (data.get('results', []), None)
+        except (AsyncConfluenceError, ValueError) as e:
+            return ([], e)
+
+    async def iter_paginated(
+        self,
+        url: str,
+        params: Dict,
+        limit: int = 100,
+        error_message: Optional[str] = None,
+        raise_on_error: bool = False,
+    ) -> AsyncIterator[Dict]:
+        """
+        Parcourt un endpoint paginé (start/limit) de manière asynchrone.
+
+        `prefetch_windows` fenêtres consécutives sont demandées en parallèle
+        puis restituées dans l'ordre des offsets, comme _iter_paginated.
+        Avec raise_on_error, l'erreur est levée au lieu d'arrêter le parcours.
+        """
+        start = 0
+        while True:
+            starts = [start + i * limit for i in range(self.prefetch_windows)]
+            windows = await asyncio.gather(*(
+                self._fetch_results_window(url, params, s, limit) for s in starts
+            ))
+
+            finished = False
+            for batch, error in windows:
+                if error is not None:
+                    if error_message:
+                        self._print_request_error(error_message, error)
+                    if raise_on_error:
+                        raise error
+                    finished = True
+                    break
+                if not batch:
+                    finished = True
+                    break
+                for item in batch:
+                    yield item
+                if len(batch) < limit:
+                    finished = True
+                    break
+
+            if finished:
+                return
+            start = starts[-1] + limit
+
+    def _print_request_error(self, message: str, error: Exception):
+        """Affiche une erreur de requête avec le code HTTP et le détail si disponibles."""
+        print(f"❌ {message}: {error}")
+        if getattr(error, 'details', ''):
+            print(f"   Réponse: {error.details}")
+
+    async def get_all_spaces(self, spaces_filter: Optional[List[str]] = None) -> List[Dict]:
+        """Récupère tous les espaces (filtrés par clé si spaces_filter est fourni)."""
+        url = f"{self.api_base}/space"
+        spaces_filter_set = set(spaces_filter) if spaces_filter else None
+        spaces = []
+        async for space in self.iter_paginated(url, {'expand': 'name,key'}, error_message="Erreur lors de la récupération des espaces"):
+            if spaces_filter_set is None or space.get('key') in spaces_filter_set:
+                spaces.append(space)
+        return spaces
+
+    async def iter_pages(
+        self,
+        space_key: str,
+        include_drafts: bool = True,
+        expand: str = 'body.storage',
+        draft_expand: Optional[str] = None,
+        raise_on_error: bool = False,
+    ) -> AsyncIterator[Dict]:
+        """
+        Parcourt les pages publiées puis les brouillons (dédoublonnés, champs draft_expand) d'un espace.
+
+        Avec raise_on_error, une erreur sur l'un des deux listings est levée
+        (AsyncConfluenceError) au lieu de terminer le parcours.
+        """
+        url = f"{self.api_base}/content"
+        params = {
+            'spaceKey': space_key,
+            'type': 'page',
+            'expand': expand
+        }
+        seen_ids = set()
+
+        async for page in self.iter_paginated(url, params, error_message="Erreur lors de la récupération des pages",
+                                              raise_on_error=raise_on_error):
+            seen_ids.add(page.get('id'))
+            yield page
+
+        if include_drafts:
+            draft_params = dict(params)
+            draft_params['status'] = 'draft'
+            if draft_expand:
+                draft_params['expand'] = draft_expand
+            async for draft in self.iter_paginated(url, draft_params, raise_on_error=raise_on_error):
+                if draft.get('id') not in seen_ids:
+                    seen_ids.add(draft.get('id'))
+                    yield draft
+
+    async def iter_gliffy_pages(
+        self,
+        space_key: str,
+        expand: str = FETCH_PROFILES['gliffy-detect'],
+        raise_on_error: bool = False,
+    ) -> AsyncIterator[Dict]:
+        """Parcourt les pages publiées d'un espace contenant une macro Gliffy (CQL, comme ConfluenceBase.iter_gliffy_pages)."""
+        params = {'cql': f'space = "{space_key}" AND type = page AND {GLIFFY_CQL}', 'expand': expand}
+        async for page in self.iter_paginated(f"{self.api_base}/content/search", params,
+                                              error_message="Erreur lors de la recherche CQL",
+                                              raise_on_error=raise_on_error):
+            yield page
+
+    async def get_all_pages(self, space_key: str, include_drafts: bool = True, expand: str = 'body.storage') -> List[Dict]:
+        """Récupère toutes les pages d'un espace (préférer iter_pages pour les grands espaces)."""
+        return [page async for page in self.iter_pages(space_key, include_drafts, expand)]
+
+    async def get_page_details(self, page_id: str, expand: str = 'body.storage,space,version') -> Optional[Dict]:
+        """Récupère les détails d'une page, None en cas d'erreur."""
+        try:
+            return await self.get_json(f"{self.api_base}/content/{page_id}", {'expand': expand})
+        except (AsyncConfluenceError, ValueError) as e:
+            self._print_request_error(f"Erreur lors de la récupération de la page {page_id}", e)
+            return None
+
+    async def get_attachments(self, page_id: str) -> List[Dict]:
+        """Récupère tous les attachments d'une page."""
+        url = f"{self.api_base}/content/{page_id}/child/attachment"
+        return [attachment async for attachment in self.iter_paginated(url, {})]
+
+    def get_stats(self) -> Dict:
+        """Retourne une copie des statistiques (temps arrondis)."""
+        stats = dict(self.stats)
+        stats['backoff_wait_seconds'] = round(stats['backoff_wait_seconds'], 2)
+        return stats
+
+    def print_stats(self):
+        """Affiche un résumé des statistiques HTTP asynchrones."""
+        stats = self.get_stats()
+        print(f"\n🌐 Statistiques HTTP (asyncio):")
+        print(f"  • Requêtes envoyées: {stats['requests']}")
+        print(f"  • Réessais: {stats['retries']}")
+        print(f"  • Réponses 429/503 (réessayées ou non): {stats['throttled']}")
+        print(f"  • Erreurs réseau (réessayées ou non): {stats['network_errors']}")
+        print(f"  • Attente backoff: {stats['backoff_wait_seconds']}s")
+        print(f"  • Requêtes simultanées (max): {stats['max_in_flight']} / {self.concurrency}")
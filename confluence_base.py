@@ -10,22 +10,131 @@ Fonctionnalités :
 - Gestion de l'authentification via API token
 - Récupération des espaces et pages
 - Support des drafts (brouillons)
+- Envoi de pièces jointes (création ou nouvelle version)
+- Pagination concurrente avec un nombre de workers configurable
+- Itérateurs (iter_spaces, iter_pages) pour traiter les pages au fil de l'eau
+- Profils de champs (FETCH_PROFILES) : chaque opération ne demande que les champs utiles
+- Détection des pages Gliffy côté serveur (CQL `macro = gliffy`)
+- Découverte des pages Gliffy d'un espace (macros, fichiers .gliffy, brouillons)
+  sans télécharger le contenu des autres pages
+- Réessais, backoff et limitation de débit via l'exécuteur HTTP partagé
+- Pool de connexions keep-alive dimensionné selon le nombre de workers
 
 Auteur: Sanae Basraoui
 """
 
 import requests
-from typing import List, Dict, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Dict, Optional, Tuple
+from confluence_http import (
+    RequestExecutor,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    DEFAULT_POOL_MAXSIZE,
+)
+
+
+# Champs étendus (paramètre expand) demandés par chaque opération : le
+# contenu d'une page (body.storage) n'est demandé que lorsqu'il est lu
+FETCH_PROFILES = {
+    # Inventaire : métadonnées et hiérarchie, sans le contenu
+    'inventory-lite': 'version,history,ancestors',
+    # Détection et comptage des macros Gliffy : contenu source seul
+    'gliffy-detect': 'body.storage',
+    # Migration : contenu source et version (mise à jour de la page)
+    'migrate': 'body.storage,version',
+    # Reprise de migration : repérage des pages déjà faites, sans le contenu
+    'migrate-lite': 'version',
+}
+
+# Critère CQL des pages contenant une macro Gliffy (évalué par l'index de recherche)
+GLIFFY_CQL = 'macro = gliffy'
+
+# Type MIME des fichiers de diagramme Gliffy (JSON)
+GLIFFY_MEDIA_TYPE = 'application/gliffy+json'
+
+# Critères CQL des pièces jointes Gliffy, essayés séparément : un critère non
+# supporté par l'instance n'empêche pas les autres (nom 'plan.gliffy' sur Cloud,
+# type MIME pour les diagrammes sans extension de Data Center)
+GLIFFY_ATTACHMENT_CQL = (
+    'title ~ "gliffy"',
+    f'mediaType = "{GLIFFY_MEDIA_TYPE}"',
+)
+
+# Modes de découverte des pages à traiter : recherche CQL des pages Gliffy
+# ou parcours de toutes les pages de l'espace
+DISCOVERY_MODES = ('cql', 'scan')
+
+# Message affiché quand un listing des pages (publiées ou brouillons) échoue
+PAGES_ERROR_MESSAGE = "Erreur lors de la récupération des pages"
+
+
+def is_gliffy_attachment(attachment: Dict) -> bool:
+    """Indique si une pièce jointe est un fichier de diagramme Gliffy (.gliffy ou type MIME Gliffy)."""
+    if attachment.get('title', '').lower().endswith('.gliffy'):
+        return True
+    media_type = (attachment.get('extensions') or {}).get('mediaType') or (attachment.get('metadata') or {}).get('mediaType')
+    return media_type == GLIFFY_MEDIA_TYPE
+
+
+def expand_fields(*names: str) -> str:
+    """
+    Construit la valeur du paramètre expand à partir de profils et de champs.
+    
+    Args:
+        names: Noms de profils (FETCH_PROFILES) ou champs supplémentaires
+    
+    Returns:
+        str: Champs séparés par des virgules, sans doublon
+        (ex: expand_fields('migrate', 'space') -> 'body.storage,version,space')
+    """
+    fields = []
+    for name in names:
+        for field in FETCH_PROFILES.get(name, name).split(','):
+            if field and field not in fields:
+                fields.append(field)
+    return ','.join(fields)
 
 
 class ConfluenceBase:
     """Classe de base pour les opérations Confluence."""
     
-    def __init__(self, confluence_url: str, username: Optional[str], api_token: str):
-        """Initialise la connexion Confluence."""
+    def __init__(
+        self,
+        confluence_url: str,
+        username: Optional[str],
+        api_token: str,
+        workers: int = 1,
+        max_retries: int = 5,
+        rate_limit: float = 50.0,
+        pool_maxsize: Optional[int] = None,
+        pool_block: bool = False,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+    ):
+        """
+        Initialise la connexion Confluence.
+        
+        Args:
+            confluence_url: URL de base de Confluence
+            username: Nom d'utilisateur (ou email pour Cloud), None pour un PAT Data Center
+            api_token: Token API ou PAT
+            workers: Nombre de requêtes de pagination exécutées en parallèle (1 = séquentiel)
+            max_retries: Nombre maximal de réessais par requête (429, 503, erreurs réseau...)
+            rate_limit: Débit maximal en requêtes par seconde (le débit réel s'adapte au serveur)
+            pool_maxsize: Connexions keep-alive conservées par hôte (défaut: max(10, workers))
+            pool_block: Attendre une connexion libre du pool plutôt que d'en ouvrir une jetable
+            connect_timeout: Timeout de connexion par requête (secondes)
+            read_timeout: Timeout de lecture par requête (secondes)
+        """
         self.confluence_url = confluence_url.rstrip('/')
         self.username = username
         self.api_token = api_token
+        self.workers = max(1, int(workers or 1))
+        # Borne le nombre de requêtes en vol, même quand plusieurs espaces sont
+        # parcourus en parallèle (chacun avec sa propre pagination concurrente)
+        self._request_slots = threading.BoundedSemaphore(self.workers)
         
         # Détecter si c'est Atlassian Cloud ou Confluence Server/Data Center
         is_cloud = 'atlassian.net' in self.confluence_url.lower()
@@ -68,22 +177,160 @@ class ConfluenceBase:
             'Content-Type': 'application/json',
             'Accept': 'application/json'
         })
-            
-        self.session.verify = True
-        self.session.headers.update({
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        })
+        
+        # Exécuteur partagé : réessais, Retry-After, backoff et limitation de débit
+        # Le pool doit contenir au moins une connexion par worker, sinon les
+        # connexions excédentaires sont fermées après usage (nouveau handshake TLS)
+        self.http = RequestExecutor(
+            self.session,
+            max_retries=max_retries,
+            max_rate=rate_limit,
+            pool_maxsize=pool_maxsize or max(DEFAULT_POOL_MAXSIZE, self.workers),
+            pool_block=pool_block,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+        )
         
         # Log discret de la méthode d'auth utilisée
         # print(f"ℹ️ Authentification: {auth_type}")
     
+    def _fetch_results_window(self, url: str, params: Dict, start: int, limit: int) -> Tuple[List[Dict], Optional[Exception]]:
+        """
+        Récupère une fenêtre de résultats (start/limit) d'un endpoint paginé.
+        
+        Returns:
+            Tuple (résultats, erreur) : l'erreur est None si la requête a réussi
+        """
+        window_params = dict(params)
+        window_params['start'] = start
+        window_params['limit'] = limit
+        
+        try:
+            with self._request_slots:
+                response = self.http.get(url, params=window_params)
+            response.raise_for_status()
+            return (response.json().get('results', []), None)
+        except requests.exceptions.RequestException as e:
+            return ([], e)
+        except ValueError as e:
+            # Réponse non JSON
+            return ([], e)
+    
+    def _print_request_error(self, message: str, error: Exception):
+        """Affiche une erreur de requête avec le code HTTP et le détail si disponibles."""
+        print(f"❌ {message}: {error}")
+        if hasattr(error, 'response') and error.response is not None:
+            print(f"   Code HTTP: {error.response.status_code}")
+            try:
+                error_data = error.response.json()
+                error_msg = error_data.get('message') or error_data.get('errorMessage') or str(error_data)
+                print(f"   Détails: {error_msg}")
+            except Exception:
+                print(f"   Réponse: {error.response.text[:200]}")
+    
+    def _iter_paginated(
+        self,
+        url: str,
+        params: Dict,
+        limit: int = 100,
+        error_message: Optional[str] = None,
+        raise_on_error: bool = False,
+    ) -> Iterator[Dict]:
+        """
+        Parcourt un endpoint paginé (start/limit) et produit les résultats au fil de l'eau.
+        
+        Chaque lot est restitué dès sa réception : l'appelant n'a jamais plus
+        d'un groupe de fenêtres en mémoire, quelle que soit la taille de l'espace.
+        
+        En mode séquentiel (workers = 1), les fenêtres sont demandées une à une.
+        En mode concurrent, `workers` fenêtres consécutives sont demandées en
+        parallèle de manière spéculative (le total n'étant pas connu à l'avance),
+        puis restituées dans l'ordre des offsets : l'ordre est identique à
+        celui du mode séquentiel.
+        
+        Args:
+            url: URL de l'endpoint
+            params: Paramètres de la requête (hors start/limit)
+            limit: Taille d'une fenêtre
+            error_message: Message affiché en cas d'erreur (None = erreur silencieuse)
+            raise_on_error: Si True, l'erreur est levée au lieu d'arrêter silencieusement
+                           le parcours (pour les appelants qui doivent savoir qu'une
+                           liste est incomplète)
+        
+        Yields:
+            Dict: Résultats dans l'ordre de pagination
+        
+        Raises:
+            Exception: l'erreur de requête, uniquement si raise_on_error est True
+        """
+        start = 0
+        
+        executor = ThreadPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        try:
+            while True:
+                starts = [start + i * limit for i in range(self.workers)]
+                if executor:
+                    windows = executor.map(lambda s: self._fetch_results_window(url, params, s, limit), starts)
+                else:
+                    windows = [self._fetch_results_window(url, params, starts[0], limit)]
+                
+                finished = False
+                for batch, error in windows:
+                    if error is not None:
+                        if error_message:
+                            self._print_request_error(error_message, error)
+                        if raise_on_error:
+                            raise error
+                        finished = True
+                        break
+                    if not batch:
+                        finished = True
+                        break
+                    
+                    yield from batch
+                    
+                    if len(batch) < limit:
+                        finished = True
+                        break
+                
+                if finished:
+                    break
+                
+                start = starts[-1] + limit
+        finally:
+            if executor:
+                executor.shutdown(wait=True)
+    
+    def _get_paginated(self, url: str, params: Dict, limit: int = 100, error_message: Optional[str] = None) -> List[Dict]:
+        """Variante de _iter_paginated qui retourne tous les résultats dans une liste."""
+        return list(self._iter_paginated(url, params, limit, error_message))
+    
+    def iter_spaces(self, spaces_filter: Optional[List[str]] = None) -> Iterator[Dict]:
+        """
+        Parcourt les espaces Confluence au fil de la pagination.
+        
+        Args:
+            spaces_filter: Liste optionnelle de clés d'espaces à filtrer.
+                          Si None, produit tous les espaces.
+        
+        Yields:
+            Dict: Espace avec ses métadonnées (key, name, etc.)
+        """
+        url = f"{self.api_base}/space"
+        params = {'expand': 'name,key'}
+        spaces_filter_set = set(spaces_filter) if spaces_filter else None
+        
+        for space in self._iter_paginated(url, params, error_message="Erreur lors de la récupération des espaces"):
+            if spaces_filter_set is None or space.get('key') in spaces_filter_set:
+                yield space
+    
     def get_all_spaces(self, spaces_filter: Optional[List[str]] = None) -> List[Dict]:
         """
         Récupère tous les espaces Confluence.
         
         Cette méthode interroge l'API REST de Confluence pour obtenir la liste
-        de tous les espaces accessibles. La pagination est gérée automatiquement.
+        de tous les espaces accessibles. La pagination est gérée automatiquement
+        (en parallèle si workers > 1).
         
         Args:
             spaces_filter: Liste optionnelle de clés d'espaces à filtrer.
@@ -92,48 +339,71 @@ class ConfluenceBase:
         Returns:
             List[Dict]: Liste des espaces avec leurs métadonnées (key, name, etc.)
         """
-        spaces = []
-        start = 0
-        limit = 100
+        return list(self.iter_spaces(spaces_filter))
+    
+    def iter_pages(
+        self,
+        space_key: str,
+        include_drafts: bool = True,
+        expand: str = 'body.storage',
+        raise_on_error: bool = False,
+        draft_expand: Optional[str] = None,
+    ) -> Iterator[Dict]:
+        """
+        Parcourt les pages d'un espace au fil de la pagination.
         
-        while True:
-            url = f"{self.api_base}/space"
-            params = {'start': start, 'limit': limit, 'expand': 'name,key'}
-            
-            try:
-                response = self.session.get(url, params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                results = data.get('results', [])
-                if not results:
-                    break
-                
-                spaces.extend(results)
-                
-                if len(results) < limit:
-                    break
-                
-                start += limit
-            except requests.exceptions.RequestException as e:
-                print(f"❌ Erreur lors de la récupération des espaces: {e}")
-                if hasattr(e, 'response') and e.response is not None:
-                    print(f"   Code HTTP: {e.response.status_code}")
-                    try:
-                        error_data = e.response.json()
-                        error_msg = error_data.get('message') or error_data.get('errorMessage') or str(error_data)
-                        print(f"   Détails: {error_msg}")
-                    except:
-                        print(f"   Réponse: {e.response.text[:200]}")
-                break
-        
-        # Filtrer si des espaces spécifiques sont demandés
-        if spaces_filter:
-            # Convertir en set pour une recherche plus efficace
-            spaces_filter_set = set(spaces_filter) if isinstance(spaces_filter, list) else spaces_filter
-            spaces = [s for s in spaces if s.get('key') in spaces_filter_set]
-        
-        return spaces
+        Les pages publiées sont produites lot par lot, puis les brouillons
+        (dédoublonnés par ID). Seuls les IDs déjà vus sont conservés en mémoire.
+        
+        Args:
+            space_key: Clé de l'espace Confluence (ex: 'DEV', 'PROD')
+            include_drafts: Si True, inclut aussi les pages en brouillon
+            expand: Champs à étendre dans la réponse API (ex: 'body.storage,version')
+            raise_on_error: Lever l'erreur si le listing des pages publiées ou des brouillons échoue
+                           (au lieu de s'arrêter sur une liste incomplète)
+            draft_expand: Champs à étendre pour les brouillons (défaut: expand)
+        
+        Yields:
+            Dict: Page avec ses métadonnées
+        """
+        yield from self._list_space_pages(space_key, include_drafts, expand, raise_on_error, draft_expand)
+    
+    def _list_space_pages(
+        self,
+        space_key: str,
+        include_drafts: bool,
+        expand: str,
+        raise_on_error: bool = False,
+        draft_expand: Optional[str] = None,
+    ) -> Iterator[Dict]:
+        """
+        Listing paginé des pages d'un espace, commun à iter_pages et iter_gliffy_candidates.
+        
+        Les sous-classes redéfinissent iter_pages avec leur propre signature :
+        iter_gliffy_candidates passe par cette méthode.
+        """
+        url = f"{self.api_base}/content"
+        params = {
+            'spaceKey': space_key,
+            'type': 'page',
+            'expand': expand
+        }
+        seen_ids = set()
+        
+        for page in self._iter_paginated(url, params, error_message=PAGES_ERROR_MESSAGE, raise_on_error=raise_on_error):
+            seen_ids.add(page.get('id'))
+            yield page
+        
+        # Chercher aussi les drafts si demandé
+        if include_drafts:
+            draft_params = dict(params)
+            draft_params['status'] = 'draft'
+            if draft_expand:
+                draft_params['expand'] = draft_expand
+            for draft in self._iter_paginated(url, draft_params, error_message=PAGES_ERROR_MESSAGE, raise_on_error=raise_on_error):
+                if draft.get('id') not in seen_ids:
+                    seen_ids.add(draft.get('id'))
+                    yield draft
     
     def get_all_pages(self, space_key: str, include_drafts: bool = True, expand: str = 'body.storage') -> List[Dict]:
         """
@@ -141,7 +411,8 @@ class ConfluenceBase:
         
         Cette méthode récupère toutes les pages publiées d'un espace Confluence,
         avec option d'inclure les brouillons (drafts). La pagination est gérée
-        automatiquement.
+        automatiquement (en parallèle si workers > 1). Préférer iter_pages pour
+        les grands espaces.
         
         Args:
             space_key: Clé de l'espace Confluence (ex: 'DEV', 'PROD')
@@ -151,82 +422,146 @@ class ConfluenceBase:
         Returns:
             List[Dict]: Liste des pages avec leurs métadonnées complètes
         """
-        pages = []
-        start = 0
-        limit = 100
+        return list(self.iter_pages(space_key, include_drafts, expand))
+    
+    def iter_cql(
+        self,
+        cql: str,
+        expand: Optional[str] = None,
+        limit: int = 100,
+        raise_on_error: bool = False,
+        error_message: Optional[str] = "Erreur lors de la recherche CQL",
+    ) -> Iterator[Dict]:
+        """
+        Parcourt les résultats d'une recherche CQL (/content/search).
         
-        while True:
-            url = f"{self.api_base}/content"
-            params = {
-                'spaceKey': space_key,
-                'type': 'page',
-                'start': start,
-                'limit': limit,
-                'expand': expand
-            }
-            
-            try:
-                response = self.session.get(url, params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                results = data.get('results', [])
-                if not results:
-                    break
-                
-                pages.extend(results)
-                
-                if len(results) < limit:
-                    break
-                
-                start += limit
-            except requests.exceptions.RequestException as e:
-                print(f"❌ Erreur lors de la récupération des pages: {e}")
-                if hasattr(e, 'response') and e.response is not None:
-                    print(f"   Code HTTP: {e.response.status_code}")
-                break
+        Args:
+            cql: Requête CQL (ex: 'space = "DEV" AND type = page')
+            expand: Champs à étendre dans la réponse API
+            limit: Taille d'une fenêtre de pagination
+            raise_on_error: Lever l'erreur au lieu de s'arrêter sur des résultats incomplets
+            error_message: Message affiché en cas d'erreur (None = erreur silencieuse)
         
-        # Chercher aussi les drafts si demandé
-        if include_drafts:
+        Yields:
+            Dict: Contenus correspondant à la requête
+        """
+        url = f"{self.api_base}/content/search"
+        params = {'cql': cql}
+        if expand:
+            params['expand'] = expand
+        yield from self._iter_paginated(url, params, limit, error_message=error_message, raise_on_error=raise_on_error)
+    
+    def iter_gliffy_pages(
+        self,
+        space_key: str,
+        expand: str = FETCH_PROFILES['gliffy-detect'],
+        since: Optional[str] = None,
+        raise_on_error: bool = False,
+    ) -> Iterator[Dict]:
+        """
+        Parcourt les pages publiées d'un espace qui contiennent une macro Gliffy.
+        
+        Le filtre est appliqué par Confluence (CQL `macro = gliffy`) : les pages
+        sans diagramme ne sont jamais téléchargées. Les brouillons ne sont pas
+        indexés par la recherche et doivent être listés séparément.
+        
+        Args:
+            space_key: Clé de l'espace Confluence
+            expand: Champs à étendre dans la réponse API
+            since: Ne retenir que les pages modifiées depuis cette date ('YYYY-MM-DD HH:MM')
+            raise_on_error: Lever l'erreur (CQL non supporté, liste incomplète)
+        
+        Yields:
+            Dict: Pages contenant au moins une macro Gliffy
+        """
+        cql = f'space = "{space_key}" AND type = page AND {GLIFFY_CQL}'
+        if since:
+            cql += f' AND lastmodified >= "{since}"'
+        yield from self.iter_cql(cql, expand=expand, raise_on_error=raise_on_error)
+    
+    def find_gliffy_attachment_pages(self, space_key: str) -> List[str]:
+        """
+        Recherche (CQL) les pages d'un espace portant un fichier de diagramme Gliffy.
+        
+        Chaque critère de GLIFFY_ATTACHMENT_CQL est essayé séparément ; ceux que
+        l'instance ne supporte pas sont ignorés. Les résultats sont filtrés
+        localement (is_gliffy_attachment), la recherche par titre étant approximative.
+        
+        Returns:
+            List[str]: IDs des pages, sans doublon, dans l'ordre de découverte
+        """
+        page_ids = {}
+        for criterion in GLIFFY_ATTACHMENT_CQL:
+            cql = f'space = "{space_key}" AND type = attachment AND {criterion}'
             try:
-                draft_start = 0
-                draft_limit = 100
-                existing_ids = {p.get('id') for p in pages}
-                
-                while True:
-                    draft_url = f"{self.api_base}/content"
-                    draft_params = {
-                        'spaceKey': space_key,
-                        'type': 'page',
-                        'status': 'draft',
-                        'start': draft_start,
-                        'limit': draft_limit,
-                        'expand': expand
-                    }
-                    draft_response = self.session.get(draft_url, params=draft_params)
-                    if draft_response.status_code == 200:
-                        draft_data = draft_response.json()
-                        draft_results = draft_data.get('results', [])
-                        if not draft_results:
-                            break
-                        
-                        new_drafts = [d for d in draft_results if d.get('id') not in existing_ids]
-                        if new_drafts:
-                            pages.extend(new_drafts)
-                            existing_ids.update({d.get('id') for d in new_drafts})
-                        
-                        if len(draft_results) < draft_limit:
-                            break
-                        
-                        draft_start += draft_limit
-                    else:
-                        break
-            except Exception:
-                pass
+                for attachment in self.iter_cql(cql, expand='container', raise_on_error=True, error_message=None):
+                    container = attachment.get('container') or {}
+                    if container.get('id') and container.get('type', 'page') == 'page' and is_gliffy_attachment(attachment):
+                        page_ids.setdefault(str(container['id']))
+            except (requests.exceptions.RequestException, ValueError):
+                # Critère non supporté par cette instance (ex: champ mediaType)
+                continue
+        return list(page_ids)
+    
+    def iter_gliffy_candidates(
+        self,
+        space_key: str,
+        expand: str = FETCH_PROFILES['gliffy-detect'],
+        include_drafts: bool = True,
+        raise_on_error: bool = False,
+    ) -> Iterator[Dict]:
+        """
+        Parcourt les pages d'un espace susceptibles de contenir des Gliffy.
+        
+        Seules ces pages sont téléchargées avec les champs expand :
+        1. Pages contenant une macro Gliffy (CQL `macro = gliffy`)
+        2. Pages portant un fichier .gliffy sans macro trouvée par la recherche
+           (index de recherche en retard, macro imbriquée)
+        3. Brouillons, que la recherche n'indexe pas (listing status=draft)
         
-        return pages
+        Si la recherche CQL échoue, toutes les pages de l'espace sont parcourues
+        (sans revenir sur celles déjà produites).
+        
+        Args:
+            space_key: Clé de l'espace Confluence
+            expand: Champs à étendre pour chaque page produite
+            include_drafts: Si True, inclut aussi les brouillons
+            raise_on_error: Lever l'erreur si le listing de repli ou celui des brouillons
+                           échoue (au lieu de s'arrêter sur une liste incomplète)
+        
+        Yields:
+            Dict: Pages candidates, chacune une seule fois
+        """
+        seen_ids = set()
+        try:
+            for page in self.iter_gliffy_pages(space_key, expand=expand, raise_on_error=True):
+                seen_ids.add(page.get('id'))
+                yield page
+        except (requests.exceptions.RequestException, ValueError):
+            print(f"  ⚠️  {space_key}: recherche CQL impossible, parcours de toutes les pages de l'espace")
+            for page in self._list_space_pages(space_key, include_drafts, expand, raise_on_error=raise_on_error):
+                if page.get('id') not in seen_ids:
+                    seen_ids.add(page.get('id'))
+                    yield page
+            return
+        
+        for page_id in self.find_gliffy_attachment_pages(space_key):
+            if page_id in seen_ids:
+                continue
+            page = self._fetch_page(page_id, expand)
+            if page:
+                seen_ids.add(page_id)
+                yield page
+        
+        if include_drafts:
+            url = f"{self.api_base}/content"
+            params = {'spaceKey': space_key, 'type': 'page', 'status': 'draft', 'expand': expand}
+            for draft in self._iter_paginated(url, params, error_message=PAGES_ERROR_MESSAGE, raise_on_error=raise_on_error):
+                if draft.get('id') not in seen_ids:
+                    seen_ids.add(draft.get('id'))
+                    yield draft
     
-    def get_page_details(self, page_id: str, expand: str = 'body.storage,space,version') -> Optional[Dict]:
+    def get_page_details(self, page_id: str, expand: str = 'body.storage,space,version', status: Optional[str] = None) -> Optional[Dict]:
         """
         Récupère les détails d'une page spécifique.
         
@@ -237,16 +572,23 @@ class ConfluenceBase:
         Args:
             page_id: ID de la page Confluence
             expand: Champs à étendre dans la réponse API
+            status: Statut de la page (ex: 'draft' pour un brouillon), None = publiée
         
         Returns:
             Optional[Dict]: Dictionnaire contenant les détails de la page,
                            ou None si la page n'existe pas ou n'est pas accessible
         """
+        return self._fetch_page(page_id, expand, status)
+    
+    def _fetch_page(self, page_id: str, expand: str, status: Optional[str] = None) -> Optional[Dict]:
+        """Lecture d'une page par son ID, commune à get_page_details et iter_gliffy_candidates."""
         url = f"{self.api_base}/content/{page_id}"
         params = {'expand': expand}
+        if status:
+            params['status'] = status
         
         try:
-            response = self.session.get(url, params=params)
+            response = self.http.get(url, params=params)
             response.raise_for_status()
             if response.status_code == 200:
                 return response.json()
@@ -265,33 +607,56 @@ class ConfluenceBase:
             page_id: ID de la page Confluence
             
         Returns:
-            List[Dict]: Liste des attachments
+            List[Dict]: Liste des attachments (avec leur version)
         """
-        attachments = []
-        start = 0
-        limit = 100
+        url = f"{self.api_base}/content/{page_id}/child/attachment"
+        return self._get_paginated(url, {'expand': 'version'})
+
+    def upload_attachment(
+        self,
+        page_id: str,
+        filename: str,
+        content: bytes,
+        mime_type: str,
+        attachment_id: Optional[str] = None,
+        is_draft: bool = False,
+        comment: Optional[str] = None
+    ) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        Ajoute une pièce jointe à une page, ou une nouvelle version d'une pièce jointe existante.
         
-        while True:
-            url = f"{self.api_base}/content/{page_id}/child/attachment"
-            params = {'start': start, 'limit': limit}
+        Args:
+            page_id: ID de la page Confluence
+            filename: Nom du fichier joint
+            content: Contenu du fichier
+            mime_type: Type MIME du fichier
+            attachment_id: ID de la pièce jointe à mettre à jour (None = création)
+            is_draft: La page est un brouillon
+            comment: Commentaire de la version
             
-            try:
-                response = self.session.get(url, params=params)
-                if response.status_code != 200:
-                    break
-                data = response.json()
-                results = data.get('results', [])
-                if not results:
-                    break
-                
-                attachments.extend(results)
-                
-                if len(results) < limit:
-                    break
-                
-                start += limit
-            except Exception:
-                break
-                
-        return attachments
+        Returns:
+            Tuple (métadonnées de la pièce jointe, message d'erreur)
+        """
+        url = f"{self.api_base}/content/{page_id}/child/attachment"
+        if attachment_id:
+            url += f"/{attachment_id}/data"
+        params = {'status': 'draft'} if is_draft else {}
+        data = {'minorEdit': 'true'}
+        if comment:
+            data['comment'] = comment
+        # Content-Type à None : l'en-tête JSON de la session est retiré et requests génère l'en-tête multipart
+        headers = {'X-Atlassian-Token': 'nocheck', 'Content-Type': None}
+        
+        response = self.http.post(
+            url, params=params, headers=headers, data=data,
+            files={'file': (filename, content, mime_type)}
+        )
+        if response.status_code != 200:
+            return (None, f"HTTP {response.status_code} lors de l'envoi de la pièce jointe {filename}")
+        
+        result = response.json()
+        # Création : {'results': [...]} ; mise à jour : la pièce jointe elle-même
+        if isinstance(result, dict) and result.get('results'):
+            result = result['results'][0]
+        return (result, None)
 
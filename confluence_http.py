@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Couche HTTP partagée pour les appels à l'API REST de Confluence.
+
+Ce module fournit un exécuteur de requêtes commun à tous les scripts
+(scan, migration, téléchargement, traitement) afin que les mécanismes
+de robustesse et de débit ne soient implémentés qu'une seule fois.
+
+Fonctionnalités :
+- Réessais automatiques sur 429/502/503/504 et erreurs réseau
+- Respect de l'en-tête Retry-After (secondes ou date HTTP)
+- Backoff exponentiel avec jitter
+- Limiteur de débit côté client (token bucket) à débit adaptatif :
+  le débit augmente tant que le serveur répond, et est divisé par deux
+  dès qu'il signale une surcharge (429/503)
+- Pool de connexions keep-alive dimensionné pour les traitements parallèles
+  (taille, comportement bloquant) et timeouts connect/read par défaut
+- Statistiques (requêtes, réessais, attentes, connexions nouvelles/réutilisées)
+  pour les rapports
+
+Auteur: Sanae Basraoui
+"""
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+# Codes HTTP pour lesquels la requête peut être rejouée
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+# Codes HTTP indiquant que le serveur demande de ralentir
+THROTTLE_STATUS_CODES = {429, 503}
+
+# Méthodes rejouables même après une erreur réseau ou une passerelle en erreur
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+# Timeouts par défaut (secondes) appliqués aux requêtes qui n'en précisent pas
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 60.0
+
+# Taille minimale du pool de connexions par hôte (valeur par défaut de requests)
+DEFAULT_POOL_MAXSIZE = 10
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Convertit un en-tête Retry-After en délai (secondes).
+
+    Args:
+        value: Valeur de l'en-tête, en secondes ou au format date HTTP
+
+    Returns:
+        Optional[float]: Délai en secondes, None si absent ou illisible
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_date = parsedate_to_datetime(value)
+        if retry_date.tzinfo is None:
+            retry_date = retry_date.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_date - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class ConnectionCounter:
+    """Compteur, partagé entre threads, des connexions TCP/TLS ouvertes."""
+
+    def __init__(self):
+        self.new_connections = 0
+        self.lock = threading.Lock()
+
+    def increment(self):
+        with self.lock:
+            self.new_connections += 1
+
+
+def _counting_pool_class(base_class, counter: ConnectionCounter):
+    """Crée une sous-classe de pool urllib3 qui compte les nouvelles connexions."""
+
+    class CountingConnectionPool(base_class):
+        def _new_conn(self):
+            counter.increment()
+            return super()._new_conn()
+
+    return CountingConnectionPool
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    Adaptateur HTTP dont le pool compte les connexions créées.
+
+    Les requêtes qui ne déclenchent pas de nouvelle connexion ont réutilisé
+    une connexion keep-alive du pool : réutilisations = requêtes - connexions.
+    """
+
+    def __init__(self, counter: ConnectionCounter, **kwargs):
+        self.counter = counter
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool_class(HTTPConnectionPool, self.counter),
+            'https': _counting_pool_class(HTTPSConnectionPool, self.counter),
+        }
+
+
+class TokenBucket:
+    """Limiteur de débit à jetons, partagé entre threads."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        Args:
+            rate: Nombre de requêtes autorisées par seconde
+            burst: Nombre maximal de jetons accumulés (défaut: rate)
+        """
+        self.rate = float(rate)
+        self.burst = float(burst) if burst else max(1.0, self.rate)
+        self.tokens = self.burst
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def set_rate(self, rate: float):
+        """Modifie le débit (la capacité suit le débit)."""
+        with self.lock:
+            self._refill()
+            self.rate = float(rate)
+            self.burst = max(1.0, self.rate)
+            self.tokens = min(self.tokens, self.burst)
+
+    def _refill(self):
+        """Ajoute les jetons accumulés depuis le dernier remplissage (verrou déjà pris)."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self) -> float:
+        """
+        Consomme un jeton, en attendant si nécessaire.
+
+        Returns:
+            float: Temps d'attente en secondes
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return waited
+                delay = (1.0 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class RequestExecutor:
+    """
+    Exécute les requêtes HTTP avec réessais, backoff et limitation de débit.
+
+    L'exécuteur enveloppe une requests.Session existante (authentification,
+    en-têtes) et expose les mêmes méthodes get/put/post. Une fois les réessais
+    épuisés, la dernière réponse est retournée telle quelle : les appelants
+    gardent leur gestion habituelle des codes HTTP.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        initial_rate: float = 10.0,
+        max_rate: float = 50.0,
+        min_rate: float = 0.5,
+        rate_increase: float = 0.5,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        pool_block: bool = False,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+    ):
+        """
+        Args:
+            session: Session HTTP configurée (auth, en-têtes)
+            max_retries: Nombre maximal de réessais par requête
+            backoff_base: Délai de base du backoff exponentiel (secondes)
+            backoff_max: Délai maximal entre deux tentatives (secondes)
+            initial_rate: Débit initial (requêtes/seconde)
+            max_rate: Débit maximal atteignable par l'adaptation
+            min_rate: Débit minimal après ralentissements successifs
+            rate_increase: Augmentation du débit après chaque succès (requêtes/seconde)
+            pool_maxsize: Nombre de connexions conservées par hôte (au moins le nombre de workers)
+            pool_block: Si True, attendre qu'une connexion du pool se libère au lieu
+                d'ouvrir une connexion supplémentaire non conservée
+            connect_timeout: Timeout d'établissement de connexion (secondes)
+            read_timeout: Timeout de lecture de la réponse (secondes)
+        """
+        self.session = session
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_rate = max(min_rate, max_rate)
+        self.min_rate = min_rate
+        self.rate_increase = rate_increase
+        self.bucket = TokenBucket(min(initial_rate, self.max_rate))
+        self.timeout = (connect_timeout, read_timeout)
+
+        # Pool de connexions partagé par tous les threads de la session
+        self.connections = ConnectionCounter()
+        self.pool_maxsize = max(1, int(pool_maxsize))
+        adapter = PooledHTTPAdapter(
+            self.connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=pool_block,
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'retries': 0,
+            'throttled': 0,
+            'network_errors': 0,
+            'backoff_wait_seconds': 0.0,
+            'rate_limit_wait_seconds': 0.0,
+            'current_rate': self.bucket.rate,
+        }
+
+    def _add_stat(self, key: str, value=1):
+        with self._stats_lock:
+            self.stats[key] += value
+
+    def _adapt_rate(self, throttled: bool):
+        """Augmentation additive / diminution multiplicative du débit."""
+        current = self.bucket.rate
+        if throttled:
+            new_rate = max(self.min_rate, current / 2)
+        else:
+            new_rate = min(self.max_rate, current + self.rate_increase)
+        if new_rate != current:
+            self.bucket.set_rate(new_rate)
+            with self._stats_lock:
+                self.stats['current_rate'] = new_rate
+
+    def _retry_after_delay(self, response: requests.Response) -> Optional[float]:
+        """Lit l'en-tête Retry-After de la réponse."""
+        if response is None:
+            return None
+        return parse_retry_after(response.headers.get('Retry-After'))
+
+    def _backoff_delay(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """Délai avant la prochaine tentative : Retry-After si fourni, sinon backoff exponentiel avec jitter."""
+        retry_after = self._retry_after_delay(response)
+        if retry_after is not None:
+            # Léger jitter pour éviter que tous les workers repartent en même temps
+            return min(self.backoff_max, retry_after) + random.uniform(0, 0.5)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _sleep(self, delay: float):
+        if delay > 0:
+            time.sleep(delay)
+            self._add_stat('backoff_wait_seconds', delay)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Exécute une requête avec limitation de débit et réessais.
+
+        Les erreurs réseau et les codes 502/504 ne sont rejoués que pour les
+        méthodes idempotentes ; 429 et 503 (requête non traitée par le serveur)
+        sont rejoués pour toutes les méthodes.
+
+        Raises:
+            requests.exceptions.RequestException: si l'erreur réseau persiste
+        """
+        method = method.upper()
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+
+        while True:
+            self._add_stat('rate_limit_wait_seconds', self.bucket.acquire())
+            self._add_stat('requests')
+
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self._add_stat('network_errors')
+                if method not in IDEMPOTENT_METHODS or attempt >= self.max_retries:
+                    raise
+                self._add_stat('retries')
+                self._sleep(self._backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            status = response.status_code
+            throttled = status in THROTTLE_STATUS_CODES
+            if throttled:
+                self._add_stat('throttled')
+            self._adapt_rate(throttled)
+
+            retryable = status in RETRYABLE_STATUS_CODES and (throttled or method in IDEMPOTENT_METHODS)
+            if not retryable or attempt >= self.max_retries:
+                return response
+
+            self._add_stat('retries')
+            delay = self._backoff_delay(attempt, response)
+            # Réponse abandonnée : rendre sa connexion au pool avant d'attendre (stream=True)
+            response.close()
+            self._sleep(delay)
+            attempt += 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request('PUT', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def get_stats(self) -> Dict:
+        """Retourne une copie des statistiques (temps arrondis)."""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['backoff_wait_seconds'] = round(stats['backoff_wait_seconds'], 2)
+        stats['rate_limit_wait_seconds'] = round(stats['rate_limit_wait_seconds'], 2)
+        stats['current_rate'] = round(stats['current_rate'], 2)
+        with self.connections.lock:
+            stats['new_connections'] = self.connections.new_connections
+        stats['reused_connections'] = max(0, stats['requests'] - stats['new_connections'])
+        return stats
+
+    def print_stats(self):
+        """Affiche un résumé des statistiques HTTP."""
+        stats = self.get_stats()
+        print(f"\n🌐 Statistiques HTTP:")
+        print(f"  • Requêtes envoyées: {stats['requests']}")
+        print(f"  • Réessais: {stats['retries']}")
+        print(f"  • Réponses 429/503 (réessayées ou non): {stats['throttled']}")
+        print(f"  • Erreurs réseau (réessayées ou non): {stats['network_errors']}")
+        print(f"  • Attente backoff: {stats['backoff_wait_seconds']}s")
+        print(f"  • Attente limiteur de débit: {stats['rate_limit_wait_seconds']}s")
+        print(f"  • Débit final: {stats['current_rate']} requête(s)/s")
+        print(f"  • Connexions: {stats['new_connections']} nouvelle(s), {stats['reused_connections']} réutilisation(s) (pool: {self.pool_maxsize})")
@@ -9,24 +9,53 @@ hiérarchie, présence de Gliffy, etc.).
 Fonctionnalités :
 - Scan de tous les espaces ou espaces spécifiques
 - Scan d'une page spécifique par son ID
-- Détection automatique des diagrammes Gliffy dans les pages
-- Export en format TXT (lisible) ou JSON (structuré)
+- Détection des diagrammes Gliffy côté serveur (CQL `macro = gliffy`) : seules
+  les pages contenant un Gliffy sont téléchargées avec leur contenu
+- Scan concurrent des espaces et de la pagination (--workers)
+- Scan asynchrone (asyncio/aiohttp) pour les grosses instances (--async-concurrency)
+- Scan incrémental (--incremental) : seules les pages modifiées depuis le
+  dernier scan sont re-téléchargées, les suppressions sont détectées
+- Inventaire persistant dans SQLite (inventory_store), écrit au fil du scan
+- Export en format TXT (lisible), JSON (structuré) ou CSV, en streaming depuis la base
 
 Auteur: Sanae Basraoui
 """
 
+import asyncio
 import csv
 import json
-import re
-from typing import List, Dict, Optional
+import textwrap
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Dict, Optional, Tuple
 from pathlib import Path
-from datetime import datetime
-from confluence_base import ConfluenceBase
+from datetime import datetime, timedelta, timezone
+from confluence_base import ConfluenceBase, expand_fields
+from confluence_http import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+from confluence_async import AsyncConfluence, AsyncConfluenceError, DEFAULT_CONCURRENCY
+from inventory_store import InventoryStore, DEFAULT_INVENTORY_DB
+from storage_macros import find_gliffy_macros
+
+
+# Marge retirée du high-water mark dans la requête CQL : CQL interprète les
+# dates dans le fuseau horaire de l'utilisateur, avec une précision à la minute
+CQL_LASTMODIFIED_OVERLAP = timedelta(hours=24)
+
+# Modes de détection des Gliffy : recherche CQL (contenu téléchargé pour les
+# seules pages Gliffy) ou lecture du contenu de toutes les pages
+GLIFFY_DETECTION_MODES = ('cql', 'body')
 
 
 class ConfluenceScanner(ConfluenceBase):
     """Scanner pour créer un inventaire complet de Confluence."""
     
+    # Champs nécessaires à l'inventaire (métadonnées, hiérarchie), sans le contenu
+    PAGE_EXPAND = expand_fields('inventory-lite')
+    # Avec le contenu, pour compter les Gliffy localement (brouillons, mode 'body')
+    PAGE_BODY_EXPAND = expand_fields('inventory-lite', 'gliffy-detect')
+    # Page isolée (mode --page) : l'espace n'est pas connu à l'avance
+    PAGE_DETAILS_EXPAND = expand_fields('inventory-lite', 'gliffy-detect', 'space')
+    
     def __init__(
         self,
         confluence_url: str,
@@ -34,6 +63,16 @@ class ConfluenceScanner(ConfluenceBase):
         api_token: str,
         spaces: Optional[List[str]] = None,
         page_id: Optional[str] = None,
+        workers: int = 1,
+        max_retries: int = 5,
+        rate_limit: float = 50.0,
+        pool_maxsize: Optional[int] = None,
+        pool_block: bool = False,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        incremental: bool = False,
+        db_path: str = DEFAULT_INVENTORY_DB,
+        gliffy_detection: str = 'cql',
     ):
         """
         Initialise le scanner Confluence.
@@ -44,11 +83,34 @@ class ConfluenceScanner(ConfluenceBase):
             api_token: Token API Confluence
             spaces: Liste des clés d'espaces à scanner (None = tous)
             page_id: ID d'une page spécifique à scanner (None = toutes les pages)
+            workers: Nombre de requêtes parallèles (pagination et espaces, 1 = séquentiel)
+            max_retries: Nombre maximal de réessais par requête HTTP
+            rate_limit: Débit maximal en requêtes par seconde
+            pool_maxsize: Connexions keep-alive conservées par hôte (défaut: max(10, workers))
+            pool_block: Attendre une connexion libre du pool plutôt que d'en ouvrir une jetable
+            connect_timeout: Timeout de connexion par requête (secondes)
+            read_timeout: Timeout de lecture par requête (secondes)
+            incremental: Ne re-télécharger que les pages modifiées depuis le dernier scan
+            db_path: Base SQLite de l'inventaire (conserve aussi l'état du scan incrémental)
+            gliffy_detection: 'cql' (recherche `macro = gliffy`, repli sur 'body' si
+                              la recherche échoue) ou 'body' (contenu de toutes les pages)
         """
-        super().__init__(confluence_url, username, api_token)
+        super().__init__(
+            confluence_url, username, api_token,
+            workers=workers, max_retries=max_retries, rate_limit=rate_limit,
+            pool_maxsize=pool_maxsize, pool_block=pool_block,
+            connect_timeout=connect_timeout, read_timeout=read_timeout
+        )
         self.spaces_filter = set(spaces) if spaces else None
         self.page_id_filter = page_id
-        self.inventory = []
+        self.incremental = incremental
+        self.gliffy_detection = gliffy_detection
+        self.store = InventoryStore(db_path)
+        # Numéro du passage courant dans la base (défini par scan)
+        self.run_id = None
+        self.incremental_summaries = {}
+        # Espaces dont le listing a échoué dans ce passage (export partiel)
+        self.partial_spaces = []
     
     def get_all_spaces(self) -> List[Dict]:
         """Récupère tous les espaces Confluence."""
@@ -64,13 +126,62 @@ class ConfluenceScanner(ConfluenceBase):
         
         return spaces
     
-    def get_all_pages(self, space_key: str, include_drafts: bool = True) -> List[Dict]:
+    def get_all_pages(self, space_key: str, include_drafts: bool = True, with_body: bool = True) -> List[Dict]:
         """Récupère toutes les pages d'un espace."""
-        return super().get_all_pages(space_key, include_drafts, expand='space,version,history,ancestors,body.storage')
+        return list(self.iter_pages(space_key, include_drafts, with_body=with_body))
+    
+    def iter_pages(self, space_key: str, include_drafts: bool = True, raise_on_error: bool = False, with_body: bool = True) -> Iterator[Dict]:
+        """
+        Parcourt les pages d'un espace au fil de la pagination.
+        
+        Sans with_body, les pages publiées sont listées sans leur contenu ;
+        les brouillons (absents de la recherche CQL) gardent toujours le leur.
+        """
+        return super().iter_pages(
+            space_key, include_drafts,
+            expand=self.PAGE_BODY_EXPAND if with_body else self.PAGE_EXPAND,
+            raise_on_error=raise_on_error,
+            draft_expand=self.PAGE_BODY_EXPAND
+        )
     
-    def get_page_details(self, page_id: str) -> Optional[Dict]:
-        """Récupère les détails d'une page spécifique."""
-        return super().get_page_details(page_id, expand='space,version,history,ancestors,body.storage')
+    def get_page_details(self, page_id: str, status: Optional[str] = None) -> Optional[Dict]:
+        """Récupère les détails d'une page spécifique (avec son contenu et son espace)."""
+        return super().get_page_details(page_id, expand=self.PAGE_DETAILS_EXPAND, status=status)
+    
+    def detect_gliffy_pages(self, space_key: str, since: Optional[str] = None) -> Optional[Dict[str, Dict]]:
+        """
+        Recherche côté serveur les pages Gliffy d'un espace (CQL `macro = gliffy`).
+        
+        Seules les pages trouvées sont téléchargées avec leur contenu, pour
+        compter leurs diagrammes ; les autres pages sont inventoriées sans contenu.
+        
+        Args:
+            space_key: Clé de l'espace
+            since: Limiter aux pages modifiées depuis cette date ('YYYY-MM-DD HH:MM')
+        
+        Returns:
+            Optional[Dict[str, Dict]]: ID de page -> informations Gliffy (voir
+            extract_gliffy_info), ou None en mode 'body' ou si la recherche
+            échoue (le contenu de toutes les pages est alors lu)
+        """
+        if self.gliffy_detection != 'cql':
+            return None
+        gliffy_pages = {}
+        try:
+            for page in self.iter_gliffy_pages(space_key, since=since, raise_on_error=True):
+                body_storage = page.get('body', {}).get('storage', {}).get('value', '')
+                gliffy_pages[page.get('id')] = self.extract_gliffy_info(body_storage)
+        except (requests.exceptions.RequestException, ValueError):
+            print(f"  ⚠️  {space_key}: recherche CQL des Gliffy impossible, détection dans le contenu des pages")
+            return None
+        return gliffy_pages
+    
+    @staticmethod
+    def _page_gliffy_info(page: Dict, gliffy_pages: Optional[Dict[str, Dict]]) -> Optional[Dict]:
+        """Informations Gliffy d'une page listée sans contenu (None = lire le contenu de la page)."""
+        if gliffy_pages is None or 'body' in page:
+            return None
+        return gliffy_pages.get(page.get('id'), {'count': 0, 'titles': []})
     
     def format_date(self, date_str: Optional[str]) -> str:
         """Formate une date ISO en format lisible."""
@@ -95,27 +206,27 @@ class ConfluenceScanner(ConfluenceBase):
         gliffy_titles = []
         
         # Chercher les macros Gliffy et extraire leurs titres
-        gliffy_macro_pattern = r'<ac:structured-macro[^>]*ac:name=["\']gliffy["\'][^>]*>.*?</ac:structured-macro>'
-        gliffy_macros = re.findall(gliffy_macro_pattern, body_storage, re.DOTALL | re.IGNORECASE)
-        
-        for macro in gliffy_macros:
-            # Extraire le paramètre "name" qui contient le titre du diagramme
-            name_param = re.search(r'<ac:parameter[^>]*ac:name=["\']name["\'][^>]*>([^<]+)</ac:parameter>', macro, re.IGNORECASE)
-            if name_param:
-                diagram_name = name_param.group(1).strip()
-                if diagram_name:
-                    gliffy_titles.append(diagram_name)
-            else:
+        for macro in find_gliffy_macros(body_storage):
+            # Le paramètre "name" contient le titre du diagramme
+            diagram_name = macro.get('name')
+            if diagram_name is None:
                 # Si pas de nom, utiliser un titre par défaut
                 gliffy_titles.append("(sans titre)")
+            elif diagram_name:
+                gliffy_titles.append(diagram_name)
         
         return {
             'count': len(gliffy_titles),
             'titles': gliffy_titles
         }
     
-    def extract_page_info(self, page: Dict, space_key: str, space_name: str) -> Dict:
-        """Extrait les informations d'une page pour l'inventaire."""
+    def extract_page_info(self, page: Dict, space_key: str, space_name: str, gliffy_info: Optional[Dict] = None) -> Dict:
+        """
+        Extrait les informations d'une page pour l'inventaire.
+        
+        gliffy_info (résultat de la recherche CQL) évite de lire le contenu de
+        la page ; sans lui, les Gliffy sont comptés dans body.storage.
+        """
         page_id = page.get('id', '')
         title = page.get('title', 'Sans titre')
         status = page.get('status', 'current')
@@ -153,8 +264,9 @@ class ConfluenceScanner(ConfluenceBase):
             page_url = f"{self.confluence_url}/pages/viewpage.action?pageId={page_id}"
         
         # Extraire les informations Gliffy
-        body_storage = page.get('body', {}).get('storage', {}).get('value', '')
-        gliffy_info = self.extract_gliffy_info(body_storage)
+        if gliffy_info is None:
+            body_storage = page.get('body', {}).get('storage', {}).get('value', '')
+            gliffy_info = self.extract_gliffy_info(body_storage)
         
         return {
             'id': page_id,
@@ -175,24 +287,244 @@ class ConfluenceScanner(ConfluenceBase):
             'gliffy_titles': gliffy_info['titles']
         }
     
-    def scan(self) -> List[Dict]:
-        """Lance le scan complet."""
+    def scan_space(self, space: Dict, space_position: int = 0) -> Tuple[int, int]:
+        """
+        Récupère et analyse toutes les pages d'un espace.
+        
+        Les pages sont traitées au fil de la pagination et écrites par lots
+        dans la base d'inventaire : ni le contenu (body.storage) ni la liste
+        des pages ne sont conservés en mémoire. Les Gliffy sont détectés par
+        une recherche CQL : seul le contenu des pages Gliffy est téléchargé.
+        En mode incrémental, seules les pages modifiées sont re-téléchargées.
+        
+        Args:
+            space: Espace à scanner
+            space_position: Rang de l'espace dans le scan (ordre des exports)
+        
+        Returns:
+            Tuple (nombre de pages inventoriées, nombre de drafts)
+        """
+        space_key = space.get('key')
+        space_name = space.get('name', space_key)
+        
+        # Le high-water mark est pris avant le listing : une page modifiée
+        # pendant le scan sera revue au scan suivant
+        high_water_mark = datetime.now(timezone.utc).isoformat()
+        
+        if self.incremental:
+            previous = self.store.get_space_state(space_key)
+            if previous:
+                try:
+                    pages_count, drafts_count, complete = self.scan_space_incremental(space, space_position, previous)
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    self._print_request_error(f"Scan incrémental impossible pour {space_key}, scan complet", e)
+                else:
+                    # En cas d'échec partiel, garder l'ancien high-water mark : les pages
+                    # modifiées non récupérées seront retentées au prochain scan
+                    deleted = self.store.end_space(space_key, space_name, self.run_id,
+                                                   high_water_mark if complete else None)
+                    self.incremental_summaries[space_key]['deleted'] = deleted
+                    return (pages_count, drafts_count)
+        
+        gliffy_pages = self.detect_gliffy_pages(space_key)
+        
+        pages_count = 0
+        drafts_count = 0
+        try:
+            for page in self.iter_pages(space_key, include_drafts=True, raise_on_error=True,
+                                        with_body=gliffy_pages is None):
+                if page.get('status') == 'draft':
+                    drafts_count += 1
+                self.store.add_page(
+                    self.extract_page_info(page, space_key, space_name, self._page_gliffy_info(page, gliffy_pages)),
+                    self.run_id, space_position, pages_count,
+                    ancestors=page.get('ancestors', [])
+                )
+                pages_count += 1
+        except (requests.exceptions.RequestException, ValueError):
+            self._keep_unlisted_pages(space_key, space_position, pages_count)
+            return (pages_count, drafts_count)
+        
+        self.store.end_space(space_key, space_name, self.run_id, high_water_mark)
+        return (pages_count, drafts_count)
+    
+    def iter_page_versions(self, space_key: str) -> Iterator[Dict]:
+        """
+        Liste les pages d'un espace sans leur contenu (id, statut, version).
+        
+        Listing léger utilisé par le scan incrémental pour détecter les pages
+        modifiées, ajoutées et supprimées. Une erreur est levée plutôt que de
+        retourner un listing tronqué (qui ferait croire à des suppressions).
+        """
+        url = f"{self.api_base}/content"
+        params = {
+            'spaceKey': space_key,
+            'type': 'page',
+            'expand': 'version'
+        }
+        seen_ids = set()
+        for page in self._iter_paginated(url, params, raise_on_error=True):
+            seen_ids.add(page.get('id'))
+            yield page
+        
+        draft_params = dict(params)
+        draft_params['status'] = 'draft'
+        for draft in self._iter_paginated(url, draft_params, raise_on_error=True):
+            if draft.get('id') not in seen_ids:
+                seen_ids.add(draft.get('id'))
+                yield draft
+    
+    def scan_space_incremental(self, space: Dict, space_position: int, previous: Dict) -> Tuple[int, int, bool]:
+        """
+        Met à jour l'inventaire d'un espace à partir de la base.
+        
+        1. Listing léger (id + version) comparé aux versions en base : détecte
+           ajouts, modifications et suppressions
+        2. Recherche CQL `lastmodified >= high-water mark` pour récupérer en lot
+           les métadonnées des pages modifiées, et `macro = gliffy` sur la même
+           période pour le contenu des seules pages Gliffy
+        3. Récupération unitaire des pages modifiées non couvertes par la recherche
+           (brouillons, décalage de fuseau horaire)
+        
+        Les pages inchangées sont seulement marquées comme vues ; les pages
+        supprimées sont retirées par InventoryStore.end_space.
+        
+        Returns:
+            Tuple (nombre de pages inventoriées, nombre de drafts, True si toutes
+            les pages modifiées ont pu être récupérées)
+        """
+        space_key = space.get('key')
+        space_name = space.get('name', space_key)
+        stored_versions = self.store.get_page_versions(space_key)
+        
+        listing = list(self.iter_page_versions(space_key))
+        changed = {}
+        for page in listing:
+            page_id = page.get('id')
+            version = page.get('version', {}).get('number', 0)
+            if stored_versions.get(page_id) != (version, page.get('status', 'current')):
+                changed[page_id] = page
+        
+        refreshed = {}
+        gliffy_pages = None
+        if changed:
+            since = datetime.fromisoformat(previous['high_water_mark']) - CQL_LASTMODIFIED_OVERLAP
+            since_text = since.strftime("%Y-%m-%d %H:%M")
+            gliffy_pages = self.detect_gliffy_pages(space_key, since_text)
+            cql = f'space = "{space_key}" AND type = page AND lastmodified >= "{since_text}"'
+            expand = self.PAGE_EXPAND if gliffy_pages is not None else self.PAGE_BODY_EXPAND
+            for page in self.iter_cql(cql, expand=expand):
+                if page.get('id') in changed:
+                    refreshed[page['id']] = page
+            
+            for page_id, page in changed.items():
+                if page_id in refreshed:
+                    continue
+                status = page.get('status')
+                page_data = self.get_page_details(page_id, status=status if status == 'draft' else None)
+                if page_data:
+                    refreshed[page_id] = page_data
+        
+        pages_count = 0
+        drafts_count = 0
+        for page in listing:
+            page_id = page.get('id')
+            if page_id in refreshed:
+                page_data = refreshed[page_id]
+                self.store.add_page(
+                    self.extract_page_info(page_data, space_key, space_name, self._page_gliffy_info(page_data, gliffy_pages)),
+                    self.run_id, space_position, pages_count,
+                    ancestors=page_data.get('ancestors', [])
+                )
+            elif page_id in stored_versions:
+                # Inchangée, ou en échec : on garde l'entrée précédente
+                self.store.touch_page(page_id, self.run_id, space_position, pages_count)
+            else:
+                continue
+            if page.get('status') == 'draft':
+                drafts_count += 1
+            pages_count += 1
+        
+        # Affiché avec le résumé de l'espace (les espaces peuvent être scannés en parallèle)
+        self.incremental_summaries[space_key] = {
+            'updated': len(refreshed),
+            'unchanged': len(listing) - len(changed),
+            'deleted': 0,
+            'missing': len(changed) - len(refreshed),
+        }
+        
+        return (pages_count, drafts_count, not self.incremental_summaries[space_key]['missing'])
+    
+    def _print_space_summary(self, space: Dict, pages_count: int, drafts_count: int):
+        """Affiche le résumé du scan d'un espace."""
+        space_key = space.get('key')
+        space_name = space.get('name', space_key)
+        
+        print(f"\n📄 Analyse de l'espace: {space_name} ({space_key})")
+        
+        if not pages_count:
+            print(f"  ℹ️  Aucune page trouvée")
+            return
+        
+        print(f"  📋 {pages_count} page(s) trouvée(s):")
+        print(f"     - {pages_count - drafts_count} page(s) publiée(s)")
+        if drafts_count > 0:
+            print(f"     - {drafts_count} draft(s)")
+        
+        summary = self.incremental_summaries.get(space_key)
+        if summary:
+            print(f"  🔄 Incrémental: {summary['updated']} page(s) mise(s) à jour, "
+                  f"{summary['unchanged']} inchangée(s), {summary['deleted']} supprimée(s)")
+            if summary['missing']:
+                print(f"  ⚠️  {summary['missing']} page(s) modifiée(s) non récupérée(s), retentées au prochain scan")
+    
+    def _add_single_page(self, page_data: Dict) -> Dict:
+        """Ajoute une page isolée (mode --page) à l'inventaire et retourne ses informations."""
+        space = page_data.get('space', {})
+        space_key = space.get('key', 'unknown')
+        space_name = space.get('name', space_key)
+        page_info = self.extract_page_info(page_data, space_key, space_name)
+        self.store.add_page(page_info, self.run_id, 0, 0, ancestors=page_data.get('ancestors', []))
+        self.store.flush()
+        return page_info
+    
+    def _keep_unlisted_pages(self, space_key: str, space_position: int, pages_count: int):
+        """
+        Listing incomplet : les pages non vues ne sont pas retirées de la base et
+        sont rattachées à ce passage pour rester dans les exports.
+        """
+        kept = self.store.keep_space_pages(space_key, self.run_id, space_position, pages_count)
+        self.partial_spaces.append(space_key)
+        print(f"  ⚠️  {space_key}: liste des pages incomplète, l'inventaire existant de l'espace est conservé "
+              f"({kept} page(s) non revue(s) reprise(s) du scan précédent)")
+    
+    def _print_partial_export_warning(self):
+        """Signale un export partiel (espaces dont le listing a échoué)."""
+        if self.partial_spaces:
+            print(f"⚠️  Export partiel : liste des pages incomplète pour {', '.join(sorted(self.partial_spaces))} "
+                  f"(pages non revues reprises du scan précédent)")
+    
+    def scan(self) -> int:
+        """
+        Lance le scan complet.
+        
+        Returns:
+            int: Nombre de pages inventoriées (consultables via iter_inventory)
+        """
         print("🚀 Démarrage du scan Confluence\n")
+        self.run_id = self.store.begin_run()
+        self.partial_spaces = []
         
         # Si une page spécifique est demandée
         if self.page_id_filter:
             print(f"🎯 Mode: Page spécifique (ID: {self.page_id_filter})\n")
             page_data = self.get_page_details(self.page_id_filter)
             if page_data:
-                space = page_data.get('space', {})
-                space_key = space.get('key', 'unknown')
-                space_name = space.get('name', space_key)
-                page_info = self.extract_page_info(page_data, space_key, space_name)
-                self.inventory.append(page_info)
+                page_info = self._add_single_page(page_data)
                 print(f"✅ Page trouvée: {page_info['title']}")
-            else:
-                print(f"❌ Page {self.page_id_filter} non trouvée")
-            return self.inventory
+                return 1
+            print(f"❌ Page {self.page_id_filter} non trouvée")
+            return 0
         
         # Scan par espace(s)
         if self.spaces_filter:
@@ -208,42 +540,163 @@ class ConfluenceScanner(ConfluenceBase):
                 print(f"❌ Aucun espace trouvé parmi: {', '.join(list(self.spaces_filter))}")
             else:
                 print("❌ Aucun espace trouvé")
-            return []
+            return 0
         
         total_pages = 0
-        for space in spaces:
-            space_key = space.get('key')
-            space_name = space.get('name', space_key)
-            
-            print(f"\n📄 Analyse de l'espace: {space_name} ({space_key})")
-            
-            pages = self.get_all_pages(space_key, include_drafts=True)
+        if self.workers > 1:
+            # Les espaces sont scannés en parallèle ; executor.map conserve l'ordre
+            # des espaces pour que les résumés s'affichent dans un ordre stable
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                space_results = executor.map(self.scan_space, spaces, range(len(spaces)))
+                for space, (pages_count, drafts_count) in zip(spaces, space_results):
+                    self._print_space_summary(space, pages_count, drafts_count)
+                    total_pages += pages_count
+        else:
+            for space_position, space in enumerate(spaces):
+                pages_count, drafts_count = self.scan_space(space, space_position)
+                self._print_space_summary(space, pages_count, drafts_count)
+                total_pages += pages_count
+        
+        self.store.flush()
+        print(f"\n✅ Scan terminé: {total_pages} page(s) inventoriée(s)")
+        if self.store.db_path != ':memory:':
+            print(f"💾 Inventaire enregistré dans: {Path(self.store.db_path).absolute()}")
+        self.http.print_stats()
+        return total_pages
+    
+    async def _scan_space_async(self, client: AsyncConfluence, space: Dict, space_position: int) -> Tuple[int, int]:
+        """Équivalent asynchrone de scan_space (scan complet de l'espace)."""
+        space_key = space.get('key')
+        space_name = space.get('name', space_key)
+        high_water_mark = datetime.now(timezone.utc).isoformat()
+        
+        gliffy_pages = None
+        if self.gliffy_detection == 'cql':
+            gliffy_pages = {}
+            try:
+                async for page in client.iter_gliffy_pages(space_key, raise_on_error=True):
+                    body_storage = page.get('body', {}).get('storage', {}).get('value', '')
+                    gliffy_pages[page.get('id')] = self.extract_gliffy_info(body_storage)
+            except (AsyncConfluenceError, ValueError):
+                print(f"  ⚠️  {space_key}: recherche CQL des Gliffy impossible, détection dans le contenu des pages")
+                gliffy_pages = None
+        
+        pages_count = 0
+        drafts_count = 0
+        expand = self.PAGE_EXPAND if gliffy_pages is not None else self.PAGE_BODY_EXPAND
+        try:
+            async for page in client.iter_pages(space_key, include_drafts=True, expand=expand,
+                                                draft_expand=self.PAGE_BODY_EXPAND, raise_on_error=True):
+                if page.get('status') == 'draft':
+                    drafts_count += 1
+                self.store.add_page(
+                    self.extract_page_info(page, space_key, space_name, self._page_gliffy_info(page, gliffy_pages)),
+                    self.run_id, space_position, pages_count,
+                    ancestors=page.get('ancestors', [])
+                )
+                pages_count += 1
+        except (AsyncConfluenceError, ValueError):
+            self._keep_unlisted_pages(space_key, space_position, pages_count)
+            return (pages_count, drafts_count)
+        
+        self.store.end_space(space_key, space_name, self.run_id, high_water_mark)
+        return (pages_count, drafts_count)
+    
+    async def scan_async(self, concurrency: int = DEFAULT_CONCURRENCY) -> int:
+        """
+        Variante asynchrone de scan : tous les espaces sont parcourus en même temps.
+        
+        Le nombre de requêtes en vol est borné par `concurrency` ; l'inventaire
+        produit est identique (même ordre) à celui de scan.
+        
+        Args:
+            concurrency: Nombre maximal de requêtes simultanées
+        
+        Returns:
+            int: Nombre de pages inventoriées
+        """
+        print(f"🚀 Démarrage du scan Confluence (asyncio, {concurrency} requêtes simultanées max)\n")
+        self.run_id = self.store.begin_run()
+        self.partial_spaces = []
+        
+        connect_timeout, read_timeout = self.http.timeout
+        async with AsyncConfluence(
+            self.confluence_url, self.username, self.api_token,
+            concurrency=concurrency,
+            max_retries=self.http.max_retries,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+        ) as client:
+            if self.page_id_filter:
+                print(f"🎯 Mode: Page spécifique (ID: {self.page_id_filter})\n")
+                page_data = await client.get_page_details(self.page_id_filter, expand=self.PAGE_DETAILS_EXPAND)
+                if page_data:
+                    page_info = self._add_single_page(page_data)
+                    print(f"✅ Page trouvée: {page_info['title']}")
+                    return 1
+                print(f"❌ Page {self.page_id_filter} non trouvée")
+                return 0
             
-            if not pages:
-                print(f"  ℹ️  Aucune page trouvée")
-                continue
+            if self.spaces_filter:
+                print(f"🎯 Mode: Espaces spécifiques ({', '.join(self.spaces_filter)})\n")
+            else:
+                print(f"🌐 Mode: Tous les espaces\n")
             
-            drafts_count = len([p for p in pages if p.get('status') == 'draft'])
-            published_count = len([p for p in pages if p.get('status') != 'draft'])
+            print("📂 Récupération de la liste des espaces...")
+            spaces = await client.get_all_spaces(list(self.spaces_filter) if self.spaces_filter else None)
+            if not spaces:
+                print("❌ Aucun espace trouvé")
+                return 0
+            print(f"✅ {len(spaces)} espace(s) trouvé(s)")
             
-            print(f"  📋 {len(pages)} page(s) trouvée(s):")
-            print(f"     - {published_count} page(s) publiée(s)")
-            if drafts_count > 0:
-                print(f"     - {drafts_count} draft(s)")
+            # gather conserve l'ordre des espaces
+            space_results = await asyncio.gather(*(
+                self._scan_space_async(client, space, space_position)
+                for space_position, space in enumerate(spaces)
+            ))
             
-            for page in pages:
-                page_info = self.extract_page_info(page, space_key, space_name)
-                self.inventory.append(page_info)
+            total_pages = 0
+            for space, (pages_count, drafts_count) in zip(spaces, space_results):
+                self._print_space_summary(space, pages_count, drafts_count)
+                total_pages += pages_count
             
-            total_pages += len(pages)
+            self.store.flush()
+            print(f"\n✅ Scan terminé: {total_pages} page(s) inventoriée(s)")
+            if self.store.db_path != ':memory:':
+                print(f"💾 Inventaire enregistré dans: {Path(self.store.db_path).absolute()}")
+            client.print_stats()
         
-        print(f"\n✅ Scan terminé: {total_pages} page(s) inventoriée(s)")
-        return self.inventory
+        return total_pages
     
-    def export_csv(self, output_file: str):
-        """Exporte l'inventaire en CSV."""
-        if not self.inventory:
+    def scan_with_asyncio(self, concurrency: int = DEFAULT_CONCURRENCY) -> int:
+        """Point d'entrée synchrone de scan_async."""
+        return asyncio.run(self.scan_async(concurrency))
+    
+    def iter_inventory(self, order_by_space_key: bool = False) -> Iterator[Dict]:
+        """
+        Parcourt l'inventaire du dernier scan depuis la base, sans le charger en mémoire.
+        
+        Args:
+            order_by_space_key: Trier par clé d'espace plutôt que dans l'ordre du scan
+        """
+        if self.run_id is None:
+            return iter(())
+        return self.store.iter_pages(self.run_id, order_by_space_key)
+    
+    @property
+    def inventory(self) -> List[Dict]:
+        """Inventaire du dernier scan sous forme de liste (préférer iter_inventory)."""
+        return list(self.iter_inventory())
+    
+    def _has_inventory(self) -> bool:
+        if self.run_id is None or not self.store.count_pages(self.run_id):
             print("❌ Aucune donnée à exporter")
+            return False
+        return True
+    
+    def export_csv(self, output_file: str):
+        """Exporte l'inventaire en CSV (ligne par ligne depuis la base)."""
+        if not self._has_inventory():
             return
         
         output_path = Path(output_file)
@@ -256,35 +709,43 @@ class ConfluenceScanner(ConfluenceBase):
         ]
         
         with open(output_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
             writer.writeheader()
-            writer.writerows(self.inventory)
+            writer.writerows(self.iter_inventory())
         
         print(f"💾 Inventaire exporté en CSV: {output_path.absolute()}")
+        self._print_partial_export_warning()
     
     def export_json(self, output_file: str):
-        """Exporte l'inventaire en JSON."""
-        if not self.inventory:
-            print("❌ Aucune donnée à exporter")
+        """Exporte l'inventaire en JSON (écrit page par page, même format que json.dump)."""
+        if not self._has_inventory():
             return
         
         output_path = Path(output_file)
         output_path.parent.mkdir(parents=True, exist_ok=True)
         
         with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(self.inventory, f, indent=2, ensure_ascii=False)
+            f.write('[')
+            for index, page in enumerate(self.iter_inventory()):
+                f.write(',\n' if index else '\n')
+                f.write(textwrap.indent(json.dumps(page, indent=2, ensure_ascii=False), '  '))
+            f.write('\n]')
         
         print(f"💾 Inventaire exporté en JSON: {output_path.absolute()}")
+        self._print_partial_export_warning()
     
     def export_txt(self, output_file: str = "confluence_inventory.txt"):
         """Exporte l'inventaire en format texte lisible dans reports/."""
-        if not self.inventory:
-            print("❌ Aucune donnée à exporter")
+        if not self._has_inventory():
             return
         
         try:
             from report_utils import export_inventory_txt
-            export_inventory_txt(self.inventory, output_file)
+            export_inventory_txt(
+                self.iter_inventory(order_by_space_key=True),
+                output_file,
+                space_counts=self.store.count_pages(self.run_id)
+            )
+            self._print_partial_export_warning()
         except ImportError:
             print("❌ Erreur: module report_utils non trouvé")
-
@@ -10,6 +10,7 @@ Fonctionnalités :
 - Traitement par lot (dossier entier)
 - Support du mapper TID pour les images
 - Sauvegarde des fichiers .excalidraw convertis
+- Statistiques du cache des textes (libellés répétés analysés une fois)
 
 Auteur: Sanae Basraoui
 """
@@ -18,6 +19,7 @@ import json
 import re
 from pathlib import Path
 from gliffy_to_excalidraw import convert_gliffy_to_excalidraw
+from gliffy_text import print_text_style_cache_stats
 
 def convert_local_gliffy_files():
     """Convertit tous les fichiers .gliffy locaux en Excalidraw."""
@@ -91,6 +93,7 @@ def convert_local_gliffy_files():
     print(f"  • Fichiers convertis: {converted}")
     print(f"  • Erreurs: {errors}")
     print(f"  • Fichiers Excalidraw dans: {output_dir.absolute()}")
+    print_text_style_cache_stats()
     print("=" * 60)
 
 if __name__ == '__main__':
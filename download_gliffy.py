@@ -10,6 +10,8 @@ Fonctionnalités :
 - Insertion des images dans les pages Confluence
 - Conversion en Excalidraw avec images en base64
 - Sauvegarde locale des images téléchargées
+- Client Confluence partagé (ConfluenceBase) : authentification Basic ou
+  Bearer (PAT Data Center), réessais, limitation de débit, pool de connexions
 
 Auteur: Sanae Basraoui
 """
@@ -18,7 +20,11 @@ import argparse
 import base64
 import json
 import re
-import requests
+from attachment_cache import AttachmentCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_MAX_BYTES, get_attachment_version
+from attachment_index import AttachmentIndexes, GLIFFY_EXTENSIONS
+from confluence_base import ConfluenceBase, expand_fields
+from confluence_http import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+from storage_macros import find_gliffy_macros, gliffy_attachment_info
 import time
 import random
 import math
@@ -27,18 +33,44 @@ from pathlib import Path
 from html import unescape
 from urllib.parse import urlparse
 
-class GliffyDownloader:
+class GliffyDownloader(ConfluenceBase):
     def __init__(
         self,
         confluence_url: str,
-        username: str,
+        username: Optional[str],
         api_token: str,
         output_dir: str = "gliffy_images",
         excalidraw_output_dir: str = "output",
+        cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+        cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+        workers: int = 1,
+        max_retries: int = 5,
+        rate_limit: float = 50.0,
+        pool_maxsize: Optional[int] = None,
+        pool_block: bool = False,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
     ):
-        self.confluence_url = confluence_url.rstrip('/')
-        self.username = username
-        self.api_token = api_token
+        """
+        Initialise le téléchargeur de Gliffy.
+        
+        Args:
+            confluence_url: URL de base de Confluence
+            username: Nom d'utilisateur (ou email pour Cloud), None pour un PAT Data Center
+            api_token: Token API ou PAT
+            output_dir: Dossier des images téléchargées
+            excalidraw_output_dir: Dossier des fichiers Excalidraw
+            cache_dir: Dossier du cache des pièces jointes (None = pas de cache)
+            cache_max_bytes: Taille maximale du cache des pièces jointes (octets)
+            workers, max_retries, rate_limit, pool_maxsize, pool_block,
+            connect_timeout, read_timeout: Configuration HTTP (voir ConfluenceBase)
+        """
+        super().__init__(
+            confluence_url, username, api_token,
+            workers=workers, max_retries=max_retries, rate_limit=rate_limit,
+            pool_maxsize=pool_maxsize, pool_block=pool_block,
+            connect_timeout=connect_timeout, read_timeout=read_timeout
+        )
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         
@@ -46,21 +78,10 @@ class GliffyDownloader:
         self.excalidraw_output_dir = Path(excalidraw_output_dir)
         self.excalidraw_output_dir.mkdir(exist_ok=True)
         
-        # Détecter si c'est Atlassian Cloud
-        if 'atlassian.net' in self.confluence_url.lower():
-            if '/wiki' in self.confluence_url.lower():
-                self.api_base = f"{self.confluence_url}/rest/api"
-            else:
-                self.api_base = f"{self.confluence_url}/wiki/rest/api"
-        else:
-            self.api_base = f"{self.confluence_url}/rest/api"
-        
-        self.session = requests.Session()
-        self.session.auth = (username, api_token)
-        self.session.headers.update({
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        })
+        # Cache disque des pièces jointes (None = désactivé)
+        self.attachment_cache = AttachmentCache(cache_dir, cache_max_bytes) if cache_dir else None
+        # Pièces jointes listées une fois par page et par exécution
+        self.attachment_indexes = AttachmentIndexes(self.get_attachments)
         
         self.stats = {
             'pages_processed': 0,
@@ -73,73 +94,33 @@ class GliffyDownloader:
         """Extrait les IDs d'attachments Gliffy depuis le contenu d'une page."""
         gliffy_attachments = []
         
-        gliffy_macro_pattern = r'<ac:structured-macro[^>]*ac:name=["\']gliffy["\'][^>]*>.*?</ac:structured-macro>'
-        gliffy_macros = re.findall(gliffy_macro_pattern, body_storage, re.DOTALL | re.IGNORECASE)
-        
-        for macro in gliffy_macros:
-            image_att_id = re.search(r'<ac:parameter[^>]*ac:name=["\']imageAttachmentId["\'][^>]*>([^<]+)</ac:parameter>', macro, re.IGNORECASE)
-            diagram_att_id = re.search(r'<ac:parameter[^>]*ac:name=["\']diagramAttachmentId["\'][^>]*>([^<]+)</ac:parameter>', macro, re.IGNORECASE)
-            macro_id = re.search(r'<ac:parameter[^>]*ac:name=["\']macroId["\'][^>]*>([^<]+)</ac:parameter>', macro, re.IGNORECASE)
-            name_param = re.search(r'<ac:parameter[^>]*ac:name=["\']name["\'][^>]*>([^<]+)</ac:parameter>', macro, re.IGNORECASE)
-            # Paramètres alternatifs DC
-            filename_param = re.search(r'<ac:parameter[^>]*ac:name=["\']filename["\'][^>]*>([^<]+)</ac:parameter>', macro, re.IGNORECASE)
-            id_param = re.search(r'<ac:parameter[^>]*ac:name=["\']id["\'][^>]*>([^<]+)</ac:parameter>', macro, re.IGNORECASE)
-            
-            att_id = image_att_id.group(1).strip() if image_att_id else None
-            diagram_att_id_value = diagram_att_id.group(1).strip() if diagram_att_id else None
-            macro_id_value = macro_id.group(1).strip() if macro_id else None
-            diagram_name = name_param.group(1).strip() if name_param else None
-            
-            # Si on n'a toujours pas d'ID d'attachement ou si c'est 'test' (placeholder DC)
-            if not att_id or att_id == 'test':
-                if id_param and id_param.group(1).strip() != 'test':
-                    att_id = id_param.group(1).strip()
-                elif name_param:
-                    att_id = name_param.group(1).strip()
-                elif filename_param:
-                    att_id = filename_param.group(1).strip()
-                elif id_param: # Fallback sur 'test'
-                    att_id = id_param.group(1).strip()
-
-            if not diagram_att_id_value or diagram_att_id_value == 'test':
-                diagram_att_id_value = diagram_att_id.group(1).strip() if diagram_att_id else att_id
-
-            if att_id or diagram_att_id_value:
-                gliffy_attachments.append({
-                    'attachmentId': att_id,
-                    'diagramAttachmentId': diagram_att_id_value,
-                    'macroId': macro_id_value,
-                    'diagramName': diagram_name,
-                    'macroHtml': macro
-                })
+        for macro in find_gliffy_macros(body_storage):
+            gliffy_att = gliffy_attachment_info(macro)
+            if gliffy_att['attachmentId'] or gliffy_att['diagramAttachmentId']:
+                gliffy_attachments.append(gliffy_att)
         
         return gliffy_attachments
 
-    def get_attachments(self, page_id: str) -> List[Dict]:
-        """Récupère tous les attachments d'une page."""
-        attachments = []
-        start = 0
-        limit = 100
-        while True:
-            url = f"{self.api_base}/content/{page_id}/child/attachment"
-            params = {'start': start, 'limit': limit}
-            try:
-                response = self.session.get(url, params=params, timeout=30)
-                if response.status_code != 200:
-                    break
-                data = response.json()
-                results = data.get('results', [])
-                if not results:
-                    break
-                attachments.extend(results)
-                if len(results) < limit:
-                    break
-                start += limit
-            except Exception:
-                break
-        return attachments
-
     def download_attachment_direct(self, page_id: str, attachment_id: str, is_draft: bool = False) -> Tuple[Optional[bytes], Optional[str], Optional[str]]:
+        """
+        Télécharge un attachment, en passant par le cache local s'il est activé.
+
+        La version actuelle de l'attachment est lue dans l'index des pièces
+        jointes de la page (ou relue dans Confluence s'il n'y figure pas) : le
+        contenu en cache n'est réutilisé que si la version n'a pas changé.
+        Retourne (content, mime_type, error_msg)
+        """
+        if self.attachment_cache is None:
+            return self._download_attachment(page_id, attachment_id, is_draft)
+        version = self.attachment_indexes.get(page_id).version(attachment_id)
+        if version is None:
+            version = get_attachment_version(self.http, self.api_base, attachment_id)
+        return self.attachment_cache.fetch(
+            page_id, attachment_id, version,
+            lambda: self._download_attachment(page_id, attachment_id, is_draft)
+        )
+    
+    def _download_attachment(self, page_id: str, attachment_id: str, is_draft: bool = False) -> Tuple[Optional[bytes], Optional[str], Optional[str]]:
         """
         Télécharge un attachment directement via l'API REST.
         Retourne (content, mime_type, error_msg)
@@ -154,7 +135,7 @@ class GliffyDownloader:
             # Utiliser un header Accept large pour le téléchargement binaire
             # et outrepasser le Accept: application/json de la session
             headers = {'Accept': '*/*'}
-            download_response = self.session.get(download_api_url, params=params, headers=headers, timeout=30)
+            download_response = self.http.get(download_api_url, params=params, headers=headers)
             
             if download_response.status_code == 200:
                 content = download_response.content
@@ -176,7 +157,7 @@ class GliffyDownloader:
             if attachment_id.startswith('att'):
                 attachment_id_no_prefix = attachment_id[3:]
                 download_api_url = f"{self.api_base}/content/{page_id}/child/attachment/{attachment_id_no_prefix}/download"
-                download_response = self.session.get(download_api_url, params=params, headers=headers, timeout=30)
+                download_response = self.http.get(download_api_url, params=params, headers=headers)
                 
                 if download_response.status_code == 200:
                     content = download_response.content
@@ -197,31 +178,32 @@ class GliffyDownloader:
             
             # Fallback pour Data Center : si l'ID n'est pas numérique, essayer de trouver par nom
             if attachment_id and not attachment_id.isdigit() and not attachment_id.startswith('att'):
-                page_attachments = self.get_attachments(page_id)
+                page_attachments = self.attachment_indexes.get(page_id)
                 search_name = attachment_id.strip()
                 
-                # Correspondance exacte
-                for att in page_attachments:
-                    title = att.get('title', '')
-                    if title == search_name or title == f"{search_name}.png" or title == f"{search_name}.svg" or title == f"{search_name}.gliffy":
-                        att_real_id = att.get('id')
-                        if att_real_id:
-                            return self.download_attachment_direct(page_id, att_real_id, is_draft)
-                
-                # Recherche souple
-                for att in page_attachments:
-                    title = att.get('title', '').lower()
-                    sn_lower = search_name.lower()
-                    if (sn_lower in title) and (title.endswith('.png') or title.endswith('.svg') or title.endswith('.gliffy')):
-                        att_real_id = att.get('id')
-                        if att_real_id:
-                            return self.download_attachment_direct(page_id, att_real_id, is_draft)
+                # Correspondance exacte (image du diagramme en priorité), sinon recherche souple
+                att = page_attachments.find_title(search_name) or page_attachments.search_title(search_name)
+                if att and att.get('id'):
+                    return self.download_attachment_direct(page_id, att['id'], is_draft)
 
             return (None, None, last_error or "Échec")
             
         except Exception as e:
             return (None, None, f"Exception: {str(e)}")
 
+    def download_first(self, attempts: List[Tuple[str, str, bool]]) -> Optional[Tuple[bytes, str]]:
+        """
+        Essaie les téléchargements (page, attachment, brouillon) dans l'ordre.
+        
+        Returns:
+            Optional[Tuple[bytes, str]]: (contenu, type MIME) du premier téléchargement réussi
+        """
+        for page_id, attachment_id, is_draft in dict.fromkeys(attempts):
+            content, mime_type, _ = self.download_attachment_direct(page_id, attachment_id, is_draft)
+            if content:
+                return (content, mime_type)
+        return None
+
     def download_gliffy_json(self, page_id: str, diagram_attachment_id: str, is_draft: bool = False) -> Optional[dict]:
         """Télécharge le fichier .gliffy JSON."""
         if not diagram_attachment_id:
@@ -243,7 +225,7 @@ class GliffyDownloader:
                     if is_draft:
                         params['status'] = 'draft'
                     
-                    response = self.session.get(download_url, params=params, timeout=30)
+                    response = self.http.get(download_url, params=params)
                     
                     if response.status_code == 200:
                         try:
@@ -264,7 +246,7 @@ class GliffyDownloader:
                     # Si 404 avec status=draft, essayer sans le paramètre status
                     if response.status_code == 404 and is_draft:
                         params_no_status = {}
-                        response_no_status = self.session.get(download_url, params=params_no_status, timeout=30)
+                        response_no_status = self.http.get(download_url, params=params_no_status)
                         if response_no_status.status_code == 200:
                             try:
                                 gliffy_data = json.loads(response_no_status.content)
@@ -277,22 +259,12 @@ class GliffyDownloader:
         
         # Fallback pour Data Center : si l'ID n'est pas numérique, essayer de trouver par nom
         if diagram_attachment_id and not diagram_attachment_id.isdigit() and not diagram_attachment_id.startswith('att'):
-            page_attachments = self.get_attachments(page_id)
+            page_attachments = self.attachment_indexes.get(page_id)
             search_name = diagram_attachment_id.strip()
-            for att in page_attachments:
-                title = att.get('title', '')
-                if title == search_name or title == f"{search_name}.gliffy":
-                    att_real_id = att.get('id')
-                    if att_real_id:
-                        return self.download_gliffy_json(page_id, att_real_id, is_draft)
-            
-            for att in page_attachments:
-                title = att.get('title', '').lower()
-                sn_lower = search_name.lower()
-                if (sn_lower in title) and title.endswith('.gliffy'):
-                    att_real_id = att.get('id')
-                    if att_real_id:
-                        return self.download_gliffy_json(page_id, att_real_id, is_draft)
+            att = (page_attachments.find_title(search_name, GLIFFY_EXTENSIONS)
+                   or page_attachments.search_title(search_name, GLIFFY_EXTENSIONS))
+            if att and att.get('id'):
+                return self.download_gliffy_json(page_id, att['id'], is_draft)
 
         return None
 
@@ -300,11 +272,11 @@ class GliffyDownloader:
         """Insère une image PNG après la macro Gliffy."""
         try:
             url = f"{self.api_base}/content/{page_id}"
-            params = {'expand': 'body.storage,version,space,title'}
+            params = {'expand': expand_fields('migrate', 'space')}
             if is_draft:
                 params['status'] = 'draft'
             
-            response = self.session.get(url, params=params)
+            response = self.http.get(url, params=params)
             if response.status_code != 200:
                 return (False, None)
             
@@ -331,17 +303,14 @@ class GliffyDownloader:
             
             image_html = f'<p><strong>{title_text}</strong><br/><img src="{image_data_url}" alt="{alt_text}" title="{alt_text}" /></p>'
             
-            escaped_macro = re.escape(macro_html)
-            macro_match = re.search(escaped_macro, current_body, re.DOTALL | re.IGNORECASE)
+            all_macros = find_gliffy_macros(current_body)
+            macro_match = next((macro for macro in all_macros if macro.html == macro_html), None)
             
-            if not macro_match:
-                macro_pattern = r'<ac:structured-macro[^>]*ac:name=["\']gliffy["\'][^>]*>.*?</ac:structured-macro>'
-                all_macros = list(re.finditer(macro_pattern, current_body, re.DOTALL | re.IGNORECASE))
-                if all_macros:
-                    macro_match = all_macros[-1]
+            if not macro_match and all_macros:
+                macro_match = all_macros[-1]
             
             if macro_match:
-                insert_position = macro_match.end()
+                insert_position = macro_match.end
                 
                 # Insérer l'image directement après la macro Gliffy, sans vérifier ce qui existe déjà
                 new_body = current_body[:insert_position] + image_html + current_body[insert_position:]
@@ -360,18 +329,18 @@ class GliffyDownloader:
                 'version': {'number': version_number}
             }
             
-            update_response = self.session.put(url, json=update_data, params=params)
+            update_response = self.http.put(url, json=update_data, params=params)
             if update_response.status_code == 200:
                 return (True, new_body)
             elif update_response.status_code == 409 and is_draft:
                 # Conflit de version pour draft - réessayer avec la version actuelle
                 try:
-                    current_response = self.session.get(url, params=params)
+                    current_response = self.http.get(url, params=params)
                     if current_response.status_code == 200:
                         current_data = current_response.json()
                         current_version = current_data.get('version', {}).get('number', version_num)
                         update_data['version'] = {'number': current_version}
-                        retry_response = self.session.put(url, json=update_data, params=params)
+                        retry_response = self.http.put(url, json=update_data, params=params)
                         if retry_response.status_code == 200:
                             return (True, new_body)
                 except:
@@ -385,11 +354,11 @@ class GliffyDownloader:
         try:
             if body_storage is None:
                 url = f"{self.api_base}/content/{page_id}"
-                params = {'expand': 'body.storage'}
+                params = {'expand': expand_fields('gliffy-detect')}
                 if is_draft:
                     params['status'] = 'draft'
                 
-                response = self.session.get(url, params=params)
+                response = self.http.get(url, params=params)
                 if response.status_code != 200:
                     return (0, [])
                 
@@ -420,39 +389,23 @@ class GliffyDownloader:
                     continue
                 
                 result = None
+                container_id = gliffy_att.get('containerId')
                 
                 if attachment_id:
-                    gliffy_info = gliffy_attachments[idx]
-                    container_id = None
-                    macro_html = gliffy_info.get('macroHtml', '')
-                    if macro_html:
-                        container_match = re.search(r'<ac:parameter[^>]*ac:name=["\']containerId["\'][^>]*>([^<]+)</ac:parameter>', macro_html, re.IGNORECASE)
-                        if container_match:
-                            container_id = container_match.group(1).strip()
-                    
+                    # Tentatives dans l'ordre : page conteneur (diagramme inclus depuis une
+                    # autre page), puis page courante ; avec et sans le préfixe 'att'
+                    attachment_ids = [attachment_id]
+                    if attachment_id.startswith('att'):
+                        attachment_ids.append(attachment_id[3:])
+                    attempts = []
                     if container_id and container_id != page_id:
-                        result = self.download_attachment_direct(container_id, attachment_id, False)
-                        if not result:
-                            result = self.download_attachment_direct(container_id, attachment_id, True)
-                        if not result and attachment_id.startswith('att'):
-                            attachment_id_no_prefix = attachment_id[3:]
-                            result = self.download_attachment_direct(container_id, attachment_id_no_prefix, False)
-                            if not result:
-                                result = self.download_attachment_direct(container_id, attachment_id_no_prefix, True)
-                    
-                    if not result:
-                        result = self.download_attachment_direct(page_id, attachment_id, is_draft=is_draft)
-                    
-                    if not result and is_draft:
-                        # Pour les drafts, essayer avec status=draft explicitement
-                        result = self.download_attachment_direct(page_id, attachment_id, True)
-                    
-                    # Si toujours pas de résultat, essayer sans le préfixe 'att'
-                    if not result and attachment_id.startswith('att'):
-                        attachment_id_no_prefix = attachment_id[3:]
-                        result = self.download_attachment_direct(page_id, attachment_id_no_prefix, is_draft=is_draft)
-                        if not result and is_draft:
-                            result = self.download_attachment_direct(page_id, attachment_id_no_prefix, True)
+                        attempts += [(container_id, att_id, draft) for att_id in attachment_ids for draft in (False, True)]
+                    for att_id in attachment_ids:
+                        attempts.append((page_id, att_id, is_draft))
+                        if is_draft:
+                            # Pour les drafts, essayer avec status=draft explicitement
+                            attempts.append((page_id, att_id, True))
+                    result = self.download_first(attempts)
                     
                     # Si le fichier existe déjà localement, le réutiliser
                     if not result:
@@ -539,10 +492,10 @@ class GliffyDownloader:
                     if current_page_body is None:
                         try:
                             url = f"{self.api_base}/content/{page_id}"
-                            params = {'expand': 'body.storage'}
+                            params = {'expand': expand_fields('gliffy-detect')}
                             if is_draft:
                                 params['status'] = 'draft'
-                            response = self.session.get(url, params=params)
+                            response = self.http.get(url, params=params)
                             if response.status_code == 200:
                                 page_data = response.json()
                                 current_page_body = page_data.get('body', {}).get('storage', {}).get('value', '')
@@ -770,16 +723,24 @@ class GliffyDownloader:
         print(f"  • Gliffy uploadés dans Confluence: {self.stats['gliffy_downloaded']}")
         print(f"  • Erreurs: {self.stats['errors']}")
         print(f"  • Images sauvegardées localement dans: {self.output_dir.absolute()}")
+        self.http.print_stats()
+        if self.attachment_cache is not None:
+            self.attachment_cache.print_stats()
         print("=" * 60)
 
 
 def main():
     parser = argparse.ArgumentParser(description='Télécharge et convertit les diagrammes Gliffy depuis Confluence')
     parser.add_argument('--url', required=True, help='URL de base de Confluence')
-    parser.add_argument('--username', required=True, help='Nom d\'utilisateur ou email')
+    parser.add_argument('--username', help='Nom d\'utilisateur ou email (à omettre avec un PAT Data Center : authentification Bearer)')
     parser.add_argument('--token', required=True, help='Token API Confluence')
     parser.add_argument('--output', default='gliffy_images', help='Dossier de sortie (défaut: gliffy_images)')
     parser.add_argument('--json', default='gliffy_pages.json', help='Fichier JSON avec les pages (défaut: gliffy_pages.json)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help=f'Dossier du cache des pièces jointes (défaut: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_MAX_BYTES // (1024 * 1024), help='Taille maximale du cache en MB (défaut: %(default)s)')
+    parser.add_argument('--no-cache', action='store_true', help='Désactiver le cache des pièces jointes')
+    parser.add_argument('--max-retries', type=int, default=5, help='Nombre maximal de réessais par requête HTTP (défaut: %(default)s)')
+    parser.add_argument('--rate-limit', type=float, default=50.0, help='Débit maximal en requêtes par seconde (défaut: %(default)s)')
     
     args = parser.parse_args()
     
@@ -787,7 +748,11 @@ def main():
         confluence_url=args.url,
         username=args.username,
         api_token=args.token,
-        output_dir=args.output
+        output_dir=args.output,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        cache_max_bytes=args.cache_size * 1024 * 1024,
+        max_retries=args.max_retries,
+        rate_limit=args.rate_limit
     )
     
     downloader.run_from_json(args.json)
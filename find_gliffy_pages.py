@@ -7,8 +7,10 @@ des diagrammes Gliffy, en utilisant uniquement l'API REST Confluence.
 
 Fonctionnalités :
 - Détection des macros Gliffy dans les pages
-- Recherche dans le contenu source (body.storage) et rendu HTML
+- Recherche dans le contenu source (body.storage), sans demander le rendu HTML
 - Support de tous les espaces ou espaces spécifiques
+- Découverte par recherche CQL (--discovery cql) : seules les pages Gliffy
+  (macros, fichiers .gliffy) et les brouillons sont téléchargés
 - Génération de rapports détaillés
 
 Auteur: Sanae Basraoui
@@ -17,18 +19,20 @@ Auteur: Sanae Basraoui
 import argparse
 import re
 import requests
-from typing import List, Dict, Optional, Set
+from confluence_base import ConfluenceBase, DISCOVERY_MODES, expand_fields
+from typing import Iterator, List, Dict, Optional, Set
 from pathlib import Path
 import json
 
 
-class GliffyPageFinder:
+class GliffyPageFinder(ConfluenceBase):
     def __init__(
         self,
         confluence_url: str,
         username: str,
         api_token: str,
         spaces: Optional[List[str]] = None,
+        discovery: str = 'cql',
     ):
         """
         Initialise le finder de pages Gliffy.
@@ -38,28 +42,12 @@ class GliffyPageFinder:
             username: Nom d'utilisateur Confluence
             api_token: Token API Confluence
             spaces: Liste des clés d'espaces à traiter (None = tous les espaces)
+            discovery: 'cql' (recherche des pages Gliffy) ou 'scan' (toutes les pages)
         """
-        self.confluence_url = confluence_url.rstrip('/')
-        self.username = username
-        self.api_token = api_token
+        # Session, détection Cloud / Data Center et exécuteur HTTP partagés
+        super().__init__(confluence_url, username, api_token)
         self.spaces_filter = set(spaces) if spaces else None
-        
-        # Détecter si c'est Atlassian Cloud (atlassian.net)
-        if 'atlassian.net' in self.confluence_url.lower():
-            if '/wiki' in self.confluence_url.lower():
-                self.api_base = f"{self.confluence_url}/rest/api"
-            else:
-                self.api_base = f"{self.confluence_url}/wiki/rest/api"
-        else:
-            self.api_base = f"{self.confluence_url}/rest/api"
-        
-        # Session HTTP pour l'API Confluence
-        self.session = requests.Session()
-        self.session.auth = (username, api_token)
-        self.session.headers.update({
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        })
+        self.discovery = discovery
         
         # Résultats
         self.pages_with_gliffy = []
@@ -78,7 +66,7 @@ class GliffyPageFinder:
             params = {'start': start, 'limit': limit, 'expand': 'name,key'}
             
             try:
-                response = self.session.get(url, params=params)
+                response = self.http.get(url, params=params)
                 response.raise_for_status()
                 data = response.json()
                 
@@ -106,119 +94,19 @@ class GliffyPageFinder:
         
         return spaces
 
+    def iter_pages(self, space_key: str, include_drafts: bool = True) -> Iterator[Dict]:
+        """
+        Parcourt les pages d'un espace, y compris les drafts si demandé.
+        
+        Un seul passage sur l'espace : les pages publiées sont produites au fil
+        de la pagination, puis seuls les brouillons (status=draft) sont listés,
+        dédoublonnés par ID. Seul le contenu source est demandé.
+        """
+        return super().iter_pages(space_key, include_drafts, expand=expand_fields('gliffy-detect'))
+    
     def get_all_pages(self, space_key: str, include_drafts: bool = True) -> List[Dict]:
         """Récupère toutes les pages d'un espace, y compris les drafts si demandé."""
-        pages = []
-        start = 0
-        limit = 100
-        
-        while True:
-            url = f"{self.api_base}/content"
-            params = {
-                'spaceKey': space_key,
-                'type': 'page',
-                'start': start,
-                'limit': limit,
-                'expand': 'space,version,body.storage'
-            }
-            
-            try:
-                response = self.session.get(url, params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                results = data.get('results', [])
-                if not results:
-                    break
-                    
-                pages.extend(results)
-                
-                if len(results) < limit:
-                    break
-                    
-                start += limit
-                
-            except requests.exceptions.RequestException as e:
-                print(f"⚠️  Erreur lors de la récupération des pages de l'espace {space_key}: {e}")
-                break
-        
-        # Chercher aussi les drafts avec pagination complète
-        if include_drafts:
-            # Méthode 1: Chercher via l'endpoint content avec status=draft (avec pagination)
-            try:
-                draft_start = 0
-                draft_limit = 100
-                existing_ids = {p.get('id') for p in pages}
-                
-                while True:
-                    draft_url = f"{self.api_base}/content"
-                    draft_params = {
-                        'spaceKey': space_key,
-                        'type': 'page',
-                        'status': 'draft',
-                        'start': draft_start,
-                        'limit': draft_limit,
-                        'expand': 'body.storage,version'
-                    }
-                    draft_response = self.session.get(draft_url, params=draft_params)
-                    if draft_response.status_code == 200:
-                        draft_data = draft_response.json()
-                        draft_results = draft_data.get('results', [])
-                        if not draft_results:
-                            break
-                        
-                        # Éviter les doublons
-                        new_drafts = [d for d in draft_results if d.get('id') not in existing_ids]
-                        if new_drafts:
-                            pages.extend(new_drafts)
-                            existing_ids.update({d.get('id') for d in new_drafts})
-                        
-                        if len(draft_results) < draft_limit:
-                            break
-                        
-                        draft_start += draft_limit
-                    else:
-                        break
-            except Exception as e:
-                pass
-            
-            # Méthode 2: Chercher via CQL avec pagination complète
-            try:
-                cql_start = 0
-                cql_limit = 100
-                existing_ids = {p.get('id') for p in pages}
-                
-                while True:
-                    cql_url = f"{self.api_base}/content/search"
-                    cql_params = {
-                        'cql': f'space = "{space_key}" AND type = page',
-                        'start': cql_start,
-                        'limit': cql_limit,
-                        'expand': 'body.storage,version'
-                    }
-                    cql_response = self.session.get(cql_url, params=cql_params)
-                    if cql_response.status_code == 200:
-                        cql_data = cql_response.json()
-                        cql_results = cql_data.get('results', [])
-                        if not cql_results:
-                            break
-                        
-                        # Filtrer les drafts et éviter les doublons
-                        draft_results = [r for r in cql_results if r.get('status') == 'draft' and r.get('id') not in existing_ids]
-                        if draft_results:
-                            pages.extend(draft_results)
-                            existing_ids.update({d.get('id') for d in draft_results})
-                        
-                        if len(cql_results) < cql_limit:
-                            break
-                        
-                        cql_start += cql_limit
-                    else:
-                        break
-            except Exception as e:
-                pass
-        
-        return pages
+        return list(self.iter_pages(space_key, include_drafts))
 
     def page_contains_gliffy(self, page_id: str) -> tuple[bool, List[str]]:
         """
@@ -228,16 +116,20 @@ class GliffyPageFinder:
         2. Images embed via confluence-connect.gliffy.net
         3. Références dans les paramètres de macros
         Retourne (True/False, liste des références Gliffy trouvées).
+        
+        Seul le contenu source est demandé : le rendu HTML (body.view), coûteux
+        à produire pour Confluence, ne contient que des Gliffy déjà présents
+        dans body.storage.
         """
         url = f"{self.api_base}/content/{page_id}"
         params = {
-            'expand': 'body.storage,body.view'
+            'expand': expand_fields('gliffy-detect')
         }
         
         found_references = []
         
         try:
-            response = self.session.get(url, params=params)
+            response = self.http.get(url, params=params)
             response.raise_for_status()
             data = response.json()
             
@@ -286,17 +178,6 @@ class GliffyPageFinder:
                 if re.search(img_gliffy_pattern, body_storage, re.IGNORECASE):
                     found_references.append('image gliffy')
             
-            # Chercher aussi dans body.view (HTML rendu)
-            body_view = data.get('body', {}).get('view', {}).get('value', '')
-            if body_view:
-                # Chercher les URLs Gliffy dans le HTML rendu
-                if re.search(r'confluence-connect\.gliffy\.net', body_view, re.IGNORECASE):
-                    found_references.append('URL gliffy.net (HTML rendu)')
-                
-                # Chercher les macros Gliffy dans le HTML rendu
-                if re.search(r'data-macro-name=["\']gliffy["\']', body_view, re.IGNORECASE):
-                    found_references.append('macro gliffy (HTML rendu)')
-            
             if found_references:
                 return True, found_references
             
@@ -309,133 +190,121 @@ class GliffyPageFinder:
             print(f"  ⚠️  Erreur lors de la vérification de la page {page_id}: {e}")
             return False, []
 
+    def _page_url(self, page_id: str) -> str:
+        """Construit l'URL de consultation d'une page."""
+        if 'atlassian.net' in self.confluence_url.lower():
+            return f"{self.confluence_url.rstrip('/wiki')}/wiki/pages/viewpage.action?pageId={page_id}"
+        return f"{self.confluence_url}/pages/viewpage.action?pageId={page_id}"
+    
+    def _find_gliffy_references(self, body_storage: str, url_preview_length: int = 80) -> List[str]:
+        """Cherche les références Gliffy (URLs et macros) dans un contenu body.storage."""
+        gliffy_refs = []
+        
+        # Chercher URLs gliffy
+        if 'confluence-connect.gliffy.net' in body_storage.lower() or 'gliffy.net' in body_storage.lower():
+            urls = re.findall(r'https?://[^"\'\\s<>]*gliffy[^"\'\\s<>]*', body_storage, re.IGNORECASE)
+            gliffy_refs.extend([f'URL: {url[:url_preview_length]}...' for url in list(dict.fromkeys(urls))[:2]])
+            if not gliffy_refs:
+                gliffy_refs.append('URL gliffy.net')
+        
+        # Chercher macros gliffy
+        if re.search(r'<ac:structured-macro[^>]*ac:name=["\']gliffy["\']', body_storage, re.IGNORECASE):
+            gliffy_refs.append('Macro gliffy')
+        
+        return gliffy_refs
+    
+    def _analyze_page(self, page: Dict, space_key: str, space_name: str):
+        """Recherche les Gliffy d'une page et l'ajoute aux résultats si elle en contient."""
+        page_id = page.get('id')
+        page_title = page.get('title', 'Untitled')
+        page_status = page.get('status', 'current')
+        is_draft = page_status == 'draft'
+        
+        # Si le body.storage est déjà dans la réponse, l'utiliser directement
+        body_storage = page.get('body', {}).get('storage', {}).get('value', '')
+        if body_storage:
+            gliffy_refs = self._find_gliffy_references(body_storage, 60 if is_draft else 80)
+            if not gliffy_refs:
+                return
+            
+            page_info = {
+                'id': page_id,
+                'title': page_title,
+                'space_key': space_key,
+                'space_name': space_name,
+                'status': page_status,
+                'macros': gliffy_refs,
+                'body_storage': body_storage,  # Sauvegarder le contenu pour l'extraction des IDs Gliffy
+                'url': self._page_url(page_id)
+            }
+            self.pages_with_gliffy.append(page_info)
+            
+            if is_draft:
+                print(f"  ✅ Draft avec Gliffy trouvé: '{page_title}' (ID: {page_id})")
+                for ref in gliffy_refs[:2]:
+                    print(f"     - {ref}")
+            else:
+                status_label = f" [{page_status}]" if page_status != 'current' else ""
+                print(f"  ✅ '{page_title}' (ID: {page_id}){status_label}")
+                for ref in gliffy_refs[:3]:
+                    print(f"     - {ref}")
+        elif not is_draft:
+            # Sinon, utiliser la méthode normale
+            has_gliffy, macros_found = self.page_contains_gliffy(page_id)
+            
+            if has_gliffy:
+                page_info = {
+                    'id': page_id,
+                    'title': page_title,
+                    'space_key': space_key,
+                    'space_name': space_name,
+                    'status': page_status,
+                    'macros': macros_found,
+                    'url': self._page_url(page_id)
+                }
+                self.pages_with_gliffy.append(page_info)
+                status_label = f" [{page_status}]" if page_status != 'current' else ""
+                print(f"  ✅ '{page_title}' (ID: {page_id}){status_label} - {', '.join(macros_found)}")
+    
     def process_space(self, space: Dict):
-        """Traite toutes les pages d'un espace."""
+        """
+        Traite les pages d'un espace.
+        
+        Les pages sont analysées au fil de la pagination : le contenu d'une page
+        n'est conservé que si elle contient des Gliffy. En découverte CQL, seules
+        les pages candidates (macro Gliffy, fichier .gliffy, brouillons) sont
+        téléchargées ; sinon toutes les pages de l'espace sont analysées.
+        """
         space_key = space.get('key')
         space_name = space.get('name', space_key)
         
         print(f"\n📄 Analyse de l'espace: {space_name} ({space_key})")
+        print(f"  🔍 Analyse en cours...")
+        
+        if self.discovery == 'cql':
+            pages = self.iter_gliffy_candidates(space_key, expand=expand_fields('gliffy-detect'))
+        else:
+            pages = self.iter_pages(space_key, include_drafts=True)
+        
+        published_count = 0
+        drafts_count = 0
         
-        # Récupérer toutes les pages (y compris les drafts)
-        pages = self.get_all_pages(space_key, include_drafts=True)
+        for page in pages:
+            self.total_pages_analyzed += 1
+            if page.get('status', 'current') == 'draft':
+                drafts_count += 1
+            else:
+                published_count += 1
+            self._analyze_page(page, space_key, space_name)
         
-        if not pages:
+        if published_count + drafts_count == 0:
             print(f"  ℹ️  Aucune page trouvée dans cet espace")
             return
         
-        # Séparer les drafts des pages publiées pour les statistiques
-        drafts_count = len([p for p in pages if p.get('status') == 'draft'])
-        published_count = len([p for p in pages if p.get('status') != 'draft'])
-        
-        print(f"  📋 {len(pages)} page(s) trouvée(s) au total:")
+        print(f"  📋 {published_count + drafts_count} page(s) analysée(s) au total:")
         print(f"     - {published_count} page(s) publiée(s)")
         if drafts_count > 0:
             print(f"     - {drafts_count} draft(s)")
-        print(f"  🔍 Analyse en cours...")
-        
-        self.total_pages_analyzed += len(pages)
-        
-        # Séparer les drafts des pages publiées
-        drafts = [p for p in pages if p.get('status') == 'draft']
-        published_pages = [p for p in pages if p.get('status') != 'draft']
-        
-        # Identifier les drafts avec Gliffy
-        if drafts:
-            for draft in drafts:
-                draft_id = draft.get('id')
-                draft_title = draft.get('title', 'Untitled')
-                body_storage = draft.get('body', {}).get('storage', {}).get('value', '')
-                
-                # Vérifier si le draft contient des Gliffy
-                has_gliffy = False
-                gliffy_refs = []
-                if body_storage:
-                    if 'confluence-connect.gliffy.net' in body_storage.lower() or 'gliffy.net' in body_storage.lower():
-                        has_gliffy = True
-                        urls = re.findall(r'https?://[^"\'\\s<>]*gliffy[^"\'\\s<>]*', body_storage, re.IGNORECASE)
-                        gliffy_refs.extend([f'URL: {url[:60]}...' for url in set(urls)[:2]])
-                    elif re.search(r'<ac:structured-macro[^>]*ac:name=["\']gliffy["\']', body_storage, re.IGNORECASE):
-                        has_gliffy = True
-                        gliffy_refs.append('Macro gliffy')
-                
-                if has_gliffy:
-                    print(f"  ✅ Draft avec Gliffy trouvé: '{draft_title}' (ID: {draft_id})")
-                    for ref in gliffy_refs[:2]:
-                        print(f"     - {ref}")
-                    
-                    # Identifier le draft comme ayant des Gliffy
-                    page_info = {
-                        'id': draft_id,
-                        'title': draft_title,
-                        'space_key': space_key,
-                        'space_name': space_name,
-                        'status': 'draft',
-                        'macros': gliffy_refs,
-                        'body_storage': body_storage,  # Sauvegarder le contenu pour l'extraction des IDs Gliffy
-                        'url': f"{self.confluence_url.rstrip('/wiki')}/wiki/pages/viewpage.action?pageId={draft_id}" if 'atlassian.net' in self.confluence_url.lower() else f"{self.confluence_url}/pages/viewpage.action?pageId={draft_id}"
-                    }
-                    self.pages_with_gliffy.append(page_info)
-        
-        # Vérifier chaque page publiée
-        for page in published_pages:
-            page_id = page.get('id')
-            page_title = page.get('title', 'Untitled')
-            page_status = page.get('status', 'current')
-            
-            # Si le body.storage est déjà dans la réponse, l'utiliser directement
-            body_storage = page.get('body', {}).get('storage', {}).get('value', '')
-            if body_storage:
-                # Vérifier directement dans le body_storage
-                has_gliffy = False
-                gliffy_refs = []
-                
-                # Chercher URLs gliffy
-                if 'confluence-connect.gliffy.net' in body_storage.lower() or 'gliffy.net' in body_storage.lower():
-                    has_gliffy = True
-                    urls = re.findall(r'https?://[^"\'\\s<>]*gliffy[^"\'\\s<>]*', body_storage, re.IGNORECASE)
-                    gliffy_refs.extend([f'URL: {url[:80]}...' for url in set(urls)[:2]])
-                
-                # Chercher macros gliffy
-                if re.search(r'<ac:structured-macro[^>]*ac:name=["\']gliffy["\']', body_storage, re.IGNORECASE):
-                    has_gliffy = True
-                    gliffy_refs.append('Macro gliffy')
-                
-                if has_gliffy:
-                    # Récupérer le body_storage si disponible
-                    page_body_storage = page.get('body', {}).get('storage', {}).get('value', '')
-                    
-                    page_info = {
-                        'id': page_id,
-                        'title': page_title,
-                        'space_key': space_key,
-                        'space_name': space_name,
-                        'status': page_status,
-                        'macros': gliffy_refs,
-                        'body_storage': page_body_storage,  # Sauvegarder le contenu pour l'extraction des IDs Gliffy
-                        'url': f"{self.confluence_url.rstrip('/wiki')}/wiki/pages/viewpage.action?pageId={page_id}" if 'atlassian.net' in self.confluence_url.lower() else f"{self.confluence_url}/pages/viewpage.action?pageId={page_id}"
-                    }
-                    self.pages_with_gliffy.append(page_info)
-                    status_label = f" [{page_status}]" if page_status != 'current' else ""
-                    print(f"  ✅ '{page_title}' (ID: {page_id}){status_label}")
-                    for ref in gliffy_refs[:3]:
-                        print(f"     - {ref}")
-            else:
-                # Sinon, utiliser la méthode normale
-                has_gliffy, macros_found = self.page_contains_gliffy(page_id)
-                
-                if has_gliffy:
-                    page_info = {
-                        'id': page_id,
-                        'title': page_title,
-                        'space_key': space_key,
-                        'space_name': space_name,
-                        'status': page_status,
-                        'macros': macros_found,
-                        'url': f"{self.confluence_url.rstrip('/wiki')}/wiki/pages/viewpage.action?pageId={page_id}" if 'atlassian.net' in self.confluence_url.lower() else f"{self.confluence_url}/pages/viewpage.action?pageId={page_id}"
-                    }
-                    self.pages_with_gliffy.append(page_info)
-                    status_label = f" [{page_status}]" if page_status != 'current' else ""
-                    print(f"  ✅ '{page_title}' (ID: {page_id}){status_label} - {', '.join(macros_found)}")
 
     def run(self):
         """Lance le processus de recherche."""
@@ -445,6 +314,8 @@ class GliffyPageFinder:
             print(f"🎯 Espaces sélectionnés: {', '.join(self.spaces_filter)}")
         else:
             print(f"🌐 Mode: Tous les espaces")
+        if self.discovery == 'cql':
+            print("🔎 Découverte: recherche CQL des pages Gliffy (macros, fichiers .gliffy, brouillons)")
         
         print()
         
@@ -466,6 +337,7 @@ class GliffyPageFinder:
         print(f"  • Espaces analysés: {self.total_spaces_analyzed}")
         print(f"  • Pages totales analysées: {self.total_pages_analyzed}")
         print(f"  • Pages avec Gliffy trouvées: {len(self.pages_with_gliffy)}")
+        self.http.print_stats()
         print("="*60)
         
         if self.pages_with_gliffy:
@@ -534,6 +406,13 @@ Exemples:
         help='Clés d\'espaces à traiter (ex: DEV PROD). Si non spécifié, traite tous les espaces.'
     )
     
+    parser.add_argument(
+        '--discovery',
+        choices=DISCOVERY_MODES,
+        default='cql',
+        help='Pages analysées : recherche CQL des pages Gliffy (cql) ou toutes les pages de chaque espace (scan) (défaut: %(default)s)'
+    )
+    
     args = parser.parse_args()
     
     # Créer et lancer le finder
@@ -541,7 +420,8 @@ Exemples:
         confluence_url=args.url,
         username=args.username,
         api_token=args.token,
-        spaces=args.spaces
+        spaces=args.spaces,
+        discovery=args.discovery
     )
     
     finder.run()
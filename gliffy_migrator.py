@@ -8,9 +8,17 @@ Confluence et de les insérer directement dans les pages sous les diagrammes Gli
 Fonctionnalités :
 - Migration idempotente par défaut (ne modifie pas les pages déjà traitées)
 - Option --force pour forcer la réinsertion même si déjà présent
-- Compression automatique des images trop grandes
+- Compression automatique des images trop grandes, dans un pool de processus
+  qui travaille pendant les téléchargements et mises à jour des pages suivantes
 - Support des drafts (brouillons)
 - Génération de rapports détaillés de migration
+- Journal durable des pages traitées et reprise après interruption (--resume)
+- Mode --batch-updates : une seule mise à jour (un PUT) par page
+- Mode --upload-images : images jointes aux pages (<ac:image>) au lieu du base64
+- Cache disque des images téléchargées, revalidé par version d'attachment
+- Pièces jointes listées une seule fois par page (résolution par nom sur Data Center)
+- Découverte des pages Gliffy par recherche CQL : le contenu des autres pages
+  n'est pas téléchargé (--discovery scan pour parcourir toutes les pages)
 
 Auteur: Sanae Basraoui
 
@@ -22,20 +30,23 @@ import base64
 import json
 import re
 import requests
-import io
+from collections import deque
+from concurrent.futures import Future
 from html import escape
-from typing import List, Dict, Optional, Tuple, Union
+from typing import Iterator, List, Dict, Optional, Tuple, Union
 from pathlib import Path
 from datetime import datetime, timezone
-from confluence_base import ConfluenceBase
+from confluence_base import ConfluenceBase, expand_fields
+from confluence_http import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+from attachment_cache import AttachmentCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_MAX_BYTES, get_attachment_version
+from attachment_index import AttachmentIndexes
+from image_compression import CompressionPool, DEFAULT_MAX_IMAGE_BYTES, compress_image
+from migration_journal import MigrationJournal, DEFAULT_JOURNAL_FILE
+from storage_macros import MacroIndex, find_gliffy_macros, gliffy_attachment_info
 
-# Essayer d'importer PIL pour la compression d'images
-try:
-    from PIL import Image
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
 
+# Pages préparées à l'avance au plus, par défaut : chacune garde ses images en mémoire
+DEFAULT_PIPELINE_DEPTH = 4
 
 class GliffyMigrator(ConfluenceBase):
     """Migrateur idempotent pour copier les images Gliffy sous les diagrammes."""
@@ -48,6 +59,23 @@ class GliffyMigrator(ConfluenceBase):
         spaces: Optional[List[str]] = None,
         page_id: Optional[str] = None,
         force: bool = False,
+        workers: int = 1,
+        max_retries: int = 5,
+        rate_limit: float = 50.0,
+        pool_maxsize: Optional[int] = None,
+        pool_block: bool = False,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        journal_file: str = DEFAULT_JOURNAL_FILE,
+        resume: bool = False,
+        batch_updates: bool = False,
+        cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+        cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+        compress_workers: Optional[int] = None,
+        pipeline_depth: Optional[int] = None,
+        quantize_images: bool = False,
+        upload_images: bool = False,
+        discovery: str = 'cql',
     ):
         """
         Initialise le migrateur Gliffy.
@@ -59,11 +87,57 @@ class GliffyMigrator(ConfluenceBase):
             spaces: Liste des clés d'espaces à traiter (None = tous)
             page_id: ID d'une page spécifique à traiter (None = toutes les pages)
             force: Si True, réinsère les images même si elles existent déjà (défaut: False)
+            workers: Nombre de requêtes de pagination exécutées en parallèle (1 = séquentiel)
+            max_retries: Nombre maximal de réessais par requête HTTP
+            rate_limit: Débit maximal en requêtes par seconde
+            pool_maxsize: Connexions keep-alive conservées par hôte (défaut: max(10, workers))
+            pool_block: Attendre une connexion libre du pool plutôt que d'en ouvrir une jetable
+            connect_timeout: Timeout de connexion par requête (secondes)
+            read_timeout: Timeout de lecture par requête (secondes)
+            journal_file: Journal des pages traitées (JSONL, ajout seul)
+            resume: Reprendre la dernière migration interrompue à partir du journal
+            batch_updates: Regrouper les insertions d'une page en une seule mise à jour (un PUT par page)
+            cache_dir: Dossier du cache des pièces jointes (None = pas de cache)
+            cache_max_bytes: Taille maximale du cache des pièces jointes (octets)
+            compress_workers: Processus de compression des images (None = nombre de cœurs, 0 = sans pool)
+            pipeline_depth: Pages préparées à l'avance pendant la compression
+                            (None = min(compress_workers, DEFAULT_PIPELINE_DEPTH), 0 = aucune)
+            quantize_images: Réduire les PNG trop grands à 256 couleurs avant de les redimensionner
+            upload_images: Joindre les images aux pages et les référencer (<ac:image>) au lieu de les inclure en base64
+            discovery: 'cql' (seules les pages trouvées par la recherche Gliffy sont téléchargées)
+                       ou 'scan' (toutes les pages de chaque espace)
         """
-        super().__init__(confluence_url, username, api_token)
+        super().__init__(
+            confluence_url, username, api_token,
+            workers=workers, max_retries=max_retries, rate_limit=rate_limit,
+            pool_maxsize=pool_maxsize, pool_block=pool_block,
+            connect_timeout=connect_timeout, read_timeout=read_timeout
+        )
         self.spaces_filter = set(spaces) if spaces else None
         self.page_id_filter = page_id
         self.force = force
+        self.batch_updates = batch_updates
+        self.upload_images = upload_images
+        self.discovery = discovery
+        self.attachment_cache = AttachmentCache(cache_dir, cache_max_bytes) if cache_dir else None
+        # Pièces jointes listées une fois par page et par exécution
+        self.attachment_indexes = AttachmentIndexes(self.get_attachments)
+        # Compression des grandes images dans un pool de processus ; autant de pages
+        # sont préparées à l'avance (téléchargements) pendant que le pool travaille
+        self.compression = CompressionPool(compress_workers, quantize=quantize_images)
+        if pipeline_depth is None:
+            self.pipeline_depth = min(self.compression.workers, DEFAULT_PIPELINE_DEPTH)
+        else:
+            self.pipeline_depth = max(0, int(pipeline_depth))
+        self.journal = MigrationJournal(journal_file)
+        self.resume = resume
+        # Pages déjà faites et espaces terminés lors des runs précédents (--resume)
+        self.done_pages = set()
+        self.done_spaces = set()
+        # Espaces dont des pages sont déjà faites : listés sans le contenu des pages
+        self.resumed_spaces = set()
+        # Pages en erreur lors des runs précédents (ID -> dernier résultat), retentées
+        self.retry_pages = {}
         
         # Statistiques et rapport
         self.stats = {
@@ -90,93 +164,57 @@ class GliffyMigrator(ConfluenceBase):
     
     def get_all_pages(self, space_key: str, include_drafts: bool = True) -> List[Dict]:
         """Récupère toutes les pages d'un espace."""
-        return super().get_all_pages(space_key, include_drafts, expand='body.storage,version')
+        return super().get_all_pages(space_key, include_drafts, expand=expand_fields('migrate'))
+    
+    def iter_pages(self, space_key: str, include_drafts: bool = True, raise_on_error: bool = False, with_body: bool = True) -> Iterator[Dict]:
+        """Parcourt les pages d'un espace au fil de la pagination (sans le contenu si with_body est False)."""
+        expand = expand_fields('migrate') if with_body else expand_fields('migrate-lite')
+        return super().iter_pages(space_key, include_drafts, expand=expand, raise_on_error=raise_on_error)
     
     def get_page_details(self, page_id: str) -> Optional[Dict]:
         """Récupère les détails d'une page spécifique."""
-        return super().get_page_details(page_id, expand='body.storage,space,version')
+        return super().get_page_details(page_id, expand=expand_fields('migrate', 'space'))
     
     def extract_gliffy_attachments_from_content(self, body_storage: str, page_id: str = "Inconnue") -> List[Dict]:
         """Extrait les IDs d'attachments Gliffy depuis le contenu d'une page."""
         gliffy_attachments = []
         
-        gliffy_macro_pattern = r'<ac:structured-macro[^>]*ac:name=["\']gliffy["\'][^>]*>.*?</ac:structured-macro>'
-        gliffy_macros = re.findall(gliffy_macro_pattern, body_storage, re.DOTALL | re.IGNORECASE)
-        
-        for macro in gliffy_macros:
-            # Paramètres standards Cloud
-            image_att_id = re.search(r'<ac:parameter[^>]*ac:name=["\']imageAttachmentId["\'][^>]*>([^<]+)</ac:parameter>', macro, re.IGNORECASE)
-            diagram_att_id = re.search(r'<ac:parameter[^>]*ac:name=["\']diagramAttachmentId["\'][^>]*>([^<]+)</ac:parameter>', macro, re.IGNORECASE)
-            
-            # Paramètres alternatifs (souvent sur Data Center)
-            name_param = re.search(r'<ac:parameter[^>]*ac:name=["\']name["\'][^>]*>([^<]+)</ac:parameter>', macro, re.IGNORECASE)
-            filename_param = re.search(r'<ac:parameter[^>]*ac:name=["\']filename["\'][^>]*>([^<]+)</ac:parameter>', macro, re.IGNORECASE)
-            id_param = re.search(r'<ac:parameter[^>]*ac:name=["\']id["\'][^>]*>([^<]+)</ac:parameter>', macro, re.IGNORECASE)
-            macro_id_param = re.search(r'<ac:parameter[^>]*ac:name=["\']macroId["\'][^>]*>([^<]+)</ac:parameter>', macro, re.IGNORECASE)
-            
-            att_id = image_att_id.group(1).strip() if image_att_id else None
-            diagram_att_id_value = diagram_att_id.group(1).strip() if diagram_att_id else None
-            
-            # Si on n'a toujours pas d'ID d'attachement ou si c'est 'test' (placeholder DC), on essaie d'utiliser les autres paramètres trouvés
-            if not att_id or att_id == 'test':
-                if id_param and id_param.group(1).strip() != 'test':
-                    att_id = id_param.group(1).strip()
-                elif name_param:
-                    att_id = name_param.group(1).strip()
-                elif filename_param:
-                    att_id = filename_param.group(1).strip()
-                elif id_param: # Fallback sur 'test' si vraiment rien d'autre
-                    att_id = id_param.group(1).strip()
-
-            if not diagram_att_id_value or diagram_att_id_value == 'test':
-                if diagram_att_id:
-                    diagram_att_id_value = diagram_att_id.group(1).strip()
-                else:
-                    diagram_att_id_value = att_id
-
-            macro_id_value = macro_id_param.group(1).strip() if macro_id_param else None
-            diagram_name = name_param.group(1).strip() if name_param else None
+        for macro in find_gliffy_macros(body_storage):
+            gliffy_att = gliffy_attachment_info(macro)
+            att_id = gliffy_att['attachmentId']
+            diagram_att_id_value = gliffy_att['diagramAttachmentId']
             
             # On ajoute à la liste si on a trouvé AU MOINS une info permettant d'identifier le Gliffy
-            if att_id or diagram_att_id_value or diagram_name or macro_id_value:
+            if att_id or diagram_att_id_value or gliffy_att['diagramName'] or gliffy_att['macroId']:
                 # Debug : logger les IDs suspects ou les infos sur DC
                 if att_id == 'test' or diagram_att_id_value == 'test' or not (att_id or diagram_att_id_value):
                     print(f"  🔍 Macro Gliffy détectée sur la page '{page_id}':")
-                    if image_att_id: print(f"     - imageAttachmentId: {image_att_id.group(1)}")
-                    if diagram_att_id: print(f"     - diagramAttachmentId: {diagram_att_id.group(1)}")
-                    if name_param: print(f"     - name: {name_param.group(1)}")
-                    if filename_param: print(f"     - filename: {filename_param.group(1)}")
-                    if id_param: print(f"     - id: {id_param.group(1)}")
-                    if macro_id_param: print(f"     - macroId: {macro_id_param.group(1)}")
+                    for parameter in ('imageAttachmentId', 'diagramAttachmentId', 'name', 'filename', 'id', 'macroId'):
+                        if macro.get(parameter) is not None:
+                            print(f"     - {parameter}: {macro.get(parameter)}")
                     
                     if att_id == 'test' or diagram_att_id_value == 'test':
                         print(f"  ℹ️  Valeur 'test' détectée. Sur Data Center, le script va tenter de résoudre l'image par son nom.")
 
-                gliffy_attachments.append({
-                    'attachmentId': att_id,
-                    'diagramAttachmentId': diagram_att_id_value or att_id,
-                    'macroId': macro_id_value,
-                    'diagramName': diagram_name,
-                    'macroHtml': macro
-                })
+                gliffy_attachments.append(gliffy_att)
         
         return gliffy_attachments
     
-    def extract_treatment_date(self, body_storage: str, macro_html: str) -> Optional[datetime]:
+    def extract_treatment_date(self, body_storage: str, macro_html: str, index: Optional[MacroIndex] = None) -> Optional[datetime]:
         """
         Extrait la date de traitement depuis le marqueur dans la page.
         Retourne None si aucun marqueur trouvé.
         """
-        # Échapper la macro pour la recherche
-        escaped_macro = re.escape(macro_html)
+        if index is None:
+            index = MacroIndex(body_storage)
         
-        # Chercher la macro dans le body
-        macro_match = re.search(escaped_macro, body_storage, re.DOTALL | re.IGNORECASE)
-        if not macro_match:
+        # Chercher la macro exacte dans le body
+        position = index.find_exact(macro_html)
+        if position is None:
             return None
         
         # Extraire le texte après la macro (les 2000 premiers caractères)
-        after_macro = body_storage[macro_match.end():macro_match.end() + 2000]
+        after_macro = index.text_after(position)[:2000]
         
         # Chercher le marqueur de date de traitement dans un commentaire HTML
         # Format: <!-- GLIFFY_TREATED: 2025-12-30T14:27:19.123456 -->
@@ -213,87 +251,50 @@ class GliffyMigrator(ConfluenceBase):
         
         return None
     
-    def find_macro_in_body(self, body_storage: str, gliffy_att: Union[str, Dict]) -> Optional[re.Match]:
-        """
-        Trouve la macro Gliffy dans le body en utilisant plusieurs stratégies.
-        Retourne le match de la macro trouvée ou None.
+    def find_macro_in_body(
+        self,
+        body_storage: str,
+        gliffy_att: Union[str, Dict],
+        index: Optional[MacroIndex] = None
+    ) -> Optional[Tuple[int, int]]:
         """
-        if isinstance(gliffy_att, dict):
-            macro_html = gliffy_att.get('macroHtml', '')
-        else:
-            macro_html = gliffy_att
-
-        if not macro_html:
-            return None
-
-        # Stratégie 1: Chercher avec la macro exacte
-        escaped_macro = re.escape(macro_html)
-        macro_match = re.search(escaped_macro, body_storage, re.DOTALL | re.IGNORECASE)
-        if macro_match:
-            return macro_match
-        
-        # Stratégie 2: Extraire l'ID de la macro ou du diagramme pour une recherche plus flexible
-        macro_id_match = re.search(r'ac:parameter[^>]*ac:name=["\']macroId["\'][^>]*>([^<]+)</ac:parameter>', macro_html, re.IGNORECASE)
-        diagram_att_id_match = re.search(r'ac:parameter[^>]*ac:name=["\']diagramAttachmentId["\'][^>]*>([^<]+)</ac:parameter>', macro_html, re.IGNORECASE)
-        image_att_id_match = re.search(r'ac:parameter[^>]*ac:name=["\']imageAttachmentId["\'][^>]*>([^<]+)</ac:parameter>', macro_html, re.IGNORECASE)
-        
-        macro_id = macro_id_match.group(1).strip() if macro_id_match else None
-        diagram_att_id = diagram_att_id_match.group(1).strip() if diagram_att_id_match else None
-        image_att_id = image_att_id_match.group(1).strip() if image_att_id_match else None
-        
-        # Chercher toutes les macros Gliffy
-        gliffy_macro_pattern = r'<ac:structured-macro[^>]*ac:name=["\']gliffy["\'][^>]*>.*?</ac:structured-macro>'
-        all_macros = list(re.finditer(gliffy_macro_pattern, body_storage, re.DOTALL | re.IGNORECASE))
-        
-        if not all_macros:
-            return None
-        
-        # Si on a un macroId, chercher la macro correspondante (le plus fiable)
-        if macro_id:
-            for macro in all_macros:
-                macro_content = macro.group(0)
-                # Chercher le macroId dans cette macro
-                macro_id_in_content = re.search(r'ac:parameter[^>]*ac:name=["\']macroId["\'][^>]*>([^<]+)</ac:parameter>', macro_content, re.IGNORECASE)
-                if macro_id_in_content and macro_id_in_content.group(1).strip() == macro_id:
-                    return macro
-        
-        # Si on a un diagramAttachmentId ou imageAttachmentId, chercher la macro correspondante
-        if diagram_att_id or image_att_id:
-            for macro in all_macros:
-                macro_content = macro.group(0)
-                # Chercher les IDs dans cette macro
-                diagram_id_in_content = re.search(r'ac:parameter[^>]*ac:name=["\']diagramAttachmentId["\'][^>]*>([^<]+)</ac:parameter>', macro_content, re.IGNORECASE)
-                image_id_in_content = re.search(r'ac:parameter[^>]*ac:name=["\']imageAttachmentId["\'][^>]*>([^<]+)</ac:parameter>', macro_content, re.IGNORECASE)
-                
-                diagram_id_value = diagram_id_in_content.group(1).strip() if diagram_id_in_content else None
-                image_id_value = image_id_in_content.group(1).strip() if image_id_in_content else None
-                
-                if (diagram_att_id and diagram_id_value == diagram_att_id) or (image_att_id and image_id_value == image_att_id):
-                    return macro
+        Trouve la macro Gliffy dans le body en utilisant plusieurs stratégies
+        (texte exact, macroId, diagramAttachmentId/imageAttachmentId, première macro).
+        Retourne les positions (début, fin) de la macro trouvée ou None.
         
-        # Sinon, utiliser la première macro trouvée (on suppose qu'on traite dans l'ordre)
-        return all_macros[0] if all_macros else None
+        Args:
+            index: Index des macros du body (évite une nouvelle analyse)
+        """
+        if index is None:
+            index = MacroIndex(body_storage)
+        position = self._find_macro_position(index, gliffy_att)
+        return index.span(position) if position is not None else None
+    
+    def _find_macro_position(self, index: MacroIndex, gliffy_att: Union[str, Dict]) -> Optional[int]:
+        macro_html = gliffy_att.get('macroHtml', '') if isinstance(gliffy_att, dict) else gliffy_att
+        return index.find(macro_html)
     
-    def is_page_already_processed(self, body_storage: str, gliffy_att: Dict) -> Tuple[bool, Optional[str]]:
+    def is_page_already_processed(
+        self,
+        body_storage: str,
+        gliffy_att: Dict,
+        index: Optional[MacroIndex] = None
+    ) -> Tuple[bool, Optional[str]]:
         """
         Vérifie si cette macro spécifique a déjà été traitée.
         """
-        macro_match = self.find_macro_in_body(body_storage, gliffy_att)
-        if not macro_match:
+        if index is None:
+            index = MacroIndex(body_storage)
+        position = self._find_macro_position(index, gliffy_att)
+        if position is None:
             return False, None
-            
-        # Extraire le texte après la macro
-        after_macro_start = macro_match.end()
-        after_macro_full = body_storage[after_macro_start:]
         
-        # Trouver la fin du bloc de cette macro (jusqu'à la prochaine macro Gliffy)
+        # Extraire le texte après la macro, jusqu'à la prochaine macro Gliffy
         # On limite la recherche pour ne pas détecter l'image d'un AUTRE Gliffy plus loin sur la page
-        next_macro_match = re.search(r'<ac:structured-macro[^>]*ac:name=["\']gliffy["\']', after_macro_full, re.IGNORECASE)
-        if next_macro_match:
-            after_macro = after_macro_full[:next_macro_match.start()]
-        else:
+        after_macro = index.text_after(position)
+        if not index.has_next(position):
             # Si pas d'autre macro, on limite à 5000 caractères après la macro
-            after_macro = after_macro_full[:5000]
+            after_macro = after_macro[:5000]
         
         # ID à chercher
         att_id = gliffy_att.get('attachmentId')
@@ -319,123 +320,60 @@ class GliffyMigrator(ConfluenceBase):
         """
         Supprime l'image existante après la macro Gliffy.
         """
-        macro_match = self.find_macro_in_body(body_storage, gliffy_att)
-        if not macro_match:
-            return body_storage
+        index = MacroIndex(body_storage)
+        self._remove_existing_image(index, gliffy_att)
+        return index.body
+    
+    def _remove_existing_image(self, index: MacroIndex, gliffy_att: Dict):
+        """Supprime l'image existante après la macro dans l'index (positions suivantes décalées)."""
+        position = self._find_macro_position(index, gliffy_att)
+        if position is None:
+            return
             
-        after_macro_start = macro_match.end()
-        after_macro = body_storage[after_macro_start:after_macro_start + 5000]
+        after_macro = index.text_after(position)[:5000]
         
         # Pattern pour supprimer le bloc complet (marqueur + paragraphe avec image)
-        # On cherche un paragraphe qui contient une image data:image
-        block_pattern = r'(?:<!--\s*GLIFFY_TREATED:[^>]*-->[\s\n]*)?<p><strong>📊?\s*Diagramme\s+Gliffy[^<]*</strong>.*?<img[^>]*src=["\']data:image/[^"\']*;base64,[^"\']*["\'][^>]*>.*?</p>'
+        # On cherche un paragraphe qui contient une image data:image ou une image jointe (<ac:image>)
+        block_pattern = r'(?:<!--\s*GLIFFY_TREATED:[^>]*-->[\s\n]*)?<p><strong>📊?\s*Diagramme\s+Gliffy[^<]*</strong>.*?(?:<img[^>]*src=["\']data:image/[^"\']*;base64,[^"\']*["\'][^>]*>|<ac:image[^>]*>.*?</ac:image>).*?</p>'
         
         match = re.search(block_pattern, after_macro, re.IGNORECASE | re.DOTALL)
         if match:
             # Vérifier qu'aucune autre macro n'est au milieu
             between_text = after_macro[:match.start()]
             if "<ac:structured-macro" not in between_text:
-                return body_storage[:after_macro_start + match.start()] + body_storage[after_macro_start + match.end():]
-                
-        return body_storage
+                index.replace_after(position, match.start(), match.end(), '')
     
-    def compress_image(self, image_content: bytes, mime_type: str, max_size_bytes: int = 3_500_000) -> Tuple[bytes, str]:
+    def compress_image(self, image_content: bytes, mime_type: str, max_size_bytes: int = DEFAULT_MAX_IMAGE_BYTES) -> Tuple[bytes, str]:
         """
         Compresse et réduit une image si nécessaire pour qu'elle rentre dans la limite de taille.
         
-        Args:
-            image_content: Contenu de l'image en bytes
-            mime_type: Type MIME de l'image
-            max_size_bytes: Taille maximale cible en bytes
-            
+        Compression synchrone ; la migration passe par la file self.compression.
+        
         Returns:
             Tuple (image_content_compressed, mime_type)
         """
-        if not PIL_AVAILABLE:
-            return (image_content, mime_type)
-        
-        # Ne compresser que les PNG et JPEG
-        if 'png' not in mime_type.lower() and 'jpeg' not in mime_type.lower() and 'jpg' not in mime_type.lower():
-            return (image_content, mime_type)
-        
-        try:
-            # Ouvrir l'image
-            img = Image.open(io.BytesIO(image_content))
-            original_format = img.format
-            
-            # Si l'image est déjà assez petite, la retourner telle quelle
-            if len(image_content) <= max_size_bytes:
-                return (image_content, mime_type)
-            
-            # Calculer le facteur de réduction nécessaire
-            size_ratio = (max_size_bytes / len(image_content)) ** 0.5  # Racine carrée pour réduire proportionnellement
-            
-            # Réduire la taille de l'image (largeur et hauteur)
-            new_width = int(img.width * size_ratio)
-            new_height = int(img.height * size_ratio)
-            
-            # S'assurer que les dimensions ne sont pas trop petites (minimum 200px)
-            new_width = max(200, new_width)
-            new_height = max(200, new_height)
-            
-            # Redimensionner l'image avec un filtre de qualité
-            img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # Convertir en RGB si nécessaire (pour JPEG)
-            if original_format == 'JPEG' and img_resized.mode != 'RGB':
-                img_resized = img_resized.convert('RGB')
-            
-            # Compresser l'image
-            output = io.BytesIO()
-            quality = 85  # Qualité initiale
-            
-            # Essayer différentes qualités jusqu'à obtenir une taille acceptable
-            for attempt_quality in [85, 75, 65, 55, 45]:
-                output.seek(0)
-                output.truncate(0)
-                
-                if original_format == 'PNG':
-                    # Pour PNG, utiliser optimize=True et compress_level
-                    img_resized.save(output, format='PNG', optimize=True, compress_level=9)
-                else:
-                    # Pour JPEG
-                    img_resized.save(output, format='JPEG', quality=attempt_quality, optimize=True)
-                
-                compressed_size = len(output.getvalue())
-                if compressed_size <= max_size_bytes:
-                    break
-                
-                # Si toujours trop grand, réduire encore la taille
-                if attempt_quality == 45 and compressed_size > max_size_bytes:
-                    # Réduire encore plus la taille de l'image
-                    size_ratio = (max_size_bytes / compressed_size) ** 0.5
-                    new_width = max(200, int(new_width * size_ratio))
-                    new_height = max(200, int(new_height * size_ratio))
-                    img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                    if original_format == 'JPEG' and img_resized.mode != 'RGB':
-                        img_resized = img_resized.convert('RGB')
-                    output.seek(0)
-                    output.truncate(0)
-                    if original_format == 'PNG':
-                        img_resized.save(output, format='PNG', optimize=True, compress_level=9)
-                    else:
-                        img_resized.save(output, format='JPEG', quality=45, optimize=True)
-            
-            compressed_content = output.getvalue()
-            compressed_mime_type = 'image/png' if original_format == 'PNG' else 'image/jpeg'
-            
-            # Vérifier que la compression a fonctionné
-            if len(compressed_content) < len(image_content):
-                return (compressed_content, compressed_mime_type)
-            else:
-                # Si la compression n'a pas réduit la taille, retourner l'original
-                return (image_content, mime_type)
-                
-        except Exception as e:
-            # En cas d'erreur, retourner l'image originale
-            return (image_content, mime_type)
+        return compress_image(image_content, mime_type, max_size_bytes, self.compression.quantize)
     
     def download_attachment_direct(self, page_id: str, attachment_id: str, is_draft: bool = False) -> Tuple[Optional[bytes], Optional[str], Optional[str]]:
+        """
+        Télécharge un attachment, en passant par le cache local s'il est activé.
+
+        La version actuelle de l'attachment est lue dans l'index des pièces
+        jointes de la page (ou relue dans Confluence s'il n'y figure pas) : le
+        contenu en cache n'est réutilisé que si la version n'a pas changé.
+        Retourne (content, mime_type, error_msg)
+        """
+        if self.attachment_cache is None:
+            return self._download_attachment(page_id, attachment_id, is_draft)
+        version = self.attachment_indexes.get(page_id).version(attachment_id)
+        if version is None:
+            version = get_attachment_version(self.http, self.api_base, attachment_id)
+        return self.attachment_cache.fetch(
+            page_id, attachment_id, version,
+            lambda: self._download_attachment(page_id, attachment_id, is_draft)
+        )
+    
+    def _download_attachment(self, page_id: str, attachment_id: str, is_draft: bool = False) -> Tuple[Optional[bytes], Optional[str], Optional[str]]:
         """
         Télécharge un attachment directement via l'API REST.
         Retourne (content, mime_type, error_msg)
@@ -450,7 +388,7 @@ class GliffyMigrator(ConfluenceBase):
             # Utiliser un header Accept large pour le téléchargement binaire
             # et outrepasser le Accept: application/json de la session
             headers = {'Accept': '*/*'}
-            download_response = self.session.get(download_api_url, params=params, headers=headers, timeout=30)
+            download_response = self.http.get(download_api_url, params=params, headers=headers)
             
             if download_response.status_code == 200:
                 content = download_response.content
@@ -473,7 +411,7 @@ class GliffyMigrator(ConfluenceBase):
             if attachment_id.startswith('att'):
                 attachment_id_no_prefix = attachment_id[3:]
                 download_api_url = f"{self.api_base}/content/{page_id}/child/attachment/{attachment_id_no_prefix}/download"
-                download_response = self.session.get(download_api_url, params=params, headers=headers, timeout=30)
+                download_response = self.http.get(download_api_url, params=params, headers=headers)
                 
                 if download_response.status_code == 200:
                     content = download_response.content
@@ -495,29 +433,22 @@ class GliffyMigrator(ConfluenceBase):
             # Nouveau fallback pour Data Center : si l'ID n'est pas numérique, essayer de trouver par nom
             if attachment_id and not attachment_id.isdigit() and not attachment_id.startswith('att'):
                 print(f"     🔍 Recherche de l'attachment par nom '{attachment_id}' (Data Center fallback)...")
-                page_attachments = self.get_attachments(page_id)
+                page_attachments = self.attachment_indexes.get(page_id)
                 
                 # Nettoyer le nom au cas où (supprimer les éventuels tags HTML si mal extraits)
                 search_name = attachment_id.strip()
                 
-                # Chercher une correspondance exacte d'abord
-                for att in page_attachments:
-                    title = att.get('title', '')
-                    if title == search_name or title == f"{search_name}.png" or title == f"{search_name}.svg" or title == f"{search_name}.gliffy":
-                        att_real_id = att.get('id')
-                        if att_real_id:
-                            print(f"     ✅ Trouvé ID {att_real_id} pour '{title}'")
-                            return self.download_attachment_direct(page_id, att_real_id, is_draft)
+                # Chercher une correspondance exacte d'abord (image du diagramme en priorité)
+                att = page_attachments.find_title(search_name)
+                if att and att.get('id'):
+                    print(f"     ✅ Trouvé ID {att['id']} pour '{att.get('title')}'")
+                    return self.download_attachment_direct(page_id, att['id'], is_draft)
                 
                 # Sinon chercher si le nom est contenu dans le titre (plus souple)
-                for att in page_attachments:
-                    title = att.get('title', '').lower()
-                    sn_lower = search_name.lower()
-                    if (sn_lower in title) and (title.endswith('.png') or title.endswith('.svg') or title.endswith('.gliffy')):
-                        att_real_id = att.get('id')
-                        if att_real_id:
-                            print(f"     ✅ Trouvé ID {att_real_id} par recherche souple pour '{att.get('title')}'")
-                            return self.download_attachment_direct(page_id, att_real_id, is_draft)
+                att = page_attachments.search_title(search_name)
+                if att and att.get('id'):
+                    print(f"     ✅ Trouvé ID {att['id']} par recherche souple pour '{att.get('title')}'")
+                    return self.download_attachment_direct(page_id, att['id'], is_draft)
                 
                 print(f"     ❌ Impossible de trouver un attachment correspondant à '{search_name}'")
             
@@ -530,6 +461,202 @@ class GliffyMigrator(ConfluenceBase):
         except Exception as e:
             return (None, None, f"Exception: {str(e)}")
     
+    def build_image_html(self, image_content: bytes, mime_type: str, gliffy_att: Dict, filename: Optional[str] = None) -> str:
+        """
+        Construit le bloc HTML (marqueur de traitement + image) inséré sous une macro.
+        
+        Avec filename, l'image est la pièce jointe de la page portant ce nom
+        (<ac:image>) ; sinon elle est incluse en base64.
+        """
+        attachment_id = gliffy_att.get('attachmentId')
+        diagram_name = gliffy_att.get('diagramName')
+        
+        # ID unique pour le marquage dans l'alt
+        unique_tag = f"[ID:{attachment_id}]"
+        if diagram_name:
+            escaped_name = escape(diagram_name)
+            title_text = f"📊 Diagramme Gliffy exporté: {escaped_name}"
+            alt_text = f"Diagramme Gliffy exporté: {escaped_name} {unique_tag}"
+        else:
+            title_text = "📊 Diagramme Gliffy exporté"
+            alt_text = f"Diagramme Gliffy exporté {unique_tag}"
+        
+        treatment_date = datetime.now(timezone.utc).isoformat()
+        treatment_marker = f'<!-- GLIFFY_TREATED: {treatment_date} -->'
+        
+        if filename:
+            image_tag = f'<ac:image ac:alt="{escape(alt_text)}" ac:title="{escape(alt_text)}"><ri:attachment ri:filename="{escape(filename)}" /></ac:image>'
+        else:
+            image_base64 = base64.b64encode(image_content).decode('utf-8')
+            image_data_url = f"data:{mime_type};base64,{image_base64}"
+            image_tag = f'<img src="{image_data_url}" alt="{escape(alt_text)}" title="{escape(alt_text)}" />'
+        return f'{treatment_marker}\n<p><strong>{title_text}</strong><br/>{image_tag}</p>'
+    
+    def image_filename(self, gliffy_att: Dict, mime_type: str) -> str:
+        """Nom de la pièce jointe contenant l'image exportée d'une macro (stable d'un run à l'autre)."""
+        source_id = gliffy_att.get('attachmentId') or gliffy_att.get('macroId') or 'gliffy'
+        extension = {'image/svg+xml': 'svg', 'image/jpeg': 'jpg'}.get(mime_type, 'png')
+        safe_id = re.sub(r'[^\w.-]', '_', source_id)
+        return f"gliffy-export-{safe_id}.{extension}"
+    
+    def upload_image(self, page_id: str, image_content: bytes, mime_type: str, gliffy_att: Dict, is_draft: bool = False) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Joint l'image exportée d'une macro à la page (nouvelle version si elle est déjà jointe).
+        
+        Si la pièce jointe existante contient déjà cette image (envoi d'un run dont
+        la mise à jour de la page a échoué, reprise), elle est réutilisée sans
+        créer de nouvelle version.
+        
+        Returns:
+            Tuple (nom de la pièce jointe, message d'erreur)
+        """
+        filename = self.image_filename(gliffy_att, mime_type)
+        existing = self.attachment_indexes.get(page_id).by_title.get(filename)
+        if existing and self._is_same_attachment(page_id, existing, image_content, is_draft):
+            return (filename, None)
+        attachment, error = self.upload_attachment(
+            page_id, filename, image_content, mime_type,
+            attachment_id=existing.get('id') if existing else None,
+            is_draft=is_draft,
+            comment="Export du diagramme Gliffy"
+        )
+        # La liste des pièces jointes de la page a changé
+        self.attachment_indexes.invalidate(page_id)
+        if not attachment:
+            return (None, error)
+        # Contenu envoyé mis en cache : un nouvel essai le compare sans le télécharger
+        version = (attachment.get('version') or {}).get('number')
+        if self.attachment_cache is not None and attachment.get('id') and version is not None:
+            self.attachment_cache.put(page_id, attachment['id'], int(version), image_content, mime_type)
+        return (filename, None)
+    
+    def _is_same_attachment(self, page_id: str, attachment: Dict, content: bytes, is_draft: bool = False) -> bool:
+        """
+        Indique si une pièce jointe contient déjà content.
+        
+        Une taille différente (extensions.fileSize) suffit à conclure ; sinon le
+        contenu est comparé, lu dans le cache local s'il est activé.
+        """
+        file_size = (attachment.get('extensions') or {}).get('fileSize')
+        try:
+            if file_size is not None and int(file_size) != len(content):
+                return False
+        except (TypeError, ValueError):
+            pass
+        existing, _, _ = self.download_attachment_direct(page_id, attachment.get('id'), is_draft)
+        return existing == content
+    
+    def render_image_html(self, page_id: str, image_content: bytes, mime_type: str, gliffy_att: Dict, is_draft: bool = False) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Prépare le bloc inséré sous une macro : image en base64, ou jointe à la page (--upload-images).
+        
+        Returns:
+            Tuple (bloc HTML, message d'erreur)
+        """
+        if not self.upload_images:
+            return (self.build_image_html(image_content, mime_type, gliffy_att), None)
+        filename, error = self.upload_image(page_id, image_content, mime_type, gliffy_att, is_draft)
+        if not filename:
+            return (None, error)
+        return (self.build_image_html(image_content, mime_type, gliffy_att, filename), None)
+    
+    def insert_html_after_macro(self, body_storage: str, gliffy_att: Dict, image_html: str) -> str:
+        """Insère le bloc image juste après la macro (en fin de page si la macro est introuvable)."""
+        index = MacroIndex(body_storage)
+        self._insert_html_after_macro(index, gliffy_att, image_html)
+        return index.body
+    
+    def _insert_html_after_macro(self, index: MacroIndex, gliffy_att: Dict, image_html: str):
+        """Insère le bloc image après la macro dans l'index (positions suivantes décalées)."""
+        position = self._find_macro_position(index, gliffy_att)
+        if position is not None:
+            index.insert_after(position, image_html)
+        else:
+            index.append(image_html)
+    
+    def update_page_body(
+        self,
+        page_id: str,
+        title: str,
+        space_key: str,
+        new_body: str,
+        version_num: int,
+        is_draft: bool = False,
+        on_conflict=None
+    ) -> Tuple[bool, Optional[str]]:
+        """
+        Enregistre le nouveau contenu d'une page (PUT), avec une seule reprise sur conflit 409.
+        
+        Args:
+            page_id: ID de la page
+            title: Titre de la page
+            space_key: Clé de l'espace
+            new_body: Nouveau contenu (format storage)
+            version_num: Version de la page sur laquelle new_body a été construit
+            is_draft: Page en brouillon (la version n'est pas incrémentée)
+            on_conflict: Fonction optionnelle (page_data) -> nouveau contenu, appelée
+                         sur la page relue en cas de 409 pour ré-appliquer les
+                         modifications ; sans elle, le même contenu est renvoyé
+        
+        Returns:
+            Tuple (succès, nouveau contenu ou message d'erreur)
+        """
+        url = f"{self.api_base}/content/{page_id}"
+        params = {'expand': expand_fields('migrate', 'space')}
+        if is_draft:
+            params['status'] = 'draft'
+        
+        # Pour les drafts, utiliser la version actuelle sans incrément
+        version_number = version_num if is_draft else (version_num + 1)
+        
+        update_data = {
+            'id': page_id,
+            'type': 'page',
+            'title': title,
+            'space': {'key': space_key},
+            'body': {'storage': {'value': new_body, 'representation': 'storage'}},
+            'version': {'number': version_number}
+        }
+        
+        update_response = self.http.put(url, json=update_data, params=params)
+        if update_response.status_code == 200:
+            return (True, new_body)
+        elif update_response.status_code == 409:
+            # Conflit de version - relire la page une seule fois et réessayer
+            try:
+                current_response = self.http.get(url, params=params)
+                if current_response.status_code == 200:
+                    current_data = current_response.json()
+                    current_version = current_data.get('version', {}).get('number', version_num)
+                    if on_conflict is not None:
+                        new_body = on_conflict(current_data)
+                        update_data['body']['storage']['value'] = new_body
+                        update_data['version'] = {'number': current_version if is_draft else current_version + 1}
+                    else:
+                        update_data['version'] = {'number': current_version}
+                    retry_response = self.http.put(url, json=update_data, params=params)
+                    if retry_response.status_code == 200:
+                        return (True, new_body)
+                    else:
+                        return (False, f"Erreur HTTP {retry_response.status_code} lors de la mise à jour (conflit de version)")
+                else:
+                    return (False, f"Erreur HTTP {current_response.status_code} lors de la récupération de la version")
+            except Exception as e:
+                return (False, f"Exception lors de la gestion du conflit de version: {str(e)}")
+        elif update_response.status_code == 403:
+            return (False, "Permission refusée (403) - Vérifiez vos droits d'écriture sur cette page")
+        elif update_response.status_code == 404:
+            return (False, "Page non trouvée (404)")
+        elif update_response.status_code == 413:
+            size_msg = f"({len(new_body.encode('utf-8')) / 1_000_000:.2f} MB)"
+            return (False, f"Requête trop grande (413) - Le contenu de la page avec les images encodées {size_msg} dépasse la limite de 5 MB de Confluence. Solution: relancez avec --upload-images (images jointes à la page), réduisez la taille du diagramme Gliffy dans l'éditeur Gliffy ou divisez-le en plusieurs diagrammes plus petits.")
+        else:
+            try:
+                error_detail = update_response.json().get('message', '')
+                return (False, f"Erreur HTTP {update_response.status_code}: {error_detail}")
+            except:
+                return (False, f"Erreur HTTP {update_response.status_code} lors de la mise à jour")
+    
     def insert_image_after_macro(
         self,
         page_id: str,
@@ -543,16 +670,12 @@ class GliffyMigrator(ConfluenceBase):
     ) -> Tuple[bool, Optional[str]]:
         """Insère une image PNG après la macro Gliffy."""
         try:
-            attachment_id = gliffy_att.get('attachmentId')
-            diagram_name = gliffy_att.get('diagramName')
-            macro_html = gliffy_att.get('macroHtml', '')
-            
             url = f"{self.api_base}/content/{page_id}"
-            params = {'expand': 'body.storage,version,space,title'}
+            params = {'expand': expand_fields('migrate', 'space')}
             if is_draft:
                 params['status'] = 'draft'
             
-            response = self.session.get(url, params=params)
+            response = self.http.get(url, params=params)
             if response.status_code != 200:
                 return (False, None)
             
@@ -562,102 +685,198 @@ class GliffyMigrator(ConfluenceBase):
             title = page_data.get('title', page_title)
             space_key_from_api = page_data.get('space', {}).get('key', space_key)
             
+            # Un seul index des macros pour la vérification et l'insertion
+            index = MacroIndex(current_body)
+            
             # Vérifier idempotence encore une fois juste avant l'insertion
             if not self.force:
-                is_processed, reason = self.is_page_already_processed(current_body, gliffy_att)
+                is_processed, reason = self.is_page_already_processed(current_body, gliffy_att, index)
                 if is_processed:
                     return (False, "already_processed")
-                else:
-                    current_body = self.remove_existing_image(current_body, gliffy_att)
-            
-            # ... (compression code) ...
-            image_base64 = base64.b64encode(image_content).decode('utf-8')
-            
-            # ID unique pour le marquage dans l'alt
-            unique_tag = f"[ID:{attachment_id}]"
-            if diagram_name:
-                escaped_name = escape(diagram_name)
-                title_text = f"📊 Diagramme Gliffy exporté: {escaped_name}"
-                alt_text = f"Diagramme Gliffy exporté: {escaped_name} {unique_tag}"
-            else:
-                title_text = "📊 Diagramme Gliffy exporté"
-                alt_text = f"Diagramme Gliffy exporté {unique_tag}"
-            
-            treatment_date = datetime.now(timezone.utc).isoformat()
-            treatment_marker = f'<!-- GLIFFY_TREATED: {treatment_date} -->'
-            
-            image_data_url = f"data:{mime_type};base64,{image_base64}"
-            image_html = f'{treatment_marker}\n<p><strong>{title_text}</strong><br/><img src="{image_data_url}" alt="{escape(alt_text)}" title="{escape(alt_text)}" /></p>'
-            
-            # Trouver la position de la macro
-            macro_match = self.find_macro_in_body(current_body, gliffy_att)
-            if macro_match:
-                insert_position = macro_match.end()
-                new_body = current_body[:insert_position] + image_html + current_body[insert_position:]
-            else:
-                new_body = current_body + image_html
-            
-            # Pour les drafts, utiliser la version actuelle sans incrément
-            version_number = version_num if is_draft else (version_num + 1)
-            
-            update_data = {
-                'id': page_id,
-                'type': 'page',
-                'title': title,
-                'space': {'key': space_key_from_api},
-                'body': {'storage': {'value': new_body, 'representation': 'storage'}},
-                'version': {'number': version_number}
-            }
+            # Avec --force, l'image insérée lors d'un précédent passage est remplacée
+            self._remove_existing_image(index, gliffy_att)
+
+            image_html, upload_error = self.render_image_html(page_id, image_content, mime_type, gliffy_att, is_draft)
+            if not image_html:
+                return (False, upload_error)
+            self._insert_html_after_macro(index, gliffy_att, image_html)
+            new_body = index.body
             
-            update_response = self.session.put(url, json=update_data, params=params)
-            if update_response.status_code == 200:
-                return (True, new_body)
-            elif update_response.status_code == 409:
-                # Conflit de version - réessayer avec la version actuelle
-                try:
-                    current_response = self.session.get(url, params=params)
-                    if current_response.status_code == 200:
-                        current_data = current_response.json()
-                        current_version = current_data.get('version', {}).get('number', version_num)
-                        update_data['version'] = {'number': current_version}
-                        retry_response = self.session.put(url, json=update_data, params=params)
-                        if retry_response.status_code == 200:
-                            return (True, new_body)
-                        else:
-                            return (False, f"Erreur HTTP {retry_response.status_code} lors de la mise à jour (conflit de version)")
-                    else:
-                        return (False, f"Erreur HTTP {current_response.status_code} lors de la récupération de la version")
-                except Exception as e:
-                    return (False, f"Exception lors de la gestion du conflit de version: {str(e)}")
-            elif update_response.status_code == 403:
-                return (False, "Permission refusée (403) - Vérifiez vos droits d'écriture sur cette page")
-            elif update_response.status_code == 404:
-                return (False, "Page non trouvée (404)")
-            elif update_response.status_code == 413:
-                # Calculer la taille pour le message d'erreur
-                try:
-                    base64_size = len(image_base64.encode('utf-8'))
-                    size_msg = f"({base64_size / 1_000_000:.2f} MB)"
-                except:
-                    size_msg = ""
-                return (False, f"Requête trop grande (413) - L'image encodée {size_msg} dépasse la limite de 5 MB de Confluence. Solution: réduisez la taille du diagramme Gliffy dans l'éditeur Gliffy ou divisez-le en plusieurs diagrammes plus petits.")
-            else:
-                try:
-                    error_detail = update_response.json().get('message', '')
-                    return (False, f"Erreur HTTP {update_response.status_code}: {error_detail}")
-                except:
-                    return (False, f"Erreur HTTP {update_response.status_code} lors de la mise à jour")
+            return self.update_page_body(page_id, title, space_key_from_api, new_body, version_num, is_draft)
         except requests.exceptions.Timeout:
             return (False, "Timeout lors de la requête API")
         except requests.exceptions.RequestException as e:
             return (False, f"Erreur de connexion: {str(e)}")
         except Exception as e:
             return (False, f"Exception inattendue: {str(e)}")
+    
+    def download_gliffy_image(self, page_id: str, attachment_id: str, is_draft: bool = False) -> Tuple[Optional[bytes], Optional[str], Optional[str]]:
+        """Télécharge l'image d'une macro, en réessayant sans le préfixe 'att' de l'ID."""
+        image_content, mime_type, download_error = self.download_attachment_direct(page_id, attachment_id, is_draft=is_draft)
         
-        return (False, "Erreur inconnue lors de l'insertion")
+        if not image_content and is_draft:
+            # Réessayer en forçant le status draft si pas déjà fait
+            image_content, mime_type, download_error = self.download_attachment_direct(page_id, attachment_id, True)
+        
+        if not image_content and attachment_id.startswith('att'):
+            attachment_id_no_prefix = attachment_id[3:]
+            image_content, mime_type, download_error = self.download_attachment_direct(page_id, attachment_id_no_prefix, is_draft=is_draft)
+            if not image_content and is_draft:
+                image_content, mime_type, download_error = self.download_attachment_direct(page_id, attachment_id_no_prefix, True)
+        
+        return (image_content, mime_type, download_error)
+    
+    def queue_gliffy_image(self, page_id: str, attachment_id: str, is_draft: bool = False) -> Tuple:
+        """
+        Télécharge l'image d'une macro et la place dans la file de compression.
+        
+        Returns:
+            Tuple (future de compression, contenu original, type MIME, message d'erreur)
+        """
+        image_content, mime_type, download_error = self.download_gliffy_image(page_id, attachment_id, is_draft)
+        if not image_content:
+            return (None, None, None, download_error)
+        if self.upload_images:
+            # Image jointe à la page : pas de limite de taille du contenu, elle est gardée telle quelle
+            future = Future()
+            future.set_result((image_content, mime_type))
+            return (future, image_content, mime_type, None)
+        return (self.compression.submit(image_content, mime_type), image_content, mime_type, None)
+    
+    def get_gliffy_image(self, page_id: str, attachment_id: str, is_draft: bool = False, queued: Optional[Tuple] = None) -> Tuple[Optional[bytes], Optional[str], Optional[str]]:
+        """
+        Retourne l'image d'une macro, compressée si nécessaire.
+        
+        Args:
+            queued: Résultat de queue_gliffy_image si l'image a été téléchargée
+                    lors de la préparation de la page (sinon elle est téléchargée ici)
+        
+        Returns:
+            Tuple (content, mime_type, error_msg)
+        """
+        if queued is None:
+            queued = self.queue_gliffy_image(page_id, attachment_id, is_draft)
+        future, image_content, mime_type, download_error = queued
+        if future is None:
+            return (None, None, download_error)
+        image_content, mime_type = self.compression.result(future, image_content, mime_type)
+        return (image_content, mime_type, None)
+    
+    def process_macros_batched(
+        self,
+        page: Dict,
+        space_key: str,
+        gliffy_attachments: List[Dict],
+        images: Optional[Dict[int, Tuple]] = None
+    ) -> Tuple[int, List[str], int]:
+        """
+        Insère les images de toutes les macros d'une page en une seule mise à jour.
+        
+        Les images sont téléchargées, toutes les insertions sont appliquées au
+        contenu de la page déjà obtenu au listing, puis la page est enregistrée
+        par un seul PUT (une seule nouvelle version). En cas de conflit 409, la
+        page est relue une fois et les insertions sont ré-appliquées.
+        
+        Args:
+            images: Images déjà placées dans la file de compression par prepare_page (par rang de macro)
+        
+        Returns:
+            Tuple (images insérées, erreurs, macros déjà traitées)
+        """
+        page_id = page.get('id')
+        page_title = page.get('title', 'Sans titre')
+        is_draft = page.get('status') == 'draft'
+        body_storage = page.get('body', {}).get('storage', {}).get('value', '')
+        version_num = page.get('version', {}).get('number', 1)
+        
+        errors = []
+        already_processed_count = 0
+        pending = []
+        index = MacroIndex(body_storage)
+        
+        for idx, gliffy_att in enumerate(gliffy_attachments):
+            attachment_id = gliffy_att.get('attachmentId')
+            if not attachment_id:
+                continue
+            
+            if not self.force:
+                is_processed, reason = self.is_page_already_processed(body_storage, gliffy_att, index)
+                if is_processed:
+                    already_processed_count += 1
+                    continue
+            
+            image_content, mime_type, download_error = self.get_gliffy_image(
+                page_id, attachment_id, is_draft, (images or {}).pop(idx, None)
+            )
+            if image_content:
+                image_html, upload_error = self.render_image_html(page_id, image_content, mime_type, gliffy_att, is_draft)
+                if image_html:
+                    pending.append((idx, gliffy_att, image_html))
+                else:
+                    errors.append(f"Gliffy {idx + 1}: {upload_error}")
+            else:
+                errors.append(f"Gliffy {idx + 1}: Impossible de télécharger l'image (attachment_id: {attachment_id}) - {download_error}")
+        
+        if not pending:
+            return (0, errors, already_processed_count)
+        
+        applied = []
+        
+        def apply_insertions(current_body: str) -> str:
+            # Ré-applicable sur un contenu relu : les macros déjà traitées entre-temps sont ignorées
+            applied.clear()
+            # Index construit une fois : les insertions décalent les positions des macros suivantes
+            index = MacroIndex(current_body)
+            for idx, gliffy_att, image_html in pending:
+                if not self.force:
+                    if self.is_page_already_processed(current_body, gliffy_att, index)[0]:
+                        continue
+                else:
+                    self._remove_existing_image(index, gliffy_att)
+                self._insert_html_after_macro(index, gliffy_att, image_html)
+                applied.append(idx)
+            return index.body
+        
+        new_body = apply_insertions(body_storage)
+        try:
+            success, result_msg = self.update_page_body(
+                page_id, page_title, space_key, new_body, version_num, is_draft,
+                on_conflict=lambda page_data: apply_insertions(
+                    page_data.get('body', {}).get('storage', {}).get('value', '')
+                )
+            )
+        except requests.exceptions.Timeout:
+            success, result_msg = (False, "Timeout lors de la requête API")
+        except requests.exceptions.RequestException as e:
+            success, result_msg = (False, f"Erreur de connexion: {str(e)}")
+        except Exception as e:
+            success, result_msg = (False, f"Exception lors de l'insertion: {str(e)}")
+        
+        if not success:
+            for idx, gliffy_att, image_html in pending:
+                errors.append(f"Gliffy {idx + 1}: {result_msg}")
+            return (0, errors, already_processed_count)
+        
+        images_inserted = len(applied)
+        self.stats['images_inserted'] += images_inserted
+        already_processed_count += len(pending) - images_inserted
+        return (images_inserted, errors, already_processed_count)
     
     def process_page(self, page: Dict, space_key: str, space_name: str) -> Dict:
         """Traite une page pour migrer les images Gliffy."""
+        return self.finish_page(self.prepare_page(page, space_key, space_name))
+    
+    def prepare_page(self, page: Dict, space_key: str, space_name: str) -> Dict:
+        """
+        Première étape du traitement d'une page : analyse des macros et téléchargement des images.
+        
+        Les images sont placées dans la file de compression ; finish_page attend
+        leur compression puis met la page à jour. Entre les deux étapes, les
+        pages suivantes peuvent être préparées.
+        
+        Returns:
+            Dict: Page préparée ('result' est déjà renseigné si la page est ignorée)
+        """
         page_id = page.get('id')
         page_title = page.get('title', 'Sans titre')
         is_draft = page.get('status') == 'draft'
@@ -672,8 +891,16 @@ class GliffyMigrator(ConfluenceBase):
             except (ValueError, AttributeError):
                 pass
         
+        prepared = {
+            'page': page,
+            'space_key': space_key,
+            'gliffy_attachments': [],
+            'images': {},
+            'result': None
+        }
+        
         if not body_storage:
-            return {
+            prepared['result'] = {
                 'page_id': page_id,
                 'page_title': page_title,
                 'status': 'skipped',
@@ -681,11 +908,12 @@ class GliffyMigrator(ConfluenceBase):
                 'gliffy_count': 0,
                 'images_inserted': 0
             }
+            return prepared
         
         gliffy_attachments = self.extract_gliffy_attachments_from_content(body_storage, page_id)
         
         if not gliffy_attachments:
-            return {
+            prepared['result'] = {
                 'page_id': page_id,
                 'page_title': page_title,
                 'status': 'skipped',
@@ -693,71 +921,100 @@ class GliffyMigrator(ConfluenceBase):
                 'gliffy_count': 0,
                 'images_inserted': 0
             }
+            return prepared
         
         self.stats['gliffy_found'] += len(gliffy_attachments)
         
-        images_inserted = 0
-        errors = []
-        already_processed_count = 0
+        prepared['gliffy_attachments'] = gliffy_attachments
         
+        index = MacroIndex(body_storage)
         for idx, gliffy_att in enumerate(gliffy_attachments):
             attachment_id = gliffy_att.get('attachmentId')
-            macro_html = gliffy_att.get('macroHtml', '')
-            diagram_name = gliffy_att.get('diagramName')
-            macro_id = gliffy_att.get('macroId')
-            
             if not attachment_id:
                 continue
+            # Les macros déjà traitées d'après le contenu du listing ne sont pas téléchargées
+            if not self.force and self.is_page_already_processed(body_storage, gliffy_att, index)[0]:
+                continue
+            prepared['images'][idx] = self.queue_gliffy_image(page_id, attachment_id, is_draft)
+        
+        return prepared
+    
+    def finish_page(self, prepared: Dict) -> Dict:
+        """
+        Seconde étape du traitement d'une page : insertion des images et mise à jour de la page.
+        
+        Returns:
+            Dict: Résultat de la page pour le rapport
+        """
+        if prepared['result'] is not None:
+            return prepared['result']
+        
+        page = prepared['page']
+        space_key = prepared['space_key']
+        gliffy_attachments = prepared['gliffy_attachments']
+        images = prepared['images']
+        page_id = page.get('id')
+        page_title = page.get('title', 'Sans titre')
+        is_draft = page.get('status') == 'draft'
+        body_storage = page.get('body', {}).get('storage', {}).get('value', '')
+        
+        if self.batch_updates:
+            # Une seule mise à jour de la page pour toutes ses macros
+            images_inserted, errors, already_processed_count = self.process_macros_batched(
+                page, space_key, gliffy_attachments, images
+            )
+        else:
+            images_inserted, errors, already_processed_count = 0, [], 0
+            for idx, gliffy_att in enumerate(gliffy_attachments):
+                attachment_id = gliffy_att.get('attachmentId')
+                macro_html = gliffy_att.get('macroHtml', '')
+                diagram_name = gliffy_att.get('diagramName')
+                macro_id = gliffy_att.get('macroId')
             
-            # Récupérer le contenu à jour
-            current_page_data = self.get_page_details(page_id)
-            current_body_storage = current_page_data.get('body', {}).get('storage', {}).get('value', '') if current_page_data else body_storage
-            
-            # Vérifier idempotence
-            if not self.force:
-                is_processed, reason = self.is_page_already_processed(current_body_storage, gliffy_att)
-                if is_processed:
-                    already_processed_count += 1
+                if not attachment_id:
                     continue
-            else:
-                current_body_storage = self.remove_existing_image(current_body_storage, gliffy_att)
             
-            # Télécharger l'image
-            image_content, mime_type, download_error = self.download_attachment_direct(page_id, attachment_id, is_draft=is_draft)
+                # Récupérer le contenu à jour
+                current_page_data = self.get_page_details(page_id)
+                current_body_storage = current_page_data.get('body', {}).get('storage', {}).get('value', '') if current_page_data else body_storage
             
-            if not image_content and is_draft:
-                # Réessayer en forçant le status draft si pas déjà fait
-                image_content, mime_type, download_error = self.download_attachment_direct(page_id, attachment_id, True)
+                # Vérifier idempotence
+                if not self.force:
+                    is_processed, reason = self.is_page_already_processed(current_body_storage, gliffy_att)
+                    if is_processed:
+                        already_processed_count += 1
+                        continue
+                else:
+                    current_body_storage = self.remove_existing_image(current_body_storage, gliffy_att)
             
-            if not image_content and attachment_id.startswith('att'):
-                attachment_id_no_prefix = attachment_id[3:]
-                image_content, mime_type, download_error = self.download_attachment_direct(page_id, attachment_id_no_prefix, is_draft=is_draft)
-                if not image_content and is_draft:
-                    image_content, mime_type, download_error = self.download_attachment_direct(page_id, attachment_id_no_prefix, True)
+                # Télécharger l'image
+                image_content, mime_type, download_error = self.get_gliffy_image(
+                    page_id, attachment_id, is_draft, images.pop(idx, None)
+                )
             
-            if image_content:
-                # Insérer l'image
-                try:
-                    insert_success, result_msg = self.insert_image_after_macro(
-                        page_id, page_title, space_key, image_content, mime_type,
-                        gliffy_att, is_draft, current_body_storage
-                    )
+                if image_content:
+                    # Insérer l'image
+                    try:
+                        insert_success, result_msg = self.insert_image_after_macro(
+                            page_id, page_title, space_key, image_content, mime_type,
+                            gliffy_att, is_draft, current_body_storage
+                        )
                     
-                    if insert_success:
-                        images_inserted += 1
-                        self.stats['images_inserted'] += 1
-                        # Ne pas mettre à jour body_storage localement car on récupère depuis l'API à chaque fois
-                    elif result_msg == "already_processed":
-                        # Page déjà traitée, on skip
-                        already_processed_count += 1
-                    else:
-                        error_msg = result_msg if result_msg else "Erreur lors de l'insertion de l'image"
+                        if insert_success:
+                            images_inserted += 1
+                            self.stats['images_inserted'] += 1
+                            # Ne pas mettre à jour body_storage localement car on récupère depuis l'API à chaque fois
+                        elif result_msg == "already_processed":
+                            # Page déjà traitée, on skip
+                            already_processed_count += 1
+                        else:
+                            error_msg = result_msg if result_msg else "Erreur lors de l'insertion de l'image"
+                            errors.append(f"Gliffy {idx + 1}: {error_msg}")
+                    except Exception as e:
+                        error_msg = f"Exception lors de l'insertion: {str(e)}"
                         errors.append(f"Gliffy {idx + 1}: {error_msg}")
-                except Exception as e:
-                    error_msg = f"Exception lors de l'insertion: {str(e)}"
-                    errors.append(f"Gliffy {idx + 1}: {error_msg}")
-            else:
-                errors.append(f"Gliffy {idx + 1}: Impossible de télécharger l'image (attachment_id: {attachment_id}) - {download_error}")
+                else:
+                    errors.append(f"Gliffy {idx + 1}: Impossible de télécharger l'image (attachment_id: {attachment_id}) - {download_error}")
         
         if images_inserted > 0:
             self.stats['pages_modified'] += 1
@@ -790,25 +1047,166 @@ class GliffyMigrator(ConfluenceBase):
         
         return result_dict
     
+    def _journal_scope(self) -> Dict:
+        """Périmètre du run tel que consigné dans le journal (comparé à la reprise)."""
+        return {
+            'spaces': sorted(self.spaces_filter) if self.spaces_filter else None,
+            'page': self.page_id_filter,
+            'force': self.force
+        }
+    
+    def _restore_session(self):
+        """
+        Recharge l'état de la dernière migration depuis le journal (--resume).
+        
+        Les pages en erreur ne sont pas considérées comme faites : elles sont retentées,
+        y compris dans les espaces terminés (listés à nouveau). Leur dernier résultat
+        reste dans le rapport tant qu'elles n'ont pas été retraitées.
+        Si le périmètre demandé diffère de celui de la session journalisée, une
+        nouvelle migration est démarrée.
+        """
+        session = self.journal.load_session()
+        if not session:
+            print("ℹ️  Aucune migration à reprendre dans le journal, démarrage d'une nouvelle migration\n")
+            return False
+        
+        if session['completed']:
+            print("ℹ️  La dernière migration journalisée est terminée, démarrage d'une nouvelle migration\n")
+            return False
+        
+        # Les pages journalisées ne valent que pour le périmètre (espaces, page, --force) du run interrompu
+        scope = self._journal_scope()
+        if session['scope'] != scope:
+            print("⚠️  La migration journalisée porte sur un autre périmètre "
+                  f"(journal: {session['scope']}, demandé: {scope}), démarrage d'une nouvelle migration\n")
+            return False
+        
+        retry_spaces = set()
+        for page_id, entry in session['pages'].items():
+            result = entry['result']
+            self.resumed_spaces.add(entry['space_key'])
+            if result.get('status') == 'error':
+                self.retry_pages[page_id] = result
+                retry_spaces.add(entry['space_key'])
+                continue
+            self.done_pages.add(page_id)
+            self._count_result(result)
+            self.report.append(result)
+        self.done_spaces = session['spaces_done'] - retry_spaces
+        
+        print(f"⏯️  Reprise de la migration: {len(self.done_pages)} page(s) et "
+              f"{len(self.done_spaces)} espace(s) déjà traités")
+        if self.retry_pages:
+            print(f"   {len(self.retry_pages)} page(s) en erreur à retenter")
+        print()
+        return True
+    
+    def _report_unretried_pages(self):
+        """Ajoute au rapport le dernier résultat des pages en erreur qui n'ont pas été retentées."""
+        for result in self.retry_pages.values():
+            self._count_result(result)
+            self.report.append(result)
+        self.retry_pages = {}
+    
+    def _count_result(self, result: Dict):
+        """Met à jour les statistiques à partir d'un résultat journalisé."""
+        self.stats['pages_processed'] += 1
+        self.stats['gliffy_found'] += result.get('gliffy_count', 0)
+        self.stats['images_inserted'] += result.get('images_inserted', 0)
+        if result.get('status') == 'modified':
+            self.stats['pages_modified'] += 1
+        elif result.get('status') == 'skipped':
+            self.stats['pages_skipped'] += 1
+        elif result.get('status') == 'error':
+            self.stats['errors'] += len(result.get('errors', []))
+    
+    def _record_result(self, result: Dict, space_key: Optional[str]):
+        """Ajoute le résultat d'une page au rapport et le consigne dans le journal."""
+        self.report.append(result)
+        self.stats['pages_processed'] += 1
+        # Page retentée : son nouveau résultat remplace celui du run précédent
+        self.retry_pages.pop(result['page_id'], None)
+        # Consigné après la mise à jour de la page : si le processus s'arrête entre
+        # les deux, la page sera revue à la reprise et reconnue comme déjà traitée
+        self.journal.record_page(space_key, result['page_id'], result)
+    
+    def _finish_prepared_page(self, prepared: Dict, space_key: str):
+        """Termine une page préparée, puis l'enregistre dans le rapport et le journal."""
+        result = self.finish_page(prepared)
+        self._record_result(result, space_key)
+        self._print_result(result)
+    
+    def _print_result(self, result: Dict):
+        """Affiche le résultat du traitement d'une page."""
+        if result['status'] == 'modified':
+            print(f"  ✅ {result['page_title']}: {result['images_inserted']} image(s) insérée(s)")
+        elif result['status'] == 'skipped':
+            reason = result.get('reason', 'unknown')
+            if reason == 'already_processed':
+                print(f"  ⏭️  {result['page_title']}: Déjà traitée ({result['gliffy_count']} Gliffy)")
+            elif reason == 'no_gliffy':
+                print(f"  ⏭️  {result['page_title']}: Aucun Gliffy")
+            elif reason == 'no_content':
+                print(f"  ⏭️  {result['page_title']}: Pas de contenu")
+            else:
+                print(f"  ⏭️  {result['page_title']}: Ignorée ({reason})")
+        elif result['status'] == 'error':
+            error_count = len(result.get('errors', []))
+            print(f"  ❌ {result['page_title']}: {error_count} erreur(s)")
+    
     def migrate(self) -> List[Dict]:
-        """Lance la migration complète."""
+        """
+        Lance la migration complète.
+        
+        Chaque page est consignée dans le journal dès son traitement. En cas
+        d'interruption (Ctrl-C), le rapport partiel est retourné et la
+        migration peut être reprise avec --resume.
+        """
         print("🚀 Démarrage de la migration des images Gliffy\n")
         
+        resumed = self.resume and self._restore_session()
+        self.journal.start_run(self._journal_scope(), resume=resumed)
+        
+        # Compressions en attente abandonnées si la migration ne va pas à son terme
+        cancel = True
+        try:
+            self._migrate_scope()
+            self._report_unretried_pages()
+            self.journal.end_run()
+            cancel = False
+        except KeyboardInterrupt:
+            # Les pages préparées mais pas encore mises à jour ne sont pas journalisées : reprises avec --resume
+            self._report_unretried_pages()
+            print(f"\n⏸️  Migration interrompue : {len(self.report)} page(s) journalisée(s) dans {self.journal.journal_file}")
+            print("   Relancez la commande avec --resume pour continuer")
+            return self.report
+        finally:
+            # Toujours arrêter le pool de compression et fermer le journal, quelle que soit l'erreur
+            self.compression.shutdown(cancel=cancel)
+            self.journal.close()
+        
+        print(f"\n✅ Migration terminée")
+        return self.report
+    
+    def _migrate_scope(self):
+        """Parcourt la page ou les espaces demandés."""
         # Si une page spécifique est demandée
         if self.page_id_filter:
             print(f"🎯 Mode: Page spécifique (ID: {self.page_id_filter})\n")
+            if self.page_id_filter in self.done_pages:
+                print(f"⏭️  Page {self.page_id_filter} déjà traitée (journal)")
+                return
             page_data = self.get_page_details(self.page_id_filter)
             if page_data:
                 space = page_data.get('space', {})
                 space_key = space.get('key', 'unknown')
                 space_name = space.get('name', space_key)
                 result = self.process_page(page_data, space_key, space_name)
-                self.report.append(result)
-                self.stats['pages_processed'] += 1
+                self._record_result(result, space_key)
                 print(f"✅ Page traitée: {result['page_title']}")
             else:
                 print(f"❌ Page {self.page_id_filter} non trouvée")
-            return self.report
+            return
         
         # Migration par espace(s)
         if self.spaces_filter:
@@ -816,49 +1214,74 @@ class GliffyMigrator(ConfluenceBase):
         else:
             print(f"🌐 Mode: Tous les espaces\n")
         
+        if self.discovery == 'cql':
+            print("🔎 Découverte: recherche CQL des pages Gliffy (macros, fichiers .gliffy, brouillons)\n")
+        
         spaces = self.get_all_spaces()
         
         if not spaces:
             print("❌ Aucun espace trouvé")
-            return []
+            return
         
         for space in spaces:
             space_key = space.get('key')
             space_name = space.get('name', space_key)
             
+            if space_key in self.done_spaces:
+                print(f"\n⏭️  Espace déjà traité (journal): {space_name} ({space_key})")
+                continue
+            
             print(f"\n📄 Analyse de l'espace: {space_name} ({space_key})")
             
-            pages = self.get_all_pages(space_key, include_drafts=True)
+            # Les pages sont traitées au fil de la pagination pour que la mémoire
+            # reste constante quelle que soit la taille de l'espace
+            pages_count = 0
+            resumed_count = 0
+            complete = True
+            # Espace repris : les pages sont listées sans leur contenu, seul celui des
+            # pages restant à faire est téléchargé
+            partial = space_key in self.resumed_spaces
+            # File des pages préparées (images téléchargées, compression en cours) :
+            # une page n'est mise à jour qu'une fois les pipeline_depth suivantes préparées
+            prepared_pages = deque()
+            try:
+                if self.discovery == 'cql':
+                    expand = expand_fields('migrate-lite') if partial else expand_fields('migrate')
+                    pages = self.iter_gliffy_candidates(space_key, expand=expand, raise_on_error=True)
+                else:
+                    pages = self.iter_pages(space_key, include_drafts=True, raise_on_error=True, with_body=not partial)
+                for page in pages:
+                    pages_count += 1
+                    if page.get('id') in self.done_pages:
+                        resumed_count += 1
+                        continue
+                    if partial:
+                        status = 'draft' if page.get('status') == 'draft' else None
+                        page = super().get_page_details(page.get('id'), expand=expand_fields('migrate'), status=status)
+                        if not page:
+                            complete = False
+                            continue
+                    prepared_pages.append(self.prepare_page(page, space_key, space_name))
+                    while len(prepared_pages) > self.pipeline_depth:
+                        self._finish_prepared_page(prepared_pages.popleft(), space_key)
+            except (requests.exceptions.RequestException, ValueError):
+                complete = False
+            # Les pages déjà préparées sont terminées et journalisées même si le listing a échoué
+            while prepared_pages:
+                self._finish_prepared_page(prepared_pages.popleft(), space_key)
             
-            if not pages:
+            if pages_count:
+                print(f"  📋 {pages_count} page(s) traitée(s)")
+                if resumed_count:
+                    print(f"  ⏯️  dont {resumed_count} déjà faite(s) lors d'un run précédent")
+            else:
                 print(f"  ℹ️  Aucune page trouvée")
-                continue
-            
-            print(f"  📋 {len(pages)} page(s) trouvée(s)")
             
-            for page in pages:
-                result = self.process_page(page, space_key, space_name)
-                self.report.append(result)
-                self.stats['pages_processed'] += 1
-                
-                if result['status'] == 'modified':
-                    print(f"  ✅ {result['page_title']}: {result['images_inserted']} image(s) insérée(s)")
-                elif result['status'] == 'skipped':
-                    reason = result.get('reason', 'unknown')
-                    if reason == 'already_processed':
-                        print(f"  ⏭️  {result['page_title']}: Déjà traitée ({result['gliffy_count']} Gliffy)")
-                    elif reason == 'no_gliffy':
-                        print(f"  ⏭️  {result['page_title']}: Aucun Gliffy")
-                    elif reason == 'no_content':
-                        print(f"  ⏭️  {result['page_title']}: Pas de contenu")
-                    else:
-                        print(f"  ⏭️  {result['page_title']}: Ignorée ({reason})")
-                elif result['status'] == 'error':
-                    error_count = len(result.get('errors', []))
-                    print(f"  ❌ {result['page_title']}: {error_count} erreur(s)")
-        
-        print(f"\n✅ Migration terminée")
-        return self.report
+            if not complete:
+                # Espace non consigné comme terminé : --resume le parcourra à nouveau
+                print(f"  ⚠️  {space_key}: liste des pages incomplète, l'espace sera repris avec --resume")
+                continue
+            self.journal.record_space_done(space_key)
     
     def export_report(self, output_file: str):
         """Exporte le rapport de migration."""
@@ -872,6 +1295,7 @@ class GliffyMigrator(ConfluenceBase):
         report_data = {
             'timestamp': datetime.now().isoformat(),
             'stats': self.stats,
+            'http_stats': self.http.get_stats(),
             'pages': self.report
         }
         
@@ -896,4 +1320,8 @@ class GliffyMigrator(ConfluenceBase):
         print(f"  • Gliffy trouvés: {self.stats['gliffy_found']}")
         print(f"  • Images insérées: {self.stats['images_inserted']}")
         print(f"  • Erreurs: {self.stats['errors']}")
+        self.http.print_stats()
+        self.compression.print_stats()
+        if self.attachment_cache is not None:
+            self.attachment_cache.print_stats()
 
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Analyse du HTML des textes Gliffy (graphic.Text.html).
+
+Chaque texte d'un diagramme est analysé en un seul passage par un parseur
+html.parser minimal, sans construire d'arbre BeautifulSoup : le texte brut
+(même résultat que get_text(separator='\\n', strip=True)) et les premiers
+styles sont relevés pendant la lecture des balises.
+
+Fonctionnalités :
+- Texte brut, une ligne par nœud texte, entités HTML décodées
+- Première taille de police (px), couleur et alignement des attributs style
+- Taille de police recherchée dans le HTML brut si aucun attribut style n'en définit
+- Repli sur BeautifulSoup pour le balisage inhabituel (sections CDATA,
+  script/style, entités inconnues, erreur d'analyse)
+- Résultats mémorisés par HTML (LRU borné) : les libellés répétés d'un
+  diagramme ou d'un lot ne sont analysés qu'une fois, compteurs hits/misses
+
+Auteur: Sanae Basraoui
+"""
+
+import re
+from functools import lru_cache
+from html.entities import name2codepoint
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup
+
+
+FONT_SIZE_PATTERN = re.compile(r'font-size:\s*(\d+(?:\.\d+)?)\s*px', re.IGNORECASE)
+COLOR_PATTERN = re.compile(r'(?<![\w-])color\s*:\s*([^;]+)', re.IGNORECASE)
+TEXT_ALIGN_PATTERN = re.compile(r'text-align\s*:\s*([\w-]+)', re.IGNORECASE)
+
+# Balises dont le contenu n'est pas du texte ordinaire pour BeautifulSoup
+# (exclu de get_text) : analysées par BeautifulSoup
+BS4_ONLY_TAGS = ('script', 'style', 'template', 'rt', 'rp')
+
+# Nombre de HTML distincts dont l'analyse est conservée
+TEXT_STYLE_CACHE_SIZE = 4096
+
+# Entités nommées décodées sans BeautifulSoup (lang/rang : caractères différents dans BeautifulSoup)
+ENTITIES = {name: chr(codepoint) for name, codepoint in name2codepoint.items() if name not in ('lang', 'rang')}
+
+
+class GliffyTextStyle:
+    """
+    Texte brut et premiers styles d'un HTML de texte Gliffy.
+
+    Les instances sont partagées par le cache : elles ne doivent pas être modifiées.
+    """
+
+    __slots__ = ('text', 'font_size', 'html_font_size', 'color', 'text_align')
+
+    def __init__(self, text: str, font_size: Optional[int] = None, html_font_size: Optional[int] = None,
+                 color: Optional[str] = None, text_align: Optional[str] = None):
+        """
+        Args:
+            text: Texte brut (lignes non vides, sans espaces en début et fin)
+            font_size: Première taille de police (px) d'un attribut style
+            html_font_size: Première taille de police (px) du HTML brut
+            color: Première couleur de texte d'un attribut style
+            text_align: Premier alignement d'un attribut style
+        """
+        self.text = text
+        self.font_size = font_size
+        self.html_font_size = html_font_size
+        self.color = color
+        self.text_align = text_align
+
+    def __repr__(self) -> str:
+        return (f"GliffyTextStyle(text={self.text!r}, font_size={self.font_size!r}, "
+                f"color={self.color!r}, text_align={self.text_align!r})")
+
+
+def _font_size(match) -> Optional[int]:
+    return int(float(match.group(1))) if match else None
+
+
+def _join_lines(strings: List[str]) -> str:
+    """Une ligne par nœud texte, sans lignes vides ni espaces en début et fin."""
+    lines = [line.strip() for line in '\n'.join(strings).split('\n') if line.strip()]
+    return '\n'.join(lines)
+
+
+class _TextStyleParser(HTMLParser):
+    """Parseur en un passage : nœuds texte et premiers styles des balises."""
+
+    def __init__(self):
+        # Les références de caractères sont décodées ici, comme dans BeautifulSoup
+        super().__init__(convert_charrefs=False)
+        self.strings = []
+        self.font_size = None
+        self.color = None
+        self.text_align = None
+        self.unsupported = False
+        self._data = []
+
+    def _end_string(self):
+        if self._data:
+            string = ''.join(self._data).strip()
+            if string:
+                self.strings.append(string)
+            self._data = []
+
+    def handle_starttag(self, tag, attrs):
+        self._end_string()
+        if tag in BS4_ONLY_TAGS:
+            self.unsupported = True
+        style = None
+        for name, value in attrs:
+            if name == 'style':
+                # Attribut en double : la dernière valeur l'emporte
+                style = value
+        if style:
+            if self.font_size is None:
+                self.font_size = _font_size(FONT_SIZE_PATTERN.search(style))
+            if self.color is None:
+                match = COLOR_PATTERN.search(style)
+                if match:
+                    self.color = match.group(1).strip()
+            if self.text_align is None:
+                match = TEXT_ALIGN_PATTERN.search(style)
+                if match:
+                    self.text_align = match.group(1).lower()
+
+    def handle_endtag(self, tag):
+        self._end_string()
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def handle_entityref(self, name):
+        character = ENTITIES.get(name)
+        if character is None:
+            self.unsupported = True
+        else:
+            self._data.append(character)
+
+    def handle_charref(self, name):
+        try:
+            codepoint = int(name[1:], 16) if name[:1] in ('x', 'X') else int(name)
+        except ValueError:
+            self.unsupported = True
+            return
+        # Contrôles, plage Windows-1252 et substituts : conversions propres à BeautifulSoup
+        if codepoint in (9, 10, 13) or 32 <= codepoint < 128 or 160 <= codepoint < 0xD800 or 0xE000 <= codepoint <= 0x10FFFF:
+            self._data.append(chr(codepoint))
+        else:
+            self.unsupported = True
+
+    def handle_comment(self, data):
+        self._end_string()
+
+    def handle_decl(self, decl):
+        self._end_string()
+
+    def handle_pi(self, data):
+        self._end_string()
+
+    def unknown_decl(self, data):
+        # Section CDATA : incluse dans le texte par BeautifulSoup
+        self.unsupported = True
+
+
+def _parse_with_bs4(html_content: str) -> GliffyTextStyle:
+    """Analyse avec BeautifulSoup (balisage inhabituel ou mal formé)."""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    text = _join_lines(soup.get_text(separator='\n', strip=True).split('\n'))
+    text_style = GliffyTextStyle(text, html_font_size=_font_size(FONT_SIZE_PATTERN.search(html_content)))
+    for tag in soup.find_all(True):
+        style = tag.get('style', '')
+        if not style:
+            continue
+        if text_style.font_size is None:
+            text_style.font_size = _font_size(FONT_SIZE_PATTERN.search(style))
+        if text_style.color is None:
+            match = COLOR_PATTERN.search(style)
+            if match:
+                text_style.color = match.group(1).strip()
+        if text_style.text_align is None:
+            match = TEXT_ALIGN_PATTERN.search(style)
+            if match:
+                text_style.text_align = match.group(1).lower()
+    return text_style
+
+
+@lru_cache(maxsize=TEXT_STYLE_CACHE_SIZE)
+def _parse_text_html(html_content: str) -> GliffyTextStyle:
+    parser = _TextStyleParser()
+    try:
+        parser.feed(html_content)
+        parser.close()
+    except Exception:
+        return _parse_with_bs4(html_content)
+    if parser.unsupported:
+        return _parse_with_bs4(html_content)
+    parser._end_string()
+
+    return GliffyTextStyle(
+        _join_lines(parser.strings),
+        font_size=parser.font_size,
+        html_font_size=_font_size(FONT_SIZE_PATTERN.search(html_content)),
+        color=parser.color,
+        text_align=parser.text_align
+    )
+
+
+def parse_gliffy_text_html(html_content: str) -> GliffyTextStyle:
+    """
+    Extrait le texte brut et les premiers styles d'un HTML de texte Gliffy.
+
+    Le texte est celui de BeautifulSoup get_text(separator='\\n', strip=True),
+    lignes vides retirées. BeautifulSoup n'est utilisé que si le parseur
+    rapide rencontre un balisage qu'il ne traite pas à l'identique.
+    Le résultat est mémorisé par HTML (TEXT_STYLE_CACHE_SIZE derniers
+    contenus) : un libellé répété n'est analysé qu'une fois.
+
+    Args:
+        html_content: Contenu de graphic.Text.html
+
+    Returns:
+        GliffyTextStyle: Texte, tailles de police, couleur et alignement
+    """
+    if not html_content:
+        return GliffyTextStyle('')
+    return _parse_text_html(html_content)
+
+
+def get_text_style_cache_stats() -> Dict[str, int]:
+    """Retourne les compteurs du cache des analyses de texte (hits, misses, taille)."""
+    info = _parse_text_html.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
+
+
+def clear_text_style_cache():
+    """Vide le cache des analyses de texte et remet ses compteurs à zéro."""
+    _parse_text_html.cache_clear()
+
+
+def print_text_style_cache_stats():
+    """Affiche les statistiques du cache des analyses de texte."""
+    stats = get_text_style_cache_stats()
+    lookups = stats['hits'] + stats['misses']
+    if not lookups:
+        return
+    print(f"\n🔤 Analyse des textes Gliffy (cache de {stats['max_size']} HTML):")
+    print(f"  • Textes analysés: {stats['misses']}")
+    print(f"  • Réutilisés depuis le cache: {stats['hits']} ({stats['hits'] * 100 / lookups:.0f} %)")
@@ -11,23 +11,25 @@ Fonctionnalités :
 - Gestion des textes et polices
 - Support du mapper TID pour les images d'icônes
 - Conversion des coordonnées et transformations
+- Ordre de superposition enregistré à la création des éléments (tri en O(n log n))
+- Index ID Excalidraw → élément pour les liaisons des flèches (boundElements)
+- Index enfants par parent et ID → objet construits pendant l'aplatissement
+  (textes des formes retrouvés sans parcourir tous les objets)
+- HTML des textes analysé en un passage (gliffy_text), BeautifulSoup en repli
 
 Inspiré du script PowerShell convert-gliffy.ps1.
 
 Auteur: Sanae Basraoui
 """
 
-import json
-import re
 import random
 import time
-import math
 import base64
-from typing import Dict, List, Optional, Tuple, Any
-from html import unescape
-from bs4 import BeautifulSoup
+from typing import Dict, List, Optional, Set, Tuple, Any
 from pathlib import Path
 
+from gliffy_text import parse_gliffy_text_html
+
 
 def get_unix_milliseconds() -> int:
     """Retourne le timestamp Unix courant en millisecondes."""
@@ -90,13 +92,23 @@ def get_gliffy_text_content(gliffy_object: Dict) -> str:
     if not html_content:
         return ''
     
-    # Utiliser BeautifulSoup pour extraire le texte proprement
-    soup = BeautifulSoup(html_content, 'html.parser')
-    text = soup.get_text(separator='\n', strip=True)
-    
-    # Nettoyer les espaces multiples mais garder les retours à la ligne
-    lines = [line.strip() for line in text.split('\n') if line.strip()]
-    return '\n'.join(lines)
+    # Texte brut, une ligne par nœud texte (analyse en un passage, voir gliffy_text)
+    return parse_gliffy_text_html(html_content).text
+
+
+def get_html_font_size(html_content: str, default: int) -> int:
+    """
+    Taille de police (px) d'un HTML de texte Gliffy.
+    
+    Première taille définie dans un attribut style, sinon première
+    occurrence de font-size dans le HTML brut, sinon default.
+    """
+    text_style = parse_gliffy_text_html(html_content)
+    if text_style.font_size is not None:
+        return text_style.font_size
+    if text_style.html_font_size is not None:
+        return text_style.html_font_size
+    return default
 
 
 def get_gliffy_stroke_color(gliffy_object: Dict, default: str = '#1e1e1e') -> str:
@@ -195,8 +207,21 @@ def get_gliffy_object_type(gliffy_object: Dict) -> Optional[str]:
     return None
 
 
-def expand_gliffy_objects(objects: List[Dict], offset_x: float = 0.0, offset_y: float = 0.0, parent: Optional[Dict] = None) -> List[Dict]:
-    """Aplatit récursivement la hiérarchie Gliffy en coordonnées absolues."""
+def expand_gliffy_objects(
+    objects: List[Dict],
+    offset_x: float = 0.0,
+    offset_y: float = 0.0,
+    parent: Optional[Dict] = None,
+    children_by_parent: Optional[Dict[str, List[Dict]]] = None,
+    arrow_ids: Optional[Set[str]] = None
+) -> List[Dict]:
+    """
+    Aplatit récursivement la hiérarchie Gliffy en coordonnées absolues.
+    
+    Si children_by_parent et arrow_ids sont fournis, ils sont remplis
+    pendant le même parcours : enfants de chaque objet (ID du parent → objets,
+    dans l'ordre de la liste aplatie) et IDs portés par au moins une flèche.
+    """
     result = []
     
     if not objects:
@@ -241,6 +266,11 @@ def expand_gliffy_objects(objects: List[Dict], offset_x: float = 0.0, offset_y:
         # Stocker le parent pour les textes enfants
         if parent and isinstance(parent, dict) and parent.get('id') is not None:
             obj_copy['_parentId'] = str(parent['id'])
+            if children_by_parent is not None:
+                children_by_parent.setdefault(obj_copy['_parentId'], []).append(obj_copy)
+        
+        if arrow_ids is not None and detected_type == 'arrow' and obj_copy.get('id') is not None:
+            arrow_ids.add(str(obj_copy['id']))
         
         result.append(obj_copy)
         
@@ -249,11 +279,35 @@ def expand_gliffy_objects(objects: List[Dict], offset_x: float = 0.0, offset_y:
         if children and isinstance(children, list):
             child_offset_x = current_x
             child_offset_y = current_y
-            result.extend(expand_gliffy_objects(children, child_offset_x, child_offset_y, obj_copy))
+            result.extend(expand_gliffy_objects(
+                children, child_offset_x, child_offset_y, obj_copy, children_by_parent, arrow_ids
+            ))
     
     return result
 
 
+def find_child_text(
+    parent_id: str,
+    children_by_parent: Dict[str, List[Dict]],
+    arrow_ids: Set[str]
+) -> Tuple[Optional[Dict], str]:
+    """
+    Retourne le premier texte enfant non vide d'une forme et son contenu.
+    
+    Les textes enfants d'une flèche (un des objets portant parent_id est une
+    flèche) sont des labels : ils ne sont pas intégrés dans une forme,
+    (None, '') est retourné.
+    """
+    if parent_id in arrow_ids:
+        return (None, '')
+    for child_obj in children_by_parent.get(parent_id, ()):
+        if get_gliffy_object_type(child_obj) == 'text':
+            child_text = get_gliffy_text_content(child_obj)
+            if child_text:
+                return (child_obj, child_text)
+    return (None, '')
+
+
 def get_constraint_point(constraint: Dict, object_info: Dict[str, Dict]) -> Optional[Tuple[float, float]]:
     """Résout une contrainte Gliffy en coordonnées absolues."""
     if not constraint or not constraint.get('nodeId'):
@@ -429,15 +483,46 @@ def convert_gliffy_to_excalidraw(gliffy_data: Dict, tid_image_mapper=None) -> Di
     object_info = {}  # Gliffy ID -> {x, y, width, height}
     arrow_geometries = {}  # Gliffy ID -> {points, startArrow, endArrow}
     image_files = {}  # fileId -> image data
+    element_order = {}  # ID Excalidraw -> ordre de superposition Gliffy (_order)
+    elements_by_id = {}  # ID Excalidraw -> élément Excalidraw (premier créé si l'ID est en double)
+    
+    def register_element(obj: Dict, element: Dict):
+        """Ajoute un élément créé depuis un objet Gliffy et enregistre son ID et son ordre."""
+        elements.append(element)
+        elements_by_id.setdefault(element['id'], element)
+        element_order[element['id']] = obj.get('_order', 0)
+        obj_id = obj.get('id')
+        if obj_id is not None:
+            id_map[str(obj_id)] = element['id']
+            element_registry[str(obj_id)] = element
+    
+    def add_bound_element(element_id: str, arrow_element: Dict):
+        """Ajoute une flèche dans boundElements de l'élément element_id."""
+        target = elements_by_id.get(element_id)
+        if target is None:
+            return
+        if target.get('boundElements') is None:
+            target['boundElements'] = []
+        target['boundElements'].append({
+            'id': arrow_element['id'],
+            'type': 'arrow'
+        })
     
     # Récupérer les objets depuis la structure Gliffy
+    # Les index enfants / ID sont construits pendant l'aplatissement (recherches en temps constant)
     objects = []
+    children_by_parent = {}  # Gliffy ID du parent -> objets enfants
+    arrow_ids = set()  # Gliffy IDs portés par une flèche (textes enfants = labels)
     if gliffy_data.get('stage') and gliffy_data['stage'].get('objects'):
-        objects = expand_gliffy_objects(gliffy_data['stage']['objects'])
+        objects = expand_gliffy_objects(
+            gliffy_data['stage']['objects'], children_by_parent=children_by_parent, arrow_ids=arrow_ids
+        )
     elif gliffy_data.get('pages'):
         for page in gliffy_data['pages']:
             if page and page.get('scene') and page['scene'].get('objects'):
-                objects.extend(expand_gliffy_objects(page['scene']['objects']))
+                objects.extend(expand_gliffy_objects(
+                    page['scene']['objects'], children_by_parent=children_by_parent, arrow_ids=arrow_ids
+                ))
     
     if not objects:
         return _create_empty_excalidraw()
@@ -494,10 +579,7 @@ def convert_gliffy_to_excalidraw(gliffy_data: Dict, tid_image_mapper=None) -> Di
                 element = _create_excalidraw_image(obj, image_path or '', id_map, image_data=image_data)
                 
                 if element:
-                    elements.append(element)
-                    if obj_id is not None:
-                        id_map[str(obj_id)] = element['id']
-                        element_registry[str(obj_id)] = element
+                    register_element(obj, element)
                     
                     # Stocker l'image dans les fichiers du document
                     file_id = element.get('fileId')
@@ -507,40 +589,28 @@ def convert_gliffy_to_excalidraw(gliffy_data: Dict, tid_image_mapper=None) -> Di
                             'dataURL': element['_imageData']
                         }
             elif obj_type == 'rectangle':
-                element = _create_excalidraw_rectangle(obj, objects, object_info, id_map)
+                element = _create_excalidraw_rectangle(obj, children_by_parent, arrow_ids, object_info, id_map)
                 if element:
-                    elements.append(element)
-                    if obj_id is not None:
-                        id_map[str(obj_id)] = element['id']
-                        element_registry[str(obj_id)] = element
+                    register_element(obj, element)
             
             elif obj_type == 'ellipse':
-                element = _create_excalidraw_ellipse(obj, objects, object_info, id_map)
+                element = _create_excalidraw_ellipse(obj, children_by_parent, arrow_ids, object_info, id_map)
                 if element:
-                    elements.append(element)
-                    if obj_id is not None:
-                        id_map[str(obj_id)] = element['id']
-                        element_registry[str(obj_id)] = element
+                    register_element(obj, element)
             else:
                 # Si le type n'est pas reconnu OU si c'est un type inattendu, convertir en rectangle par défaut (fallback)
                 obj_type = 'rectangle'
-                element = _create_excalidraw_rectangle(obj, objects, object_info, id_map)
+                element = _create_excalidraw_rectangle(obj, children_by_parent, arrow_ids, object_info, id_map)
                 if element:
-                    elements.append(element)
-                    if obj_id is not None:
-                        id_map[str(obj_id)] = element['id']
-                        element_registry[str(obj_id)] = element
+                    register_element(obj, element)
         except Exception as e:
             # Ignorer les erreurs de conversion pour continuer avec les autres objets
             # Mais essayer quand même de créer un rectangle de base si possible avec le texte
             try:
                 # Fallback d'urgence : utiliser _create_excalidraw_rectangle pour avoir le texte
-                element = _create_excalidraw_rectangle(obj, objects, object_info, id_map)
+                element = _create_excalidraw_rectangle(obj, children_by_parent, arrow_ids, object_info, id_map)
                 if element:
-                    elements.append(element)
-                    if obj_id is not None:
-                        id_map[str(obj_id)] = element['id']
-                        element_registry[str(obj_id)] = element
+                    register_element(obj, element)
                 else:
                     # Si _create_excalidraw_rectangle échoue, créer un rectangle minimal
                     if obj.get('width', 0) > 0 and obj.get('height', 0) > 0:
@@ -555,32 +625,10 @@ def convert_gliffy_to_excalidraw(gliffy_data: Dict, tid_image_mapper=None) -> Di
                         # Essayer d'extraire le texte même dans le fallback minimal
                         text_content = get_gliffy_text_content(obj)
                         if not text_content:
-                            # Chercher dans les enfants
-                            # MAIS exclure les textes qui sont des labels de flèches
+                            # Chercher dans les enfants (hors labels de flèches)
                             obj_id_str = str(obj_id) if obj_id is not None else None
                             if obj_id_str:
-                                for child_obj in objects:
-                                    child_parent_id = child_obj.get('_parentId')
-                                    if child_parent_id and str(child_parent_id) == obj_id_str:
-                                        child_type = get_gliffy_object_type(child_obj)
-                                        if child_type == 'text':
-                                            # Vérifier si ce texte est un label de flèche
-                                            is_arrow_label = False
-                                            if child_parent_id:
-                                                for parent_obj in objects:
-                                                    parent_obj_id = parent_obj.get('id')
-                                                    if parent_obj_id and str(parent_obj_id) == str(child_parent_id):
-                                                        parent_obj_type = get_gliffy_object_type(parent_obj)
-                                                        if parent_obj_type == 'arrow':
-                                                            is_arrow_label = True
-                                                            break
-                                            
-                                            # Ne pas inclure les labels de flèches dans les formes
-                                            if not is_arrow_label:
-                                                child_text = get_gliffy_text_content(child_obj)
-                                                if child_text:
-                                                    text_content = child_text
-                                                    break
+                                _, text_content = find_child_text(obj_id_str, children_by_parent, arrow_ids)
                         
                         if text_content:
                             base['text'] = text_content
@@ -592,10 +640,7 @@ def convert_gliffy_to_excalidraw(gliffy_data: Dict, tid_image_mapper=None) -> Di
                             base['originalText'] = text_content
                             base['lineHeight'] = 1.25
                         
-                        elements.append(base)
-                        if obj_id is not None:
-                            id_map[str(obj_id)] = base['id']
-                            element_registry[str(obj_id)] = base
+                        register_element(obj, base)
             except:
                 pass
             continue
@@ -681,10 +726,7 @@ def convert_gliffy_to_excalidraw(gliffy_data: Dict, tid_image_mapper=None) -> Di
         try:
             element = _create_excalidraw_text(obj, object_info, arrow_geometries, id_map)
             if element:
-                elements.append(element)
-                if obj_id is not None:
-                    id_map[str(obj_id)] = element['id']
-                    element_registry[str(obj_id)] = element
+                register_element(obj, element)
         except Exception as e:
             # Ignorer les erreurs de conversion pour continuer avec les autres objets
             continue
@@ -703,41 +745,12 @@ def convert_gliffy_to_excalidraw(gliffy_data: Dict, tid_image_mapper=None) -> Di
         try:
             element = _create_excalidraw_line(obj, object_info, id_map, element_registry, arrow_geometries)
             if element:
-                elements.append(element)
-                obj_id = obj.get('id')
-                if obj_id is not None:
-                    id_map[str(obj_id)] = element['id']
-                    element_registry[str(obj_id)] = element
+                register_element(obj, element)
                 
-                # Ajouter la flèche dans boundElements des formes connectées
-                start_binding = element.get('startBinding')
-                end_binding = element.get('endBinding')
-                
-                if start_binding:
-                    start_element_id = start_binding.get('elementId')
-                    # Trouver l'élément de forme correspondant et ajouter la flèche dans boundElements
-                    for shape_element in elements:
-                        if shape_element.get('id') == start_element_id:
-                            if shape_element.get('boundElements') is None:
-                                shape_element['boundElements'] = []
-                            shape_element['boundElements'].append({
-                                'id': element['id'],
-                                'type': 'arrow'
-                            })
-                            break
-                
-                if end_binding:
-                    end_element_id = end_binding.get('elementId')
-                    # Trouver l'élément de forme correspondant et ajouter la flèche dans boundElements
-                    for shape_element in elements:
-                        if shape_element.get('id') == end_element_id:
-                            if shape_element.get('boundElements') is None:
-                                shape_element['boundElements'] = []
-                            shape_element['boundElements'].append({
-                                'id': element['id'],
-                                'type': 'arrow'
-                            })
-                            break
+                # Ajouter la flèche dans boundElements des formes connectées (index par ID)
+                for binding in (element.get('startBinding'), element.get('endBinding')):
+                    if binding:
+                        add_bound_element(binding.get('elementId'), element)
         except Exception as e:
             # Ignorer les erreurs de conversion pour continuer avec les autres objets
             continue
@@ -746,18 +759,9 @@ def convert_gliffy_to_excalidraw(gliffy_data: Dict, tid_image_mapper=None) -> Di
     # Les éléments avec un order plus petit doivent être en arrière-plan (d'abord dans le tableau)
     # Les éléments avec un order plus grand doivent être en avant-plan (après dans le tableau)
     # Dans Excalidraw, l'ordre du tableau détermine l'ordre de superposition
-    def get_element_order(element):
-        # Récupérer l'ordre depuis l'objet Gliffy original via l'ID
-        element_id = element.get('id', '')
-        for obj in objects:
-            obj_id = obj.get('id')
-            if obj_id is not None:
-                obj_id_str = str(obj_id)
-                if obj_id_str in id_map and id_map[obj_id_str] == element_id:
-                    return obj.get('_order', 0)
-        return 0  # Par défaut, mettre en arrière-plan
-    
-    elements.sort(key=get_element_order)
+    # L'ordre de chaque élément est enregistré à sa création (register_element) :
+    # tri par clé en O(n log n), sans rechercher l'objet Gliffy de chaque élément
+    elements.sort(key=lambda element: element_order.get(element.get('id'), 0))
     
     excalidraw_doc = _create_empty_excalidraw()
     excalidraw_doc['elements'] = elements
@@ -873,40 +877,13 @@ def _create_excalidraw_text(gliffy_obj: Dict, object_info: Dict[str, Dict], arro
     
     font_size = default_font_size
     if html_content:
-        # Méthode 1 : Utiliser BeautifulSoup pour extraire les styles depuis les balises
-        try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            # Chercher dans toutes les balises qui ont un style
-            for tag in soup.find_all(True):  # Toutes les balises
-                style = tag.get('style', '')
-                if style:
-                    # Chercher font-size dans le style
-                    font_size_match = re.search(r'font-size:\s*(\d+(?:\.\d+)?)\s*px', style, re.IGNORECASE)
-                    if font_size_match:
-                        try:
-                            font_size = int(float(font_size_match.group(1)))
-                            break
-                        except (ValueError, TypeError):
-                            continue
-        except:
-            pass
-        
-        # Méthode 2 : Si pas trouvé avec BeautifulSoup, chercher dans le HTML brut
-        if font_size == default_font_size:
-            font_size_patterns = [
-                r'font-size:\s*(\d+(?:\.\d+)?)\s*px',  # font-size: 12px ou font-size: 12.5px
-                r'font-size:\s*(\d+(?:\.\d+)?)px',      # font-size:12px (sans espace)
-                r'style="[^"]*font-size:\s*(\d+(?:\.\d+)?)\s*px[^"]*"',  # Dans un attribut style
-            ]
-            
-            for pattern in font_size_patterns:
-                font_size_match = re.search(pattern, html_content, re.IGNORECASE)
-                if font_size_match:
-                    try:
-                        font_size = int(float(font_size_match.group(1)))  # Convertir en int (arrondir)
-                        break
-                    except (ValueError, TypeError):
-                        continue
+        # Première taille d'un attribut style ; si elle est absente ou égale à la
+        # taille par défaut, première occurrence de font-size dans le HTML brut
+        text_style = parse_gliffy_text_html(html_content)
+        if text_style.font_size is not None:
+            font_size = text_style.font_size
+        if font_size == default_font_size and text_style.html_font_size is not None:
+            font_size = text_style.html_font_size
     
     # Pour les labels de flèches, réduire la taille si elle est trop grande
     # Les labels doivent être plus petits que le texte dans les formes
@@ -966,7 +943,8 @@ def _create_excalidraw_text(gliffy_obj: Dict, object_info: Dict[str, Dict], arro
     return base
 
 
-def _create_excalidraw_rectangle(gliffy_obj: Dict, all_objects: List[Dict], object_info: Dict[str, Dict], id_map: Dict[str, str]) -> Optional[Dict]:
+def _create_excalidraw_rectangle(gliffy_obj: Dict, children_by_parent: Dict[str, List[Dict]], arrow_ids: Set[str],
+                                 object_info: Dict[str, Dict], id_map: Dict[str, str]) -> Optional[Dict]:
     """Convertit un rectangle Gliffy en élément rectangle Excalidraw."""
     base = new_excalidraw_base('rectangle')
     
@@ -1023,112 +1001,19 @@ def _create_excalidraw_rectangle(gliffy_obj: Dict, all_objects: List[Dict], obje
             html_content = text_graphic.get('html', '')
             if html_content:
                 # Extraire la taille de police depuis l'objet
-                # Essayer d'abord avec BeautifulSoup
-                font_size_found = False
-                try:
-                    soup = BeautifulSoup(html_content, 'html.parser')
-                    for tag in soup.find_all(True):
-                        style = tag.get('style', '')
-                        if style:
-                            font_size_match = re.search(r'font-size:\s*(\d+(?:\.\d+)?)\s*px', style, re.IGNORECASE)
-                            if font_size_match:
-                                try:
-                                    font_size = int(float(font_size_match.group(1)))
-                                    font_size_found = True
-                                    break
-                                except (ValueError, TypeError):
-                                    continue
-                except:
-                    pass
-                
-                # Si pas trouvé avec BeautifulSoup, chercher dans le HTML brut
-                if not font_size_found:
-                    font_size_patterns = [
-                        r'font-size:\s*(\d+(?:\.\d+)?)\s*px',
-                        r'font-size:\s*(\d+(?:\.\d+)?)px',
-                        r'style="[^"]*font-size:\s*(\d+(?:\.\d+)?)\s*px[^"]*"',
-                    ]
-                    
-                    for pattern in font_size_patterns:
-                        font_size_match = re.search(pattern, html_content, re.IGNORECASE)
-                        if font_size_match:
-                            try:
-                                font_size = int(float(font_size_match.group(1)))
-                                font_size_found = True
-                                break
-                            except (ValueError, TypeError):
-                                continue
-    
-    # Si pas de texte direct, chercher dans les enfants
+                font_size = get_html_font_size(html_content, font_size)
+    
+    # Si pas de texte direct, chercher dans les enfants (index des enfants, hors labels de flèches)
     if not text_content and obj_id_str:
-        for child_obj in all_objects:
-            child_parent_id = child_obj.get('_parentId')
-            if child_parent_id and str(child_parent_id) == obj_id_str:
-                child_type = get_gliffy_object_type(child_obj)
-                if child_type == 'text':
-                    # Vérifier si ce texte est un label de flèche (son parent est une flèche)
-                    # Si c'est le cas, ne pas l'inclure dans la forme
-                    is_arrow_label = False
-                    if child_parent_id:
-                        # Vérifier si le parent est une flèche
-                        # Comparer les IDs en string pour éviter les problèmes de type
-                        child_parent_id_str = str(child_parent_id)
-                        for parent_obj in all_objects:
-                            parent_obj_id = parent_obj.get('id')
-                            if parent_obj_id is not None:
-                                parent_obj_id_str = str(parent_obj_id)
-                                if parent_obj_id_str == child_parent_id_str:
-                                    parent_obj_type = get_gliffy_object_type(parent_obj)
-                                    if parent_obj_type == 'arrow':
-                                        is_arrow_label = True
-                                        break
-                    
-                    # Ne pas inclure les labels de flèches dans les formes
-                    if not is_arrow_label:
-                        child_text = get_gliffy_text_content(child_obj)
-                        if child_text:
-                            text_content = child_text
-                            # Extraire la taille de police depuis l'enfant
-                            child_graphic = child_obj.get('graphic', {})
-                            child_text_graphic = child_graphic.get('Text', {})
-                            html_content = child_text_graphic.get('html', '')
-                            if html_content:
-                                # Méthode 1 : Utiliser BeautifulSoup pour extraire les styles depuis les balises
-                                font_size_found = False
-                                try:
-                                    soup = BeautifulSoup(html_content, 'html.parser')
-                                    for tag in soup.find_all(True):  # Toutes les balises
-                                        style = tag.get('style', '')
-                                        if style:
-                                            font_size_match = re.search(r'font-size:\s*(\d+(?:\.\d+)?)\s*px', style, re.IGNORECASE)
-                                            if font_size_match:
-                                                try:
-                                                    font_size = int(float(font_size_match.group(1)))
-                                                    font_size_found = True
-                                                    break
-                                                except (ValueError, TypeError):
-                                                    continue
-                                except:
-                                    pass
-                                
-                                # Méthode 2 : Si pas trouvé avec BeautifulSoup, chercher dans le HTML brut
-                                if not font_size_found:
-                                    font_size_patterns = [
-                                        r'font-size:\s*(\d+(?:\.\d+)?)\s*px',
-                                        r'font-size:\s*(\d+(?:\.\d+)?)px',
-                                        r'style="[^"]*font-size:\s*(\d+(?:\.\d+)?)\s*px[^"]*"',
-                                    ]
-                                    
-                                    for pattern in font_size_patterns:
-                                        font_size_match = re.search(pattern, html_content, re.IGNORECASE)
-                                        if font_size_match:
-                                            try:
-                                                font_size = int(float(font_size_match.group(1)))
-                                                font_size_found = True
-                                                break
-                                            except (ValueError, TypeError):
-                                                continue
-                            break
+        child_obj, child_text = find_child_text(obj_id_str, children_by_parent, arrow_ids)
+        if child_obj is not None:
+            text_content = child_text
+            # Extraire la taille de police depuis l'enfant
+            child_graphic = child_obj.get('graphic', {})
+            child_text_graphic = child_graphic.get('Text', {})
+            html_content = child_text_graphic.get('html', '')
+            if html_content:
+                font_size = get_html_font_size(html_content, font_size)
     
     # Ajouter le texte intégré dans la forme
     if text_content:
@@ -1168,7 +1053,8 @@ def _create_excalidraw_rectangle(gliffy_obj: Dict, all_objects: List[Dict], obje
     return base
 
 
-def _create_excalidraw_ellipse(gliffy_obj: Dict, all_objects: List[Dict], object_info: Dict[str, Dict], id_map: Dict[str, str]) -> Optional[Dict]:
+def _create_excalidraw_ellipse(gliffy_obj: Dict, children_by_parent: Dict[str, List[Dict]], arrow_ids: Set[str],
+                               object_info: Dict[str, Dict], id_map: Dict[str, str]) -> Optional[Dict]:
     """Convertit une ellipse Gliffy en élément ellipse Excalidraw."""
     base = new_excalidraw_base('ellipse')
     
@@ -1216,112 +1102,19 @@ def _create_excalidraw_ellipse(gliffy_obj: Dict, all_objects: List[Dict], object
             html_content = text_graphic.get('html', '')
             if html_content:
                 # Extraire la taille de police depuis l'objet
-                # Essayer d'abord avec BeautifulSoup
-                font_size_found = False
-                try:
-                    soup = BeautifulSoup(html_content, 'html.parser')
-                    for tag in soup.find_all(True):
-                        style = tag.get('style', '')
-                        if style:
-                            font_size_match = re.search(r'font-size:\s*(\d+(?:\.\d+)?)\s*px', style, re.IGNORECASE)
-                            if font_size_match:
-                                try:
-                                    font_size = int(float(font_size_match.group(1)))
-                                    font_size_found = True
-                                    break
-                                except (ValueError, TypeError):
-                                    continue
-                except:
-                    pass
-                
-                # Si pas trouvé avec BeautifulSoup, chercher dans le HTML brut
-                if not font_size_found:
-                    font_size_patterns = [
-                        r'font-size:\s*(\d+(?:\.\d+)?)\s*px',
-                        r'font-size:\s*(\d+(?:\.\d+)?)px',
-                        r'style="[^"]*font-size:\s*(\d+(?:\.\d+)?)\s*px[^"]*"',
-                    ]
-                    
-                    for pattern in font_size_patterns:
-                        font_size_match = re.search(pattern, html_content, re.IGNORECASE)
-                        if font_size_match:
-                            try:
-                                font_size = int(float(font_size_match.group(1)))
-                                font_size_found = True
-                                break
-                            except (ValueError, TypeError):
-                                continue
-    
-    # Si pas de texte direct, chercher dans les enfants
+                font_size = get_html_font_size(html_content, font_size)
+    
+    # Si pas de texte direct, chercher dans les enfants (index des enfants, hors labels de flèches)
     if not text_content and obj_id_str:
-        for child_obj in all_objects:
-            child_parent_id = child_obj.get('_parentId')
-            if child_parent_id and str(child_parent_id) == obj_id_str:
-                child_type = get_gliffy_object_type(child_obj)
-                if child_type == 'text':
-                    # Vérifier si ce texte est un label de flèche (son parent est une flèche)
-                    # Si c'est le cas, ne pas l'inclure dans la forme
-                    is_arrow_label = False
-                    if child_parent_id:
-                        # Vérifier si le parent est une flèche
-                        # Comparer les IDs en string pour éviter les problèmes de type
-                        child_parent_id_str = str(child_parent_id)
-                        for parent_obj in all_objects:
-                            parent_obj_id = parent_obj.get('id')
-                            if parent_obj_id is not None:
-                                parent_obj_id_str = str(parent_obj_id)
-                                if parent_obj_id_str == child_parent_id_str:
-                                    parent_obj_type = get_gliffy_object_type(parent_obj)
-                                    if parent_obj_type == 'arrow':
-                                        is_arrow_label = True
-                                        break
-                    
-                    # Ne pas inclure les labels de flèches dans les formes
-                    if not is_arrow_label:
-                        child_text = get_gliffy_text_content(child_obj)
-                        if child_text:
-                            text_content = child_text
-                            # Extraire la taille de police depuis l'enfant
-                            child_graphic = child_obj.get('graphic', {})
-                            child_text_graphic = child_graphic.get('Text', {})
-                            html_content = child_text_graphic.get('html', '')
-                            if html_content:
-                                # Méthode 1 : Utiliser BeautifulSoup pour extraire les styles depuis les balises
-                                font_size_found = False
-                                try:
-                                    soup = BeautifulSoup(html_content, 'html.parser')
-                                    for tag in soup.find_all(True):  # Toutes les balises
-                                        style = tag.get('style', '')
-                                        if style:
-                                            font_size_match = re.search(r'font-size:\s*(\d+(?:\.\d+)?)\s*px', style, re.IGNORECASE)
-                                            if font_size_match:
-                                                try:
-                                                    font_size = int(float(font_size_match.group(1)))
-                                                    font_size_found = True
-                                                    break
-                                                except (ValueError, TypeError):
-                                                    continue
-                                except:
-                                    pass
-                                
-                                # Méthode 2 : Si pas trouvé avec BeautifulSoup, chercher dans le HTML brut
-                                if not font_size_found:
-                                    font_size_patterns = [
-                                        r'font-size:\s*(\d+(?:\.\d+)?)\s*px',
-                                        r'font-size:\s*(\d+(?:\.\d+)?)px',
-                                        r'style="[^"]*font-size:\s*(\d+(?:\.\d+)?)\s*px[^"]*"',
-                                    ]
-                                    
-                                    for pattern in font_size_patterns:
-                                        font_size_match = re.search(pattern, html_content, re.IGNORECASE)
-                                        if font_size_match:
-                                            try:
-                                                font_size = int(float(font_size_match.group(1)))
-                                                font_size_found = True
-                                                break
-                                            except (ValueError, TypeError):
-                                                continue
-                            break
+        child_obj, child_text = find_child_text(obj_id_str, children_by_parent, arrow_ids)
+        if child_obj is not None:
+            text_content = child_text
+            # Extraire la taille de police depuis l'enfant
+            child_graphic = child_obj.get('graphic', {})
+            child_text_graphic = child_graphic.get('Text', {})
+            html_content = child_text_graphic.get('html', '')
+            if html_content:
+                font_size = get_html_font_size(html_content, font_size)
     
     # Ajouter le texte intégré dans la forme
     if text_content:
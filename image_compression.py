@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Compression des images Gliffy avant insertion dans les pages Confluence.
+
+La compression (redimensionnement LANCZOS et ré-encodages PNG/JPEG) est
+coûteuse en CPU : elle est exécutée dans un pool de processus pour ne pas
+bloquer les téléchargements et les mises à jour de pages, et pour utiliser
+tous les cœurs lorsqu'un espace contient beaucoup de grands diagrammes.
+
+Fonctionnalités :
+- compress_image : réduit une image PNG/JPEG sous une taille cible, en
+  estimant l'échelle à partir des octets par pixel (deux encodages en général)
+- Palette sans perte pour les PNG d'au plus 256 couleurs, quantification
+  256 couleurs optionnelle pour les autres
+- CompressionPool : file de compression sur un ProcessPoolExecutor
+  (démarré seulement si une image doit être compressée)
+- Les images déjà assez petites ne quittent pas le processus principal
+
+Auteur: Sanae Basraoui
+"""
+
+import io
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional, Tuple
+
+# Essayer d'importer PIL pour la compression d'images
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+
+# Taille maximale d'une image insérée (l'encodage base64 ajoute un tiers,
+# la page doit rester sous la limite de 5 MB de Confluence)
+DEFAULT_MAX_IMAGE_BYTES = 3_500_000
+
+# Recherche de l'échelle : nombre maximal d'encodages par image, part du
+# budget à atteindre pour s'arrêter et marge visée sous le budget
+MAX_ENCODES = 5
+TARGET_FILL = 0.85
+SIZE_MARGIN = 0.95
+
+# Plus petit côté (pixels) d'une image réduite
+MIN_DIMENSION = 200
+
+# Qualité JPEG, et qualité minimale si l'image ne tient pas à sa taille minimale
+JPEG_QUALITY = 85
+MIN_JPEG_QUALITY = 30
+
+
+def needs_compression(image_content: bytes, mime_type: str, max_size_bytes: int = DEFAULT_MAX_IMAGE_BYTES) -> bool:
+    """Indique si une image dépasse la taille cible et peut être compressée (PNG/JPEG, Pillow installé)."""
+    if not PIL_AVAILABLE or len(image_content) <= max_size_bytes:
+        return False
+    # Ne compresser que les PNG et JPEG
+    mime_type = (mime_type or '').lower()
+    return 'png' in mime_type or 'jpeg' in mime_type or 'jpg' in mime_type
+
+
+def _encode(img, image_format: str, quality: int) -> bytes:
+    """Encode une image en PNG (compression maximale) ou en JPEG."""
+    output = io.BytesIO()
+    if image_format == 'PNG':
+        img.save(output, format='PNG', optimize=True, compress_level=9)
+    else:
+        img.save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue()
+
+
+def _is_opaque(img) -> bool:
+    """Indique si une image n'a pas de transparence."""
+    if img.mode in ('RGBA', 'LA'):
+        return img.getchannel('A').getextrema()[0] == 255
+    return 'transparency' not in img.info
+
+
+def _to_palette(img, lossy: bool):
+    """
+    Convertit une image en PNG à palette (256 couleurs au plus).
+
+    Sans lossy, la conversion n'est faite que si elle est sans perte (image
+    opaque d'au plus 256 couleurs, cas courant des diagrammes) ; sinon None.
+    """
+    if img.mode == 'P':
+        return img
+    opaque = _is_opaque(img)
+    if opaque:
+        rgb = img.convert('RGB')
+        if lossy or rgb.getcolors(256) is not None:
+            # MEDIANCUT conserve exactement les couleurs lorsqu'il y en a 256 au plus
+            return rgb.quantize(colors=256, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+        return None
+    if lossy:
+        return img.convert('RGBA').quantize(colors=256, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+    return None
+
+
+def _resize(img, scale: float):
+    """Redimensionne une image (LANCZOS) en conservant ses proportions."""
+    if scale >= 1:
+        return img
+    if img.mode == 'P':
+        img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    return img.resize(size, Image.Resampling.LANCZOS)
+
+
+def _search_scale(
+    encode_at,
+    max_size_bytes: int,
+    min_scale: float,
+    observed: Optional[Tuple[float, bytes]] = None
+) -> Tuple[Optional[bytes], Optional[bytes]]:
+    """
+    Recherche le plus grand facteur d'échelle dont l'encodage tient dans max_size_bytes.
+
+    Le premier encodage est fait à pleine résolution (il suffit souvent).
+    La taille encodée est ensuite supposée proportionnelle au nombre de
+    pixels (octets par pixel constants) : chaque encodage donne une
+    estimation de l'échelle visée, bornée par les échelles déjà essayées
+    (recherche dichotomique guidée). S'arrête dès qu'un résultat remplit au
+    moins TARGET_FILL du budget, ou après MAX_ENCODES encodages.
+
+    Args:
+        encode_at: Fonction encodant l'image à une échelle donnée
+        min_scale: Échelle minimale (dimensions minimales)
+        observed: Encodage déjà réalisé (échelle, contenu), qui remplace le premier encodage
+
+    Returns:
+        Tuple (meilleur encodage sous le budget ou None, plus petit encodage produit)
+    """
+    best = None
+    best_scale = 0.0
+    smallest = None
+    too_big_scale = None
+    scale, data = observed if observed else (1.0, None)
+    for _ in range(MAX_ENCODES):
+        if data is None:
+            data = encode_at(scale)
+        size = len(data)
+        if smallest is None or size < len(smallest):
+            smallest = data
+        if size <= max_size_bytes:
+            best, best_scale = data, scale
+            if size >= max_size_bytes * TARGET_FILL or scale >= 1.0:
+                break
+        else:
+            too_big_scale = scale
+            if scale <= min_scale:
+                break
+
+        # Prochaine échelle : modèle octets/pixel, avec une marge sous le budget
+        guess = scale * (max_size_bytes * SIZE_MARGIN / size) ** 0.5
+        if best is not None and too_big_scale is not None:
+            span = too_big_scale - best_scale
+            if span < 0.01:
+                break
+            guess = min(max(guess, best_scale + span * 0.1), too_big_scale - span * 0.1)
+        elif too_big_scale is not None:
+            guess = min(guess, too_big_scale * 0.97)
+        guess = min(1.0, max(min_scale, guess))
+        if (best is not None and guess <= best_scale) or (too_big_scale is not None and guess >= too_big_scale):
+            break
+        scale, data = guess, None
+    return (best, smallest)
+
+
+def compress_image(
+    image_content: bytes,
+    mime_type: str,
+    max_size_bytes: int = DEFAULT_MAX_IMAGE_BYTES,
+    quantize: bool = False
+) -> Tuple[bytes, str]:
+    """
+    Compresse et réduit une image si nécessaire pour qu'elle rentre dans la limite de taille.
+    
+    Plutôt que d'essayer une liste fixe de qualités, l'image est encodée à
+    pleine résolution, puis l'échelle est estimée à partir du nombre d'octets
+    par pixel obtenu et affinée par une recherche bornée : la plupart des
+    images sont traitées en un ou deux encodages et l'image obtenue est la
+    plus grande qui tienne dans le budget.
+    Les PNG d'au plus 256 couleurs (diagrammes) sont d'abord convertis en
+    palette, sans perte ; avec quantize, les autres PNG sont réduits à 256
+    couleurs. Pour les JPEG, la qualité n'est abaissée que si l'image ne
+    tient pas à sa taille minimale.
+    
+    Fonction de module (et non méthode) pour pouvoir être exécutée dans un
+    processus du pool.
+    
+    Args:
+        image_content: Contenu de l'image en bytes
+        mime_type: Type MIME de l'image
+        max_size_bytes: Taille maximale cible en bytes
+        quantize: Réduire les PNG à une palette de 256 couleurs (avec perte)
+        
+    Returns:
+        Tuple (image_content_compressed, mime_type)
+    """
+    if not needs_compression(image_content, mime_type, max_size_bytes):
+        return (image_content, mime_type)
+    
+    try:
+        img = Image.open(io.BytesIO(image_content))
+        image_format = img.format
+        if image_format not in ('PNG', 'JPEG'):
+            return (image_content, mime_type)
+        img.load()
+        if image_format == 'JPEG' and img.mode != 'RGB':
+            img = img.convert('RGB')
+        compressed_mime_type = 'image/png' if image_format == 'PNG' else 'image/jpeg'
+        
+        # Échelle minimale : le plus petit côté ne descend pas sous MIN_DIMENSION pixels
+        min_scale = min(1.0, MIN_DIMENSION / min(img.width, img.height))
+        smallest = None
+        
+        if image_format == 'PNG':
+            observed = None
+            # Palette sans perte (ou quantification demandée) à pleine résolution
+            palette_img = _to_palette(img, quantize)
+            if palette_img is not None:
+                data = _encode(palette_img, 'PNG', JPEG_QUALITY)
+                if len(data) <= max_size_bytes:
+                    return (data, compressed_mime_type)
+                # Premier point de la recherche (pleine résolution trop grande)
+                smallest = data
+                observed = (1.0, data)
+            
+            def encode_at(scale):
+                resized = _resize(img, scale)
+                if quantize:
+                    resized = _to_palette(resized, True)
+                return _encode(resized, 'PNG', JPEG_QUALITY)
+            
+            best, smallest_scaled = _search_scale(encode_at, max_size_bytes, min_scale, observed)
+        else:
+            best, smallest_scaled = _search_scale(
+                lambda scale: _encode(_resize(img, scale), 'JPEG', JPEG_QUALITY),
+                max_size_bytes, min_scale
+            )
+            if best is None:
+                # Taille minimale atteinte : recherche dichotomique sur la qualité
+                resized = _resize(img, min_scale)
+                low, high = MIN_JPEG_QUALITY, JPEG_QUALITY - 1
+                for _ in range(MAX_ENCODES):
+                    if low > high:
+                        break
+                    quality = (low + high) // 2
+                    data = _encode(resized, 'JPEG', quality)
+                    if smallest_scaled is None or len(data) < len(smallest_scaled):
+                        smallest_scaled = data
+                    if len(data) <= max_size_bytes:
+                        best = data
+                        low = quality + 1
+                    else:
+                        high = quality - 1
+        
+        if best is None:
+            # Aucune version ne tient dans le budget : garder la plus petite
+            best = min((data for data in (smallest, smallest_scaled) if data), key=len, default=None)
+        
+        # Vérifier que la compression a fonctionné
+        if best and len(best) < len(image_content):
+            return (best, compressed_mime_type)
+        else:
+            # Si la compression n'a pas réduit la taille, retourner l'original
+            return (image_content, mime_type)
+            
+    except Exception as e:
+        # En cas d'erreur, retourner l'image originale
+        return (image_content, mime_type)
+
+
+class CompressionPool:
+    """File de compression des images, exécutée dans un pool de processus."""
+
+    def __init__(self, workers: Optional[int] = None, max_size_bytes: int = DEFAULT_MAX_IMAGE_BYTES, quantize: bool = False):
+        """
+        Args:
+            workers: Nombre de processus de compression (None = nombre de cœurs,
+                     0 = compression dans le processus principal)
+            max_size_bytes: Taille maximale cible des images
+            quantize: Réduire les PNG trop grands à une palette de 256 couleurs
+        """
+        self.workers = (os.cpu_count() or 1) if workers is None else max(0, int(workers))
+        self.max_size_bytes = max_size_bytes
+        self.quantize = quantize
+        self._executor = None
+        self.stats = {
+            'submitted': 0,
+            'compressed': 0,
+            'bytes_before': 0,
+            'bytes_after': 0
+        }
+
+    def submit(self, image_content: bytes, mime_type: str) -> Future:
+        """
+        Place une image dans la file de compression.
+
+        Returns:
+            Future: Résultat (contenu, type MIME) ; déjà disponible si l'image
+            n'a pas besoin d'être compressée
+        """
+        if not needs_compression(image_content, mime_type, self.max_size_bytes):
+            future = Future()
+            future.set_result((image_content, mime_type))
+            return future
+
+        self.stats['submitted'] += 1
+        if self.workers == 0:
+            future = Future()
+            future.set_result(compress_image(image_content, mime_type, self.max_size_bytes, self.quantize))
+            return future
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor.submit(compress_image, image_content, mime_type, self.max_size_bytes, self.quantize)
+
+    def result(self, future: Future, image_content: bytes, mime_type: str) -> Tuple[bytes, str]:
+        """
+        Attend le résultat d'une compression.
+
+        En cas d'échec du processus de compression, l'image originale est retournée.
+        """
+        try:
+            compressed_content, compressed_mime_type = future.result()
+        except Exception:
+            return (image_content, mime_type)
+        if len(compressed_content) < len(image_content):
+            self.stats['compressed'] += 1
+            self.stats['bytes_before'] += len(image_content)
+            self.stats['bytes_after'] += len(compressed_content)
+        return (compressed_content, compressed_mime_type)
+
+    def shutdown(self, cancel: bool = False):
+        """Arrête les processus du pool (cancel : abandonner les compressions en attente)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=not cancel, cancel_futures=cancel)
+            self._executor = None
+
+    def print_stats(self):
+        """Affiche les statistiques de compression."""
+        if not self.stats['submitted']:
+            return
+        print(f"\n🗜️  Compression des images ({self.workers or 1} processus):")
+        print(f"  • Images à compresser: {self.stats['submitted']}")
+        print(f"  • Images compressées: {self.stats['compressed']} "
+              f"({self.stats['bytes_before'] / 1_000_000:.1f} MB → {self.stats['bytes_after'] / 1_000_000:.1f} MB)")
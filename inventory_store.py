@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Stockage persistant (SQLite) de l'inventaire Confluence.
+
+Ce module remplace la liste Python en mémoire du scanner : les pages sont
+écrites par lots au fil du scan, survivent à un arrêt du processus et les
+exports (JSON, CSV, TXT) sont des requêtes parcourues ligne à ligne.
+
+Fonctionnalités :
+- Tables spaces, pages, gliffy_macros et ancestors, indexées par id, espace
+  et date de dernière modification
+- Écritures par lots dans des transactions (thread-safe)
+- Numéro de passage (run) : les pages non revues lors du scan complet d'un
+  espace sont supprimées à la fin de l'espace
+- High-water mark par espace pour le scan incrémental
+- Lecture en streaming de l'inventaire d'un passage
+
+Auteur: Sanae Basraoui
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+# Base d'inventaire par défaut
+DEFAULT_INVENTORY_DB = 'confluence_inventory.db'
+
+# Nombre de pages écrites par transaction
+DEFAULT_BATCH_SIZE = 500
+
+# Colonnes de la table pages, dans l'ordre des dictionnaires d'inventaire
+PAGE_COLUMNS = [
+    'id', 'title', 'space_key', 'space_name', 'status', 'version',
+    'created_date', 'created_by', 'last_updated_date', 'last_updated_by',
+    'parent_id', 'parent_title', 'url', 'ancestors_count', 'gliffy_count'
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scan_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS spaces (
+    key TEXT PRIMARY KEY,
+    name TEXT,
+    high_water_mark TEXT,
+    last_run INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS pages (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    space_key TEXT,
+    space_name TEXT,
+    status TEXT,
+    version INTEGER,
+    created_date TEXT,
+    created_by TEXT,
+    last_updated_date TEXT,
+    last_updated_by TEXT,
+    parent_id TEXT,
+    parent_title TEXT,
+    url TEXT,
+    ancestors_count INTEGER,
+    gliffy_count INTEGER,
+    run INTEGER,
+    space_position INTEGER,
+    position INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_pages_space ON pages (space_key, position);
+CREATE INDEX IF NOT EXISTS idx_pages_last_updated ON pages (last_updated_date);
+CREATE INDEX IF NOT EXISTS idx_pages_run ON pages (run, space_position, position);
+
+CREATE TABLE IF NOT EXISTS gliffy_macros (
+    page_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    title TEXT,
+    PRIMARY KEY (page_id, position)
+);
+
+CREATE TABLE IF NOT EXISTS ancestors (
+    page_id TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    ancestor_id TEXT,
+    ancestor_title TEXT,
+    PRIMARY KEY (page_id, depth)
+);
+CREATE INDEX IF NOT EXISTS idx_ancestors_ancestor ON ancestors (ancestor_id);
+"""
+
+
+class InventoryStore:
+    """Inventaire Confluence persistant dans une base SQLite."""
+
+    def __init__(self, db_path: str = DEFAULT_INVENTORY_DB, batch_size: int = DEFAULT_BATCH_SIZE):
+        """
+        Ouvre (ou crée) la base d'inventaire.
+
+        Args:
+            db_path: Chemin du fichier SQLite (':memory:' pour une base temporaire)
+            batch_size: Nombre de pages écrites par transaction
+        """
+        self.db_path = db_path
+        self.batch_size = max(1, int(batch_size))
+        if db_path != ':memory:':
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        # Connexion partagée entre les threads du scan : les accès sont sérialisés par le verrou
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.executescript(SCHEMA)
+            self.conn.commit()
+
+        self._pending_pages = []
+        self._pending_touches = []
+
+    def close(self):
+        """Écrit les lots en attente et ferme la base."""
+        self.flush()
+        with self.lock:
+            self.conn.close()
+
+    def begin_run(self) -> int:
+        """Enregistre un nouveau passage de scan et retourne son numéro."""
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                'INSERT INTO scan_runs (started_at) VALUES (?)',
+                (datetime.now().isoformat(),)
+            )
+            return cursor.lastrowid
+
+    def add_page(self, page_info: Dict, run: int, space_position: int, position: int,
+                 ancestors: Optional[List[Dict]] = None):
+        """
+        Ajoute (ou remplace) une page de l'inventaire ; l'écriture est différée au lot.
+
+        Args:
+            page_info: Dictionnaire produit par ConfluenceScanner.extract_page_info
+            run: Numéro du passage de scan
+            space_position: Rang de l'espace dans le scan (ordre des exports)
+            position: Rang de la page dans son espace
+            ancestors: Ancêtres bruts de l'API (du plus haut au parent direct)
+        """
+        with self.lock:
+            self._pending_pages.append((page_info, run, space_position, position, ancestors or []))
+            if len(self._pending_pages) >= self.batch_size:
+                self._flush_locked()
+
+    def touch_page(self, page_id: str, run: int, space_position: int, position: int):
+        """Marque une page inchangée comme vue dans ce passage (scan incrémental)."""
+        with self.lock:
+            self._pending_touches.append((run, space_position, position, page_id))
+            if len(self._pending_touches) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        """Écrit les pages en attente dans une transaction."""
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending_pages and not self._pending_touches:
+            return
+
+        # Une même page ne doit apparaître qu'une fois par lot (la dernière version l'emporte)
+        pending_pages = {entry[0]['id']: entry for entry in self._pending_pages}
+
+        page_rows = []
+        macro_rows = []
+        ancestor_rows = []
+        page_ids = []
+        for page_info, run, space_position, position, ancestors in pending_pages.values():
+            page_id = page_info['id']
+            page_ids.append((page_id,))
+            page_rows.append(tuple(page_info.get(column) for column in PAGE_COLUMNS) + (run, space_position, position))
+            for index, title in enumerate(page_info.get('gliffy_titles', [])):
+                macro_rows.append((page_id, index, title))
+            for depth, ancestor in enumerate(ancestors):
+                ancestor_rows.append((page_id, depth, ancestor.get('id'), ancestor.get('title', '')))
+
+        placeholders = ', '.join('?' * (len(PAGE_COLUMNS) + 3))
+        with self.conn:
+            if page_rows:
+                self.conn.executemany('DELETE FROM gliffy_macros WHERE page_id = ?', page_ids)
+                self.conn.executemany('DELETE FROM ancestors WHERE page_id = ?', page_ids)
+                self.conn.executemany(
+                    f"INSERT OR REPLACE INTO pages ({', '.join(PAGE_COLUMNS)}, run, space_position, position) "
+                    f"VALUES ({placeholders})",
+                    page_rows
+                )
+                self.conn.executemany('INSERT INTO gliffy_macros (page_id, position, title) VALUES (?, ?, ?)', macro_rows)
+                self.conn.executemany(
+                    'INSERT INTO ancestors (page_id, depth, ancestor_id, ancestor_title) VALUES (?, ?, ?, ?)',
+                    ancestor_rows
+                )
+            if self._pending_touches:
+                self.conn.executemany(
+                    'UPDATE pages SET run = ?, space_position = ?, position = ? WHERE id = ?',
+                    self._pending_touches
+                )
+
+        self._pending_pages = []
+        self._pending_touches = []
+
+    def get_space_state(self, space_key: str) -> Optional[Dict]:
+        """Retourne l'état d'un espace (name, high_water_mark) ou None s'il n'a jamais été scanné."""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT name, high_water_mark FROM spaces WHERE key = ? AND high_water_mark IS NOT NULL',
+                (space_key,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def get_page_versions(self, space_key: str) -> Dict[str, Tuple[int, str]]:
+        """Retourne {id: (version, statut)} des pages connues d'un espace."""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT id, version, status FROM pages WHERE space_key = ?',
+                (space_key,)
+            ).fetchall()
+        return {row['id']: (row['version'], row['status']) for row in rows}
+
+    def end_space(self, space_key: str, space_name: str, run: int, high_water_mark: Optional[str]):
+        """
+        Termine le scan complet d'un espace.
+
+        Les pages de l'espace qui n'ont pas été vues dans ce passage
+        (supprimées dans Confluence) sont retirées de l'inventaire.
+
+        Returns:
+            int: Nombre de pages supprimées
+        """
+        with self.lock:
+            self._flush_locked()
+            with self.conn:
+                stale_ids = [
+                    (row['id'],) for row in self.conn.execute(
+                        'SELECT id FROM pages WHERE space_key = ? AND run != ?', (space_key, run)
+                    )
+                ]
+                self.conn.executemany('DELETE FROM gliffy_macros WHERE page_id = ?', stale_ids)
+                self.conn.executemany('DELETE FROM ancestors WHERE page_id = ?', stale_ids)
+                self.conn.executemany('DELETE FROM pages WHERE id = ?', stale_ids)
+                self.conn.execute(
+                    'INSERT INTO spaces (key, name, high_water_mark, last_run) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET name = excluded.name, '
+                    'high_water_mark = COALESCE(excluded.high_water_mark, spaces.high_water_mark), '
+                    'last_run = excluded.last_run',
+                    (space_key, space_name, high_water_mark, run)
+                )
+        return len(stale_ids)
+
+    def keep_space_pages(self, space_key: str, run: int, space_position: int, position: int) -> int:
+        """
+        Rattache à ce passage les pages d'un espace qui n'y ont pas été vues.
+
+        Utilisé quand le listing de l'espace a échoué : les pages connues mais
+        non relistées sont conservées et restent présentes dans les exports du
+        passage, à la suite des pages vues (dans leur ordre précédent).
+
+        Args:
+            position: Rang attribué à la première page conservée
+
+        Returns:
+            int: Nombre de pages conservées
+        """
+        with self.lock:
+            self._flush_locked()
+            with self.conn:
+                kept_ids = [
+                    row['id'] for row in self.conn.execute(
+                        'SELECT id FROM pages WHERE space_key = ? AND run != ? ORDER BY position', (space_key, run)
+                    )
+                ]
+                self.conn.executemany(
+                    'UPDATE pages SET run = ?, space_position = ?, position = ? WHERE id = ?',
+                    [(run, space_position, position + index, page_id) for index, page_id in enumerate(kept_ids)]
+                )
+        return len(kept_ids)
+
+    def count_pages(self, run: int) -> Dict[str, int]:
+        """Retourne le nombre de pages par espace pour un passage."""
+        self.flush()
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT space_key, COUNT(*) AS total FROM pages WHERE run = ? GROUP BY space_key',
+                (run,)
+            ).fetchall()
+        return {row['space_key']: row['total'] for row in rows}
+
+    def iter_pages(self, run: int, order_by_space_key: bool = False) -> Iterator[Dict]:
+        """
+        Parcourt l'inventaire d'un passage sans le charger en mémoire.
+
+        Args:
+            run: Numéro du passage
+            order_by_space_key: Trier par clé d'espace (rapport TXT) plutôt
+                                que dans l'ordre du scan
+
+        Yields:
+            Dict: Page au format de ConfluenceScanner.extract_page_info
+        """
+        self.flush()
+        order = 'space_key, position' if order_by_space_key else 'space_position, position'
+        query = (
+            f"SELECT {', '.join(PAGE_COLUMNS)}, "
+            "CASE WHEN gliffy_count > 0 THEN ("
+            "  SELECT json_group_array(title) FROM ("
+            "    SELECT title FROM gliffy_macros g WHERE g.page_id = pages.id ORDER BY g.position"
+            "  )"
+            ") ELSE '[]' END AS gliffy_titles "
+            f"FROM pages WHERE run = ? ORDER BY {order}"
+        )
+        # Curseur dédié : les lignes sont lues au fur et à mesure
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(query, (run,))
+            for row in cursor:
+                page = dict(row)
+                page['gliffy_titles'] = json.loads(page['gliffy_titles'])
+                yield page
+        finally:
+            cursor.close()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Journal de migration durable (fichier JSONL en ajout seul).
+
+Chaque page traitée par la migration est consignée dès que son résultat est
+connu, ainsi que la fin de chaque espace. Après un crash ou un Ctrl-C, la
+migration peut reprendre (--resume) là où elle s'était arrêtée sans
+re-télécharger ni re-vérifier les pages déjà faites.
+
+Format : une ligne JSON par événement
+- {"type": "run_start", "resume": false, "scope": {...}, "timestamp": ...}
+- {"type": "page", "space_key": ..., "page_id": ..., "result": {...}, "timestamp": ...}
+- {"type": "space_done", "space_key": ..., "timestamp": ...}
+- {"type": "run_end", "timestamp": ...}
+
+Fonctionnalités :
+- Écriture ligne par ligne avec flush + fsync (une ligne écrite est durable)
+- Lecture tolérante : une dernière ligne tronquée par un crash est ignorée
+  (et terminée avant la reprise de l'écriture)
+- Reconstitution de l'état d'une session (série de run_start ... --resume)
+
+Auteur: Sanae Basraoui
+"""
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+
+# Fichier journal par défaut
+DEFAULT_JOURNAL_FILE = 'migration_journal.jsonl'
+
+
+class MigrationJournal:
+    """Journal append-only des résultats de migration."""
+
+    def __init__(self, journal_file: str = DEFAULT_JOURNAL_FILE):
+        """
+        Args:
+            journal_file: Chemin du fichier journal (créé s'il n'existe pas)
+        """
+        self.journal_file = Path(journal_file)
+        self.journal_file.parent.mkdir(parents=True, exist_ok=True)
+        self._file = None
+
+    def load_session(self) -> Optional[Dict]:
+        """
+        Relit la dernière session de migration du journal.
+
+        Une session commence au dernier run_start lancé sans --resume et inclut
+        toutes les reprises qui ont suivi.
+
+        Returns:
+            Optional[Dict]: None si aucun run n'est journalisé, sinon
+            {'scope': ..., 'pages': {page_id: {'space_key', 'result'}},
+             'spaces_done': set, 'completed': bool}
+        """
+        if not self.journal_file.exists():
+            return None
+
+        session = None
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Ligne tronquée (interruption pendant l'écriture)
+                    continue
+
+                entry_type = entry.get('type')
+                if entry_type == 'run_start':
+                    if session is None or not entry.get('resume'):
+                        session = {
+                            'scope': entry.get('scope', {}),
+                            'pages': {},
+                            'spaces_done': set(),
+                            'completed': False
+                        }
+                    else:
+                        session['completed'] = False
+                elif session is None:
+                    continue
+                elif entry_type == 'page':
+                    session['pages'][entry['page_id']] = {
+                        'space_key': entry.get('space_key'),
+                        'result': entry.get('result', {})
+                    }
+                elif entry_type == 'space_done':
+                    session['spaces_done'].add(entry.get('space_key'))
+                elif entry_type == 'run_end':
+                    session['completed'] = True
+
+        return session
+
+    def _ends_with_partial_line(self) -> bool:
+        """Indique si le journal existant ne se termine pas par un saut de ligne."""
+        if not self.journal_file.exists() or self.journal_file.stat().st_size == 0:
+            return False
+        with open(self.journal_file, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b'\n'
+
+    def _write(self, entry: Dict):
+        """Ajoute une ligne au journal et la force sur disque."""
+        if self._file is None:
+            needs_newline = self._ends_with_partial_line()
+            self._file = open(self.journal_file, 'a', encoding='utf-8')
+            if needs_newline:
+                # Dernière ligne tronquée par un crash : terminée pour ne pas y coller la suivante
+                self._file.write('\n')
+        entry['timestamp'] = datetime.now().isoformat()
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def start_run(self, scope: Dict, resume: bool = False):
+        """Consigne le début d'un run (nouvelle session, ou reprise si resume)."""
+        self._write({'type': 'run_start', 'resume': resume, 'scope': scope})
+
+    def record_page(self, space_key: Optional[str], page_id: str, result: Dict):
+        """Consigne le résultat d'une page."""
+        self._write({'type': 'page', 'space_key': space_key, 'page_id': page_id, 'result': result})
+
+    def record_space_done(self, space_key: str):
+        """Consigne qu'un espace a été entièrement parcouru."""
+        self._write({'type': 'space_done', 'space_key': space_key})
+
+    def end_run(self):
+        """Consigne la fin normale du run et ferme le journal."""
+        self._write({'type': 'run_end'})
+        self.close()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -9,6 +9,10 @@ Ce module effectue un traitement complet des diagrammes Gliffy dans Confluence :
 4. Convertit les Gliffy en Excalidraw avec images en base64
 5. Sauvegarde les fichiers Excalidraw dans le dossier output/
 
+Les pages sont parcourues au fil de la pagination avec le client Confluence
+partagé (ConfluenceBase) : découverte CQL des pages Gliffy, authentification
+Basic ou Bearer (PAT Data Center), réessais et limitation de débit.
+
 Auteur: Sanae Basraoui
 """
 
@@ -16,23 +20,59 @@ import argparse
 import base64
 import json
 import re
-import requests
-from typing import List, Dict, Optional, Tuple
+from attachment_cache import AttachmentCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_MAX_BYTES, get_attachment_version
+from attachment_index import AttachmentIndexes, GLIFFY_EXTENSIONS
+from confluence_base import ConfluenceBase, DISCOVERY_MODES, expand_fields
+from confluence_http import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+from storage_macros import find_gliffy_macros, gliffy_attachment_info
+from typing import Iterator, List, Dict, Optional, Tuple
 from pathlib import Path
 
 
-class GliffyProcessor:
+class GliffyProcessor(ConfluenceBase):
+    # Champs des pages traitées (contenu, version et espace pour la mise à jour)
+    PAGE_EXPAND = expand_fields('migrate', 'space')
+    
     def __init__(
         self,
         confluence_url: str,
-        username: str,
+        username: Optional[str],
         api_token: str,
         excalidraw_output_dir: str = "output",
         spaces: Optional[List[str]] = None,
+        cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+        cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+        discovery: str = 'cql',
+        workers: int = 1,
+        max_retries: int = 5,
+        rate_limit: float = 50.0,
+        pool_maxsize: Optional[int] = None,
+        pool_block: bool = False,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
     ):
-        self.confluence_url = confluence_url.rstrip('/')
-        self.username = username
-        self.api_token = api_token
+        """
+        Initialise le processeur de Gliffy.
+        
+        Args:
+            confluence_url: URL de base de Confluence
+            username: Nom d'utilisateur (ou email pour Cloud), None pour un PAT Data Center
+            api_token: Token API ou PAT
+            excalidraw_output_dir: Dossier des fichiers Excalidraw
+            spaces: Liste des clés d'espaces à traiter (None = tous)
+            cache_dir: Dossier du cache des pièces jointes (None = pas de cache)
+            cache_max_bytes: Taille maximale du cache des pièces jointes (octets)
+            discovery: 'cql' (recherche des pages Gliffy) ou 'scan' (toutes les pages)
+            workers, max_retries, rate_limit, pool_maxsize, pool_block,
+            connect_timeout, read_timeout: Configuration HTTP (voir ConfluenceBase)
+        """
+        super().__init__(
+            confluence_url, username, api_token,
+            workers=workers, max_retries=max_retries, rate_limit=rate_limit,
+            pool_maxsize=pool_maxsize, pool_block=pool_block,
+            connect_timeout=connect_timeout, read_timeout=read_timeout
+        )
+        self.discovery = discovery
         self.excalidraw_output_dir = Path(excalidraw_output_dir)
         try:
             self.excalidraw_output_dir.mkdir(exist_ok=True)
@@ -41,25 +81,10 @@ class GliffyProcessor:
             self.excalidraw_output_dir = Path(".")
         self.spaces_filter = set(spaces) if spaces else None
         
-        # Détecter si c'est Atlassian Cloud
-        if 'atlassian.net' in self.confluence_url.lower():
-            # Pour Atlassian Cloud, l'API est toujours à /wiki/rest/api
-            if '/wiki' in self.confluence_url.lower():
-                # URL contient déjà /wiki, utiliser tel quel
-                self.api_base = f"{self.confluence_url.rstrip('/wiki')}/wiki/rest/api"
-            else:
-                # URL sans /wiki, l'ajouter
-                self.api_base = f"{self.confluence_url}/wiki/rest/api"
-        else:
-            # Confluence Server/Data Center
-            self.api_base = f"{self.confluence_url.rstrip('/')}/rest/api"
-        
-        self.session = requests.Session()
-        self.session.auth = (username, api_token)
-        self.session.headers.update({
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        })
+        # Cache disque des pièces jointes (None = désactivé)
+        self.attachment_cache = AttachmentCache(cache_dir, cache_max_bytes) if cache_dir else None
+        # Pièces jointes listées une fois par page et par exécution
+        self.attachment_indexes = AttachmentIndexes(self.get_attachments)
         
         self.stats = {
             'spaces_analyzed': 0,
@@ -74,188 +99,54 @@ class GliffyProcessor:
     def get_all_spaces(self) -> List[Dict]:
         """Récupère tous les espaces Confluence."""
         print("📂 Récupération de la liste des espaces...")
-        spaces = []
-        start = 0
-        limit = 100
-        
-        while True:
-            url = f"{self.api_base}/space"
-            params = {'start': start, 'limit': limit, 'expand': 'name,key'}
-            
-            try:
-                response = self.session.get(url, params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                results = data.get('results', [])
-                if not results:
-                    break
-                    
-                spaces.extend(results)
-                
-                if len(results) < limit:
-                    break
-                    
-                start += limit
-            except Exception as e:
-                print(f"❌ Erreur lors de la récupération des espaces: {e}")
-                if hasattr(e, 'response') and e.response is not None:
-                    print(f"   URL testée: {url}")
-                    try:
-                        error_data = e.response.json()
-                        error_msg = error_data.get('message') or error_data.get('errorMessage') or str(error_data)
-                        print(f"   Message: {error_msg}")
-                    except:
-                        print(f"   Réponse: {e.response.text[:300]}")
-                break
+        spaces = super().get_all_spaces(self.spaces_filter)
         
         if self.spaces_filter:
-            spaces = [s for s in spaces if s.get('key') in self.spaces_filter]
             print(f"✅ {len(spaces)} espace(s) sélectionné(s)")
         else:
             print(f"✅ {len(spaces)} espace(s) trouvé(s)")
         
         return spaces
 
+    def iter_pages(self, space_key: str, include_drafts: bool = True) -> Iterator[Dict]:
+        """Parcourt les pages d'un espace au fil de la pagination (brouillons dédoublonnés)."""
+        return super().iter_pages(space_key, include_drafts, expand=self.PAGE_EXPAND)
+
     def get_all_pages(self, space_key: str, include_drafts: bool = True) -> List[Dict]:
-        """Récupère toutes les pages d'un espace."""
-        pages = []
-        start = 0
-        limit = 100
-        
-        while True:
-            url = f"{self.api_base}/content"
-            params = {
-                'spaceKey': space_key,
-                'type': 'page',
-                'start': start,
-                'limit': limit,
-                'expand': 'space,version,body.storage'
-            }
-            
-            try:
-                response = self.session.get(url, params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                results = data.get('results', [])
-                if not results:
-                    break
-                    
-                pages.extend(results)
-                
-                if len(results) < limit:
-                    break
-                    
-                start += limit
-            except Exception as e:
-                break
-        
-        # Chercher aussi les drafts
-        if include_drafts:
-            start = 0
-            while True:
-                url = f"{self.api_base}/content"
-                params = {
-                    'spaceKey': space_key,
-                    'type': 'page',
-                    'status': 'draft',
-                    'start': start,
-                    'limit': limit,
-                    'expand': 'space,version,body.storage'
-                }
-                
-                try:
-                    response = self.session.get(url, params=params)
-                    response.raise_for_status()
-                    data = response.json()
-                    
-                    results = data.get('results', [])
-                    if not results:
-                        break
-                        
-                    pages.extend(results)
-                    
-                    if len(results) < limit:
-                        break
-                        
-                    start += limit
-                except Exception as e:
-                    break
-        
-        return pages
+        """Récupère toutes les pages d'un espace (préférer iter_pages pour les grands espaces)."""
+        return list(self.iter_pages(space_key, include_drafts))
 
     def extract_gliffy_attachments_from_content(self, body_storage: str, page_id: str = "Inconnue") -> List[Dict]:
         """Extrait les IDs d'attachments Gliffy depuis le contenu d'une page."""
         gliffy_attachments = []
         
-        gliffy_macro_pattern = r'<ac:structured-macro[^>]*ac:name=["\']gliffy["\'][^>]*>.*?</ac:structured-macro>'
-        gliffy_macros = re.findall(gliffy_macro_pattern, body_storage, re.DOTALL | re.IGNORECASE)
-        
-        for macro in gliffy_macros:
-            image_att_id = re.search(r'<ac:parameter[^>]*ac:name=["\']imageAttachmentId["\'][^>]*>([^<]+)</ac:parameter>', macro, re.IGNORECASE)
-            diagram_att_id = re.search(r'<ac:parameter[^>]*ac:name=["\']diagramAttachmentId["\'][^>]*>([^<]+)</ac:parameter>', macro, re.IGNORECASE)
-            macro_id = re.search(r'<ac:parameter[^>]*ac:name=["\']macroId["\'][^>]*>([^<]+)</ac:parameter>', macro, re.IGNORECASE)
-            name_param = re.search(r'<ac:parameter[^>]*ac:name=["\']name["\'][^>]*>([^<]+)</ac:parameter>', macro, re.IGNORECASE)
-            # Paramètres alternatifs DC
-            filename_param = re.search(r'<ac:parameter[^>]*ac:name=["\']filename["\'][^>]*>([^<]+)</ac:parameter>', macro, re.IGNORECASE)
-            id_param = re.search(r'<ac:parameter[^>]*ac:name=["\']id["\'][^>]*>([^<]+)</ac:parameter>', macro, re.IGNORECASE)
-            
-            att_id = image_att_id.group(1).strip() if image_att_id else None
-            diagram_att_id_value = diagram_att_id.group(1).strip() if diagram_att_id else None
-            macro_id_value = macro_id.group(1).strip() if macro_id else None
-            diagram_name = name_param.group(1).strip() if name_param else None
-            
-            # Si on n'a toujours pas d'ID d'attachement ou si c'est 'test' (placeholder DC)
-            if not att_id or att_id == 'test':
-                if id_param and id_param.group(1).strip() != 'test':
-                    att_id = id_param.group(1).strip()
-                elif name_param:
-                    att_id = name_param.group(1).strip()
-                elif filename_param:
-                    att_id = filename_param.group(1).strip()
-                elif id_param: # Fallback sur 'test'
-                    att_id = id_param.group(1).strip()
-
-            if not diagram_att_id_value or diagram_att_id_value == 'test':
-                diagram_att_id_value = diagram_att_id.group(1).strip() if diagram_att_id else att_id
-
-            if att_id or diagram_att_id_value:
-                gliffy_attachments.append({
-                    'attachmentId': att_id,
-                    'diagramAttachmentId': diagram_att_id_value,
-                    'macroId': macro_id_value,
-                    'diagramName': diagram_name,
-                    'macroHtml': macro
-                })
+        for macro in find_gliffy_macros(body_storage):
+            gliffy_att = gliffy_attachment_info(macro)
+            if gliffy_att['attachmentId'] or gliffy_att['diagramAttachmentId']:
+                gliffy_attachments.append(gliffy_att)
         
         return gliffy_attachments
 
-    def get_attachments(self, page_id: str) -> List[Dict]:
-        """Récupère tous les attachments d'une page."""
-        attachments = []
-        start = 0
-        limit = 100
-        while True:
-            url = f"{self.api_base}/content/{page_id}/child/attachment"
-            params = {'start': start, 'limit': limit}
-            try:
-                response = self.session.get(url, params=params, timeout=30)
-                if response.status_code != 200:
-                    break
-                data = response.json()
-                results = data.get('results', [])
-                if not results:
-                    break
-                attachments.extend(results)
-                if len(results) < limit:
-                    break
-                start += limit
-            except Exception:
-                break
-        return attachments
-
     def download_attachment_direct(self, page_id: str, attachment_id: str, is_draft: bool = False) -> Tuple[Optional[bytes], Optional[str], Optional[str]]:
+        """
+        Télécharge un attachment, en passant par le cache local s'il est activé.
+
+        La version actuelle de l'attachment est lue dans l'index des pièces
+        jointes de la page (ou relue dans Confluence s'il n'y figure pas) : le
+        contenu en cache n'est réutilisé que si la version n'a pas changé.
+        Retourne (content, mime_type, error_msg)
+        """
+        if self.attachment_cache is None:
+            return self._download_attachment(page_id, attachment_id, is_draft)
+        version = self.attachment_indexes.get(page_id).version(attachment_id)
+        if version is None:
+            version = get_attachment_version(self.http, self.api_base, attachment_id)
+        return self.attachment_cache.fetch(
+            page_id, attachment_id, version,
+            lambda: self._download_attachment(page_id, attachment_id, is_draft)
+        )
+    
+    def _download_attachment(self, page_id: str, attachment_id: str, is_draft: bool = False) -> Tuple[Optional[bytes], Optional[str], Optional[str]]:
         """
         Télécharge un attachment directement via l'API REST.
         Retourne (content, mime_type, error_msg)
@@ -270,7 +161,7 @@ class GliffyProcessor:
             # Utiliser un header Accept large pour le téléchargement binaire
             # et outrepasser le Accept: application/json de la session
             headers = {'Accept': '*/*'}
-            download_response = self.session.get(download_api_url, params=params, headers=headers, timeout=30)
+            download_response = self.http.get(download_api_url, params=params, headers=headers)
             
             if download_response.status_code == 200:
                 content = download_response.content
@@ -292,7 +183,7 @@ class GliffyProcessor:
             if attachment_id.startswith('att'):
                 attachment_id_no_prefix = attachment_id[3:]
                 download_api_url = f"{self.api_base}/content/{page_id}/child/attachment/{attachment_id_no_prefix}/download"
-                download_response = self.session.get(download_api_url, params=params, headers=headers, timeout=30)
+                download_response = self.http.get(download_api_url, params=params, headers=headers)
                 
                 if download_response.status_code == 200:
                     content = download_response.content
@@ -313,25 +204,13 @@ class GliffyProcessor:
             
             # Fallback pour Data Center : si l'ID n'est pas numérique, essayer de trouver par nom
             if attachment_id and not attachment_id.isdigit() and not attachment_id.startswith('att'):
-                page_attachments = self.get_attachments(page_id)
+                page_attachments = self.attachment_indexes.get(page_id)
                 search_name = attachment_id.strip()
                 
-                # Correspondance exacte
-                for att in page_attachments:
-                    title = att.get('title', '')
-                    if title == search_name or title == f"{search_name}.png" or title == f"{search_name}.svg" or title == f"{search_name}.gliffy":
-                        att_real_id = att.get('id')
-                        if att_real_id:
-                            return self.download_attachment_direct(page_id, att_real_id, is_draft)
-                
-                # Recherche souple
-                for att in page_attachments:
-                    title = att.get('title', '').lower()
-                    sn_lower = search_name.lower()
-                    if (sn_lower in title) and (title.endswith('.png') or title.endswith('.svg') or title.endswith('.gliffy')):
-                        att_real_id = att.get('id')
-                        if att_real_id:
-                            return self.download_attachment_direct(page_id, att_real_id, is_draft)
+                # Correspondance exacte (image du diagramme en priorité), sinon recherche souple
+                att = page_attachments.find_title(search_name) or page_attachments.search_title(search_name)
+                if att and att.get('id'):
+                    return self.download_attachment_direct(page_id, att['id'], is_draft)
 
             return (None, None, last_error or "Échec")
             
@@ -357,7 +236,7 @@ class GliffyProcessor:
                     if is_draft:
                         params['status'] = 'draft'
                     
-                    response = self.session.get(download_url, params=params, timeout=30)
+                    response = self.http.get(download_url, params=params)
                     
                     if response.status_code == 200:
                         try:
@@ -369,7 +248,7 @@ class GliffyProcessor:
                     
                     if response.status_code == 404 and is_draft:
                         params_no_status = {}
-                        response_no_status = self.session.get(download_url, params=params_no_status, timeout=30)
+                        response_no_status = self.http.get(download_url, params=params_no_status)
                         if response_no_status.status_code == 200:
                             try:
                                 gliffy_data = json.loads(response_no_status.content)
@@ -382,22 +261,12 @@ class GliffyProcessor:
         
         # Fallback pour Data Center : si l'ID n'est pas numérique, essayer de trouver par nom
         if diagram_attachment_id and not diagram_attachment_id.isdigit() and not diagram_attachment_id.startswith('att'):
-            page_attachments = self.get_attachments(page_id)
+            page_attachments = self.attachment_indexes.get(page_id)
             search_name = diagram_attachment_id.strip()
-            for att in page_attachments:
-                title = att.get('title', '')
-                if title == search_name or title == f"{search_name}.gliffy":
-                    att_real_id = att.get('id')
-                    if att_real_id:
-                        return self.download_gliffy_json(page_id, att_real_id, is_draft)
-            
-            for att in page_attachments:
-                title = att.get('title', '').lower()
-                sn_lower = search_name.lower()
-                if (sn_lower in title) and title.endswith('.gliffy'):
-                    att_real_id = att.get('id')
-                    if att_real_id:
-                        return self.download_gliffy_json(page_id, att_real_id, is_draft)
+            att = (page_attachments.find_title(search_name, GLIFFY_EXTENSIONS)
+                   or page_attachments.search_title(search_name, GLIFFY_EXTENSIONS))
+            if att and att.get('id'):
+                return self.download_gliffy_json(page_id, att['id'], is_draft)
 
         return None
 
@@ -405,11 +274,11 @@ class GliffyProcessor:
         """Insère une image PNG après la macro Gliffy."""
         try:
             url = f"{self.api_base}/content/{page_id}"
-            params = {'expand': 'body.storage,version,space,title'}
+            params = {'expand': expand_fields('migrate', 'space')}
             if is_draft:
                 params['status'] = 'draft'
             
-            response = self.session.get(url, params=params)
+            response = self.http.get(url, params=params)
             if response.status_code != 200:
                 return (False, None)
             
@@ -436,17 +305,14 @@ class GliffyProcessor:
             
             image_html = f'<p><strong>{title_text}</strong><br/><img src="{image_data_url}" alt="{alt_text}" title="{alt_text}" /></p>'
             
-            escaped_macro = re.escape(macro_html)
-            macro_match = re.search(escaped_macro, current_body, re.DOTALL | re.IGNORECASE)
+            all_macros = find_gliffy_macros(current_body)
+            macro_match = next((macro for macro in all_macros if macro.html == macro_html), None)
             
-            if not macro_match:
-                macro_pattern = r'<ac:structured-macro[^>]*ac:name=["\']gliffy["\'][^>]*>.*?</ac:structured-macro>'
-                all_macros = list(re.finditer(macro_pattern, current_body, re.DOTALL | re.IGNORECASE))
-                if all_macros:
-                    macro_match = all_macros[-1]
+            if not macro_match and all_macros:
+                macro_match = all_macros[-1]
             
             if macro_match:
-                insert_position = macro_match.end()
+                insert_position = macro_match.end
                 new_body = current_body[:insert_position] + image_html + current_body[insert_position:]
             else:
                 new_body = current_body + image_html
@@ -462,17 +328,17 @@ class GliffyProcessor:
                 'version': {'number': version_number}
             }
             
-            update_response = self.session.put(url, json=update_data, params=params)
+            update_response = self.http.put(url, json=update_data, params=params)
             if update_response.status_code == 200:
                 return (True, new_body)
             elif update_response.status_code == 409 and is_draft:
                 try:
-                    current_response = self.session.get(url, params=params)
+                    current_response = self.http.get(url, params=params)
                     if current_response.status_code == 200:
                         current_data = current_response.json()
                         current_version = current_data.get('version', {}).get('number', version_num)
                         update_data['version'] = {'number': current_version}
-                        retry_response = self.session.put(url, json=update_data, params=params)
+                        retry_response = self.http.put(url, json=update_data, params=params)
                         if retry_response.status_code == 200:
                             return (True, new_body)
                 except:
@@ -517,15 +383,9 @@ class GliffyProcessor:
                 continue
             
             result = None
-            container_id = None
+            container_id = gliffy_att.get('containerId')
             
             if attachment_id:
-                macro_html = gliffy_att.get('macroHtml', '')
-                if macro_html:
-                    container_match = re.search(r'<ac:parameter[^>]*ac:name=["\']containerId["\'][^>]*>([^<]+)</ac:parameter>', macro_html, re.IGNORECASE)
-                    if container_match:
-                        container_id = container_match.group(1).strip()
-                
                 if container_id and container_id != page_id:
                     image_content, mime_type, download_error = self.download_attachment_direct(container_id, attachment_id, False)
                     if not image_content:
@@ -564,10 +424,10 @@ class GliffyProcessor:
                 if current_page_body is None:
                     try:
                         url = f"{self.api_base}/content/{page_id}"
-                        params = {'expand': 'body.storage'}
+                        params = {'expand': expand_fields('gliffy-detect')}
                         if is_draft:
                             params['status'] = 'draft'
-                        response = self.session.get(url, params=params)
+                        response = self.http.get(url, params=params)
                         if response.status_code == 200:
                             page_data = response.json()
                             current_page_body = page_data.get('body', {}).get('storage', {}).get('value', '')
@@ -669,15 +529,21 @@ class GliffyProcessor:
             
             print(f"\n📁 Espace: {space_name} ({space_key})")
             
-            pages = self.get_all_pages(space_key, include_drafts=True)
-            print(f"     {len(pages)} page(s) trouvée(s)")
+            # Pages traitées au fil de la pagination (mémoire constante)
+            if self.discovery == 'cql':
+                pages = self.iter_gliffy_candidates(space_key, expand=self.PAGE_EXPAND)
+            else:
+                pages = self.iter_pages(space_key, include_drafts=True)
             
+            pages_count = 0
             for page in pages:
+                pages_count += 1
                 try:
                     self.process_page(page, space_name)
                 except Exception as e:
                     print(f"     ⚠️ Erreur lors du traitement: {e}")
                     self.stats['errors'] += 1
+            print(f"     {pages_count} page(s) analysée(s)")
         
         print("=" * 60)
         print("📊 Statistiques finales:")
@@ -689,16 +555,30 @@ class GliffyProcessor:
         print(f"  • Fichiers Excalidraw sauvegardés: {self.stats['excalidraw_saved']}")
         print(f"  • Erreurs: {self.stats['errors']}")
         print(f"  • Fichiers Excalidraw dans: {self.excalidraw_output_dir.absolute()}")
+        self.http.print_stats()
+        if self.attachment_cache is not None:
+            self.attachment_cache.print_stats()
+        if self.stats['excalidraw_saved']:
+            # Import local, comme celui du convertisseur
+            from gliffy_text import print_text_style_cache_stats
+            print_text_style_cache_stats()
         print("=" * 60)
 
 
 def main():
     parser = argparse.ArgumentParser(description='Traite tous les Gliffy depuis Confluence en un seul script')
     parser.add_argument('--url', required=True, help='URL de base de Confluence')
-    parser.add_argument('--username', required=True, help='Nom d\'utilisateur ou email')
+    parser.add_argument('--username', help='Nom d\'utilisateur ou email (à omettre avec un PAT Data Center : authentification Bearer)')
     parser.add_argument('--token', required=True, help='Token API Confluence')
     parser.add_argument('--excalidraw-output', default='output', help='Dossier de sortie pour Excalidraw (défaut: output)')
     parser.add_argument('--spaces', nargs='+', help='Espaces spécifiques à traiter (optionnel, tous par défaut)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help=f'Dossier du cache des pièces jointes (défaut: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_MAX_BYTES // (1024 * 1024), help='Taille maximale du cache en MB (défaut: %(default)s)')
+    parser.add_argument('--no-cache', action='store_true', help='Désactiver le cache des pièces jointes')
+    parser.add_argument('--discovery', choices=DISCOVERY_MODES, default='cql', help='Pages analysées : recherche CQL des pages Gliffy (cql) ou toutes les pages (scan) (défaut: %(default)s)')
+    parser.add_argument('--workers', type=int, default=1, help='Nombre de requêtes parallèles pour la pagination (défaut: %(default)s)')
+    parser.add_argument('--max-retries', type=int, default=5, help='Nombre maximal de réessais par requête HTTP (défaut: %(default)s)')
+    parser.add_argument('--rate-limit', type=float, default=50.0, help='Débit maximal en requêtes par seconde (défaut: %(default)s)')
     
     args = parser.parse_args()
     
@@ -707,7 +587,13 @@ def main():
         username=args.username,
         api_token=args.token,
         excalidraw_output_dir=args.excalidraw_output,
-        spaces=args.spaces
+        spaces=args.spaces,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        cache_max_bytes=args.cache_size * 1024 * 1024,
+        discovery=args.discovery,
+        workers=args.workers,
+        max_retries=args.max_retries,
+        rate_limit=args.rate_limit
     )
     
     processor.run()
@@ -19,7 +19,8 @@ Auteur: Sanae Basraoui
 import os
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Any
+from itertools import chain, groupby
+from typing import List, Dict, Any, Iterable, Optional
 
 
 REPORTS_DIR = Path("reports")
@@ -120,6 +121,17 @@ def export_migration_report_txt(report_data: Dict, output_file: str = "migration
             f.write(f"Images insérées: {stats.get('images_inserted', 0)}\n")
             f.write(f"Erreurs: {stats.get('errors', 0)}\n\n")
             
+            http_stats = report_data.get('http_stats')
+            if http_stats:
+                f.write("STATISTIQUES HTTP\n")
+                f.write("-" * 80 + "\n")
+                f.write(f"Requêtes envoyées: {http_stats.get('requests', 0)}\n")
+                f.write(f"Réessais: {http_stats.get('retries', 0)}\n")
+                f.write(f"Réponses 429/503: {http_stats.get('throttled', 0)}\n")
+                f.write(f"Erreurs réseau: {http_stats.get('network_errors', 0)}\n")
+                f.write(f"Attente backoff: {http_stats.get('backoff_wait_seconds', 0)}s\n")
+                f.write(f"Attente limiteur de débit: {http_stats.get('rate_limit_wait_seconds', 0)}s\n\n")
+            
             f.write("=" * 80 + "\n")
             f.write("DÉTAILS PAR PAGE\n")
             f.write("=" * 80 + "\n\n")
@@ -202,9 +214,32 @@ def export_tids_mapping_txt(tid_mapping: Dict, output_file: str = "tids_mapping.
         print(f"⚠️ Impossible de sauvegarder le rapport {output_path.name}: {e}")
 
 
-def export_inventory_txt(inventory: List[Dict], output_file: str = "confluence_inventory.txt"):
-    """Exporte l'inventaire Confluence en format texte lisible."""
-    if not inventory:
+def export_inventory_txt(
+    inventory: Iterable[Dict],
+    output_file: str = "confluence_inventory.txt",
+    space_counts: Optional[Dict[str, int]] = None,
+):
+    """
+    Exporte l'inventaire Confluence en format texte lisible.
+    
+    Args:
+        inventory: Pages de l'inventaire. Si space_counts est fourni, les pages
+                  doivent être triées par clé d'espace et sont écrites au fil de
+                  l'eau (export en streaming depuis la base d'inventaire).
+        output_file: Nom du fichier de sortie (horodaté dans reports/)
+        space_counts: Nombre de pages par clé d'espace (optionnel)
+    """
+    if space_counts is None:
+        inventory = list(inventory)
+        if not inventory:
+            return
+        # Grouper par espace (tri stable : l'ordre des pages est conservé)
+        inventory.sort(key=lambda page: page.get('space_key', 'unknown'))
+        space_counts = {}
+        for page in inventory:
+            space_key = page.get('space_key', 'unknown')
+            space_counts[space_key] = space_counts.get(space_key, 0) + 1
+    elif not space_counts:
         return
     
     reports_dir = ensure_reports_dir()
@@ -212,31 +247,24 @@ def export_inventory_txt(inventory: List[Dict], output_file: str = "confluence_i
     timestamped_filename = add_timestamp_to_filename(output_file)
     output_path = reports_dir / timestamped_filename
     
-    # Grouper par espace
-    pages_by_space = {}
-    for page in inventory:
-        space_key = page.get('space_key', 'unknown')
-        if space_key not in pages_by_space:
-            pages_by_space[space_key] = []
-        pages_by_space[space_key].append(page)
-    
     try:
         with open(output_path, 'w', encoding='utf-8') as f:
             f.write("=" * 80 + "\n")
             f.write("INVENTAIRE CONFLUENCE\n")
             f.write("=" * 80 + "\n\n")
             f.write(f"Date de génération: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"Nombre total de pages: {len(inventory)}\n")
-            f.write(f"Nombre d'espaces: {len(pages_by_space)}\n\n")
+            f.write(f"Nombre total de pages: {sum(space_counts.values())}\n")
+            f.write(f"Nombre d'espaces: {len(space_counts)}\n\n")
             f.write("=" * 80 + "\n\n")
             
-            for space_key, pages in sorted(pages_by_space.items()):
-                space_name = pages[0].get('space_name', space_key) if pages else space_key
+            for space_key, pages in groupby(inventory, key=lambda page: page.get('space_key', 'unknown')):
+                first_page = next(pages)
+                space_name = first_page.get('space_name', space_key)
                 f.write(f"ESPACE: {space_name} ({space_key})\n")
                 f.write("-" * 80 + "\n")
-                f.write(f"Nombre de pages: {len(pages)}\n\n")
+                f.write(f"Nombre de pages: {space_counts.get(space_key, 0)}\n\n")
                 
-                for page in pages:
+                for page in chain([first_page], pages):
                     f.write(f"  • {page.get('title', 'Sans titre')}\n")
                     f.write(f"    ID: {page.get('id', 'N/A')}\n")
                     f.write(f"    Statut: {page.get('status', 'N/A')}\n")
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Analyse des macros du format storage de Confluence (body.storage).
+
+Le contenu d'une page est parcouru une seule fois par un tokenizer linéaire
+qui ne s'arrête que sur les balises <ac:structured-macro> et <ac:parameter>
+(recherchées avec str.find, le reste du texte n'est pas examiné).
+Chaque macro est retournée avec son nom, ses paramètres et sa position dans
+le contenu, ce qui évite de rechercher à nouveau la macro puis chacun de ses
+paramètres avec une expression régulière dédiée.
+
+Fonctionnalités :
+- Tokenizer en une passe (macros imbriquées, macros auto-fermantes)
+- Sections CDATA et commentaires HTML ignorés (exemples de code, marqueurs)
+- Paramètres texte indexés par nom (insensible à la casse)
+- Positions de début et de fin de chaque macro dans le contenu
+- Résolution des IDs d'attachments d'une macro Gliffy (Cloud et Data Center)
+- Index des macros d'une page (par texte, macroId, diagramAttachmentId,
+  imageAttachmentId) dont les positions suivent les insertions
+
+Auteur: Sanae Basraoui
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+# Nom de la macro Gliffy dans le format storage
+GLIFFY_MACRO_NAME = 'gliffy'
+
+# Éléments du namespace ac: interprétés par le tokenizer (les autres sont ignorés)
+TAG_ELEMENTS = ('structured-macro', 'parameter')
+
+NAME_PATTERN = re.compile(r'ac:name\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+ATTRIBUTE_PATTERN = re.compile(r'([\w:.-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+
+class StorageMacro:
+    """Macro du format storage : nom, paramètres et position dans le contenu."""
+
+    __slots__ = ('name', 'start', 'end', 'tag', 'parameters', 'source', '_attributes')
+
+    def __init__(self, name: str, start: int, end: int, tag: str,
+                 parameters: Dict[str, str], source: str):
+        """
+        Args:
+            name: Nom de la macro (attribut ac:name, en minuscules)
+            start: Position de la balise ouvrante dans le contenu
+            end: Position qui suit la balise fermante
+            tag: Attributs bruts de la balise ouvrante
+            parameters: Paramètres texte, indexés par nom en minuscules
+            source: Contenu analysé
+        """
+        self.name = name
+        self.start = start
+        self.end = end
+        self.tag = tag
+        self.parameters = parameters
+        self.source = source
+        self._attributes = None
+
+    @property
+    def attributes(self) -> Dict[str, str]:
+        """Attributs de la balise ouvrante (ac:name, ac:macro-id, ...), analysés à la demande."""
+        if self._attributes is None:
+            self._attributes = _parse_attributes(self.tag)
+        return self._attributes
+
+    @property
+    def html(self) -> str:
+        """Texte complet de la macro (balises ouvrante et fermante incluses)."""
+        return self.source[self.start:self.end]
+
+    def get(self, parameter: str, default: Optional[str] = None) -> Optional[str]:
+        """Retourne la valeur (sans espaces autour) d'un paramètre, ou default s'il est absent."""
+        return self.parameters.get(parameter.lower(), default)
+
+    def __repr__(self) -> str:
+        return f"StorageMacro({self.name!r}, {self.start}, {self.end})"
+
+
+def _parse_attributes(tag_content: str) -> Dict[str, str]:
+    attributes = {}
+    for match in ATTRIBUTE_PATTERN.finditer(tag_content):
+        value = match.group(2) if match.group(2) is not None else match.group(3)
+        attributes[match.group(1).lower()] = value
+    return attributes
+
+
+def _tag_name(tag_content: str) -> str:
+    """Valeur de l'attribut ac:name d'une balise (en minuscules)."""
+    match = NAME_PATTERN.search(tag_content)
+    if not match:
+        return ''
+    return (match.group(1) if match.group(1) is not None else match.group(2)).lower()
+
+
+def _iter_tags(body_storage: str) -> Iterator[Tuple[bool, str, str, int, int]]:
+    """
+    Parcourt les balises ac:structured-macro et ac:parameter d'un contenu.
+
+    Seules les positions de '<ac:', '</ac:' et '<!' sont recherchées (str.find) :
+    le texte et les balises HTML ne sont jamais examinés caractère par caractère.
+    CDATA et commentaires sont sautés pour que les balises qu'ils contiennent
+    (exemples de code, marqueurs de traitement) ne soient pas prises pour des macros.
+
+    Yields:
+        Tuple (fermante, élément, contenu de la balise, début, fin)
+    """
+    length = len(body_storage)
+    find = body_storage.find
+    position = 0
+    next_open = find('<ac:')
+    next_close = find('</ac:')
+    next_special = find('<!')
+
+    while True:
+        if next_open != -1 and next_open < position:
+            next_open = find('<ac:', position)
+        if next_close != -1 and next_close < position:
+            next_close = find('</ac:', position)
+        if next_special != -1 and next_special < position:
+            next_special = find('<!', position)
+
+        start = -1
+        for candidate in (next_open, next_close, next_special):
+            if candidate != -1 and (start == -1 or candidate < start):
+                start = candidate
+        if start == -1:
+            return
+
+        if start == next_special:
+            if body_storage.startswith('<!--', start):
+                end = find('-->', start + 4)
+                position = length if end == -1 else end + 3
+            elif body_storage.startswith('<![CDATA[', start):
+                end = find(']]>', start + 9)
+                position = length if end == -1 else end + 3
+            else:
+                position = start + 2
+            continue
+
+        closing = start == next_close
+        name_start = start + (5 if closing else 4)
+        end = find('>', name_start)
+        if end == -1:
+            return
+        position = end + 1
+
+        for element in TAG_ELEMENTS:
+            name_end = name_start + len(element)
+            # '<ac:parameter' ne doit pas correspondre à '<ac:parameters' par exemple
+            if body_storage.startswith(element, name_start) and (name_end == end or body_storage[name_end] in ' \t\r\n/'):
+                yield (closing, element, body_storage[name_end:end], start, position)
+                break
+
+
+def parse_macros(body_storage: str, name: Optional[str] = None) -> List[StorageMacro]:
+    """
+    Extrait les macros d'un contenu storage en une seule passe.
+
+    Une macro non fermée (contenu tronqué) est ignorée. Un paramètre dont la
+    valeur contient du balisage (<ri:page/>, ...) n'est pas retenu. Pour un
+    même nom, seul le premier paramètre est conservé.
+
+    Args:
+        body_storage: Contenu au format storage
+        name: Nom de macro à retenir (None = toutes les macros)
+
+    Returns:
+        List[StorageMacro]: Macros dans l'ordre de leur position dans le contenu
+    """
+    if not body_storage:
+        return []
+
+    wanted = name.lower() if name else None
+    if wanted is not None and wanted not in body_storage.lower():
+        # Aucune macro de ce nom possible : inutile de parcourir les balises
+        return []
+
+    macros = []
+    # Pile des macros ouvertes : [nom, début, balise ouvrante, paramètres]
+    stack = []
+    # Paramètre ouvert : (nom, position de début de la valeur)
+    open_parameter = None
+
+    for closing, element, tag_content, start, end in _iter_tags(body_storage):
+        self_closing = tag_content.endswith('/')
+
+        if element == 'parameter':
+            if not closing:
+                if stack and not self_closing:
+                    parameter_name = _tag_name(tag_content)
+                    open_parameter = (parameter_name, end)
+            elif open_parameter is not None:
+                parameter_name, value_start = open_parameter
+                open_parameter = None
+                value = body_storage[value_start:start]
+                if value and '<' not in value:
+                    stack[-1][3].setdefault(parameter_name, value.strip())
+            continue
+
+        open_parameter = None
+        if not closing:
+            macro_name = _tag_name(tag_content)
+            if self_closing:
+                if wanted is None or macro_name == wanted:
+                    macros.append(StorageMacro(macro_name, start, end, tag_content, {}, body_storage))
+            else:
+                stack.append([macro_name, start, tag_content, {}])
+        elif stack:
+            macro_name, macro_start, tag_content, parameters = stack.pop()
+            if wanted is None or macro_name == wanted:
+                macros.append(StorageMacro(macro_name, macro_start, end, tag_content, parameters, body_storage))
+
+    # Les macros imbriquées se ferment avant leur parent
+    if wanted is None:
+        macros.sort(key=lambda macro: macro.start)
+    return macros
+
+
+@lru_cache(maxsize=16)
+def _parse_gliffy_macros(body_storage: str) -> Tuple[StorageMacro, ...]:
+    return tuple(parse_macros(body_storage, GLIFFY_MACRO_NAME))
+
+
+def find_gliffy_macros(body_storage: str) -> List[StorageMacro]:
+    """
+    Extrait les macros Gliffy d'un contenu storage.
+
+    Le résultat est mémorisé pour les derniers contenus analysés : les
+    vérifications successives sur un même body (idempotence, insertion)
+    ne le ré-analysent pas.
+    """
+    return list(_parse_gliffy_macros(body_storage))
+
+
+def gliffy_attachment_info(macro: StorageMacro) -> Dict:
+    """
+    Résout les identifiants d'une macro Gliffy.
+
+    Sur Cloud, l'image est référencée par imageAttachmentId ; sur Data Center,
+    ce paramètre est souvent absent ou vaut 'test' (placeholder) et l'image est
+    retrouvée par les paramètres id, name ou filename.
+
+    Returns:
+        Dict: attachmentId, diagramAttachmentId, macroId, diagramName,
+              containerId et macroHtml
+    """
+    att_id = macro.get('imageAttachmentId')
+    diagram_att_id = macro.get('diagramAttachmentId')
+    id_param = macro.get('id')
+    name_param = macro.get('name')
+    filename_param = macro.get('filename')
+
+    # Si on n'a pas d'ID d'attachement ou si c'est 'test' (placeholder DC), on essaie les autres paramètres
+    if not att_id or att_id == 'test':
+        if id_param is not None and id_param != 'test':
+            att_id = id_param
+        elif name_param is not None:
+            att_id = name_param
+        elif filename_param is not None:
+            att_id = filename_param
+        elif id_param is not None:  # Fallback sur 'test' si vraiment rien d'autre
+            att_id = id_param
+
+    return {
+        'attachmentId': att_id,
+        'diagramAttachmentId': diagram_att_id or att_id,
+        'macroId': macro.get('macroId'),
+        'diagramName': name_param,
+        'containerId': macro.get('containerId'),
+        'macroHtml': macro.html
+    }
+
+
+class MacroIndex:
+    """
+    Index des macros d'un contenu storage, construit en une seule analyse.
+
+    Les macros sont retrouvées en temps constant par leur texte exact ou par
+    leurs paramètres macroId, diagramAttachmentId et imageAttachmentId.
+
+    Le contenu est conservé sous forme de segments : le texte avant la
+    première macro, chaque macro, puis le texte qui suit chaque macro jusqu'à
+    la suivante. Une insertion ou une suppression après une macro ne recopie
+    que ce segment et décale les positions des macros suivantes ; le contenu
+    complet n'est reconstitué qu'une fois, à la lecture de body.
+    """
+
+    # Paramètres indexés (une macro est retrouvée par la première occurrence de la valeur)
+    KEYS = ('macroId', 'diagramAttachmentId', 'imageAttachmentId')
+
+    def __init__(self, body_storage: str, name: str = GLIFFY_MACRO_NAME):
+        """
+        Args:
+            body_storage: Contenu au format storage
+            name: Nom des macros indexées
+        """
+        body_storage = body_storage or ''
+        self.name = name
+        self.macros = find_gliffy_macros(body_storage) if name == GLIFFY_MACRO_NAME else parse_macros(body_storage, name)
+        self.starts = [macro.start for macro in self.macros]
+        self.ends = [macro.end for macro in self.macros]
+
+        # gaps[0] précède la première macro, gaps[i + 1] suit la macro i
+        self._gaps = []
+        previous_end = 0
+        for macro in self.macros:
+            self._gaps.append(body_storage[previous_end:macro.start])
+            previous_end = macro.end
+        self._gaps.append(body_storage[previous_end:])
+        self._body = body_storage
+
+        self._by_html = {}
+        self._by_parameter = {key: {} for key in self.KEYS}
+        for position, macro in enumerate(self.macros):
+            self._by_html.setdefault(macro.html, position)
+            for key, values in self._by_parameter.items():
+                value = macro.get(key)
+                if value:
+                    values.setdefault(value, position)
+
+    def __len__(self) -> int:
+        return len(self.macros)
+
+    @property
+    def body(self) -> str:
+        """Contenu complet, modifications comprises."""
+        if self._body is None:
+            parts = [self._gaps[0]]
+            for macro, gap in zip(self.macros, self._gaps[1:]):
+                parts.append(macro.html)
+                parts.append(gap)
+            self._body = ''.join(parts)
+        return self._body
+
+    def span(self, position: int) -> Tuple[int, int]:
+        """Positions actuelles (début, fin) de la macro n° position dans le contenu."""
+        return (self.starts[position], self.ends[position])
+
+    def has_next(self, position: int) -> bool:
+        """Indique si une autre macro suit la macro n° position."""
+        return position + 1 < len(self.macros)
+
+    def text_after(self, position: int) -> str:
+        """Texte qui suit la macro n° position, jusqu'à la macro suivante (ou la fin du contenu)."""
+        return self._gaps[position + 1]
+
+    def find_by(self, key: str, value: Optional[str]) -> Optional[int]:
+        """Numéro de la première macro dont le paramètre key vaut value."""
+        if not value:
+            return None
+        return self._by_parameter[key].get(value)
+
+    def find_exact(self, macro_html: str) -> Optional[int]:
+        """Numéro de la première macro dont le texte est exactement macro_html."""
+        return self._by_html.get(macro_html)
+
+    def find(self, macro_html: str) -> Optional[int]:
+        """
+        Retrouve une macro à partir de son texte (tel qu'extrait d'une version de la page).
+
+        Stratégies, dans l'ordre : texte identique, même macroId, même
+        diagramAttachmentId ou imageAttachmentId, sinon la première macro.
+
+        Returns:
+            Optional[int]: Numéro de la macro, None si le contenu n'en contient aucune
+        """
+        if not macro_html or not self.macros:
+            return None
+
+        position = self.find_exact(macro_html)
+        if position is not None:
+            return position
+
+        searched = parse_macros(macro_html, self.name)
+        if searched:
+            position = self.find_by('macroId', searched[0].get('macroId'))
+            if position is not None:
+                return position
+
+            candidates = [
+                candidate for candidate in (
+                    self.find_by('diagramAttachmentId', searched[0].get('diagramAttachmentId')),
+                    self.find_by('imageAttachmentId', searched[0].get('imageAttachmentId'))
+                ) if candidate is not None
+            ]
+            if candidates:
+                return min(candidates)
+
+        # On suppose qu'on traite dans l'ordre
+        return 0
+
+    def replace_after(self, position: int, start: int, end: int, text: str):
+        """
+        Remplace text_after(position)[start:end] par text.
+
+        Args:
+            position: Numéro de la macro (-1 = texte avant la première macro)
+            start, end: Positions relatives au début du texte qui suit la macro
+            text: Texte de remplacement
+        """
+        gap = self._gaps[position + 1]
+        self._gaps[position + 1] = gap[:start] + text + gap[end:]
+        self._body = None
+        delta = len(text) - (end - start)
+        for following in range(position + 1, len(self.starts)):
+            self.starts[following] += delta
+            self.ends[following] += delta
+
+    def insert_after(self, position: int, text: str):
+        """Insère text juste après la macro n° position (-1 = au début du contenu)."""
+        self.replace_after(position, 0, 0, text)
+
+    def append(self, text: str):
+        """Ajoute text à la fin du contenu."""
+        last = len(self.macros) - 1
+        self.replace_after(last, len(self._gaps[-1]), len(self._gaps[-1]), text)
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Test de non-régression du tokenizer des macros storage (storage_macros.py).
+
+Les macros Gliffy trouvées par find_gliffy_macros sont comparées à celles
+d'une analyse de référence avec BeautifulSoup (arbre complet du document)
+sur des contenus storage représentatifs, puis sur des combinaisons
+aléatoires (graine fixe) de ces fragments.
+
+Fonctionnalités :
+- Cas couverts : Cloud et Data Center, sections CDATA et commentaires,
+  macros imbriquées, paramètres et macros auto-fermants, paramètres balisés,
+  noms en majuscules, guillemets simples, paramètres en double
+- Comparaison des positions (début, fin) et des paramètres de chaque macro
+- Positions de MacroIndex vérifiées après plusieurs replace_after,
+  insert_after et append (comparées à une nouvelle analyse du contenu)
+
+Usage : python test_storage_macros.py (ou pytest test_storage_macros.py)
+
+Les valeurs de paramètres ne contiennent pas d'entités : le tokenizer
+conserve le texte brut, BeautifulSoup le décode.
+
+Auteur: Sanae Basraoui
+"""
+
+import random
+import re
+from typing import Dict, List, Tuple
+
+from bs4 import BeautifulSoup, NavigableString
+
+from storage_macros import GLIFFY_MACRO_NAME, MacroIndex, find_gliffy_macros
+
+
+MACRO_TAG = 'ac:structured-macro'
+PARAMETER_TAG = 'ac:parameter'
+
+# Fragments de contenu storage, combinés par les tests aléatoires
+FRAGMENTS = {
+    'cloud': (
+        '<ac:structured-macro ac:name="gliffy" ac:schema-version="1" ac:macro-id="m-cloud">'
+        '<ac:parameter ac:name="macroId">11111111-aaaa</ac:parameter>'
+        '<ac:parameter ac:name="displayName">Architecture</ac:parameter>'
+        '<ac:parameter ac:name="name">Architecture</ac:parameter>'
+        '<ac:parameter ac:name="diagramAttachmentId">1001</ac:parameter>'
+        '<ac:parameter ac:name="imageAttachmentId">1002</ac:parameter>'
+        '<ac:parameter ac:name="containerId">42</ac:parameter>'
+        '</ac:structured-macro>'
+    ),
+    'data_center': (
+        '<ac:structured-macro ac:name="gliffy" ac:schema-version="1">\n'
+        '  <ac:parameter ac:name="name">  Flux réseau  </ac:parameter>\n'
+        '  <ac:parameter ac:name="filename">flux.gliffy</ac:parameter>\n'
+        '  <ac:parameter ac:name="id">test</ac:parameter>\n'
+        '</ac:structured-macro>'
+    ),
+    'cdata_code': (
+        '<ac:structured-macro ac:name="code"><ac:parameter ac:name="language">xml</ac:parameter>'
+        '<ac:plain-text-body><![CDATA[<ac:structured-macro ac:name="gliffy">'
+        '<ac:parameter ac:name="name">exemple</ac:parameter></ac:structured-macro>]]>'
+        '</ac:plain-text-body></ac:structured-macro>'
+    ),
+    'comment': (
+        '<!-- <ac:structured-macro ac:name="gliffy"><ac:parameter ac:name="name">ancien</ac:parameter>'
+        '</ac:structured-macro> -->'
+    ),
+    'nested_expand': (
+        '<ac:structured-macro ac:name="expand"><ac:parameter ac:name="title">Schéma</ac:parameter>'
+        '<ac:rich-text-body><p>Avant</p>'
+        '<ac:structured-macro ac:name="gliffy"><ac:parameter ac:name="name">Imbriqué</ac:parameter>'
+        '<ac:parameter ac:name="macroId">22222222-bbbb</ac:parameter></ac:structured-macro>'
+        '<p>Après</p></ac:rich-text-body></ac:structured-macro>'
+    ),
+    'nested_layout': (
+        '<ac:layout><ac:layout-section ac:type="two_equal"><ac:layout-cell>'
+        '<ac:structured-macro ac:name="panel"><ac:rich-text-body>'
+        '<ac:structured-macro ac:name="gliffy"><ac:parameter ac:name="name">Cellule</ac:parameter>'
+        '</ac:structured-macro></ac:rich-text-body></ac:structured-macro>'
+        '</ac:layout-cell><ac:layout-cell><p>Texte</p></ac:layout-cell></ac:layout-section></ac:layout>'
+    ),
+    'self_closing_parameter': (
+        '<ac:structured-macro ac:name="gliffy"><ac:parameter ac:name="pageId" />'
+        '<ac:parameter ac:name="name">Auto-fermant</ac:parameter>'
+        '<ac:parameter ac:name="lbox"/></ac:structured-macro>'
+    ),
+    'self_closing_macro': '<ac:structured-macro ac:name="gliffy" ac:macro-id="vide" />',
+    'markup_parameter': (
+        '<ac:structured-macro ac:name="gliffy"><ac:parameter ac:name="page">'
+        '<ac:link><ri:page ri:content-title="Accueil" /></ac:link></ac:parameter>'
+        '<ac:parameter ac:name="name">Lien</ac:parameter></ac:structured-macro>'
+    ),
+    'case_and_quotes': (
+        "<ac:structured-macro ac:name='Gliffy'><ac:parameter ac:name='Name'>Majuscules</ac:parameter>"
+        "<ac:parameter ac:name='MACROID'>33333333-cccc</ac:parameter></ac:structured-macro>"
+    ),
+    'duplicate_parameter': (
+        '<ac:structured-macro ac:name="gliffy"><ac:parameter ac:name="name">Premier</ac:parameter>'
+        '<ac:parameter ac:name="name">Second</ac:parameter><ac:parameter ac:name="empty">   </ac:parameter>'
+        '</ac:structured-macro>'
+    ),
+    'parameters_lookalike': (
+        '<ac:structured-macro ac:name="gliffy"><ac:parameters>ignoré</ac:parameters>'
+        '<ac:parameter ac:name="name">Voisin</ac:parameter></ac:structured-macro>'
+    ),
+    'migrated_image': (
+        '<p><ac:image ac:width="800"><ri:attachment ri:filename="Architecture.png" /></ac:image></p>'
+        '<p><em>[GLIFFY_TREATED] [ID:1002] 2024-01-01</em></p>'
+    ),
+    'other_macro': (
+        '<ac:structured-macro ac:name="info"><ac:parameter ac:name="title">Note</ac:parameter>'
+        '<ac:rich-text-body><p>gliffy est cité ici</p></ac:rich-text-body></ac:structured-macro>'
+    ),
+    'text': '<h1>Titre</h1>\n<p>Paragraphe <strong>gras</strong> &amp; texte.</p>\n',
+}
+
+
+def _line_offsets(body: str) -> List[int]:
+    """Position du début de chaque ligne (sourceline commence à 1)."""
+    offsets = [0]
+    for match in re.finditer('\n', body):
+        offsets.append(match.end())
+    return offsets
+
+
+def _reference_parameters(macro) -> Dict[str, str]:
+    """Paramètres texte d'une macro (sans ceux des macros imbriquées), comme le tokenizer."""
+    parameters = {}
+    for parameter in macro.find_all(PARAMETER_TAG):
+        if parameter.find_parent(MACRO_TAG) is not macro:
+            continue
+        # Valeur retenue seulement si elle est du texte simple (ni balise, ni CDATA, ni commentaire)
+        if not parameter.contents or any(type(child) is not NavigableString for child in parameter.contents):
+            continue
+        name = parameter.get('ac:name', '').lower()
+        parameters.setdefault(name, ''.join(parameter.contents).strip())
+    return parameters
+
+
+def reference_gliffy_macros(body: str) -> List[Tuple[int, Dict[str, str]]]:
+    """Macros Gliffy (position de début, paramètres) selon BeautifulSoup, dans l'ordre du document."""
+    offsets = _line_offsets(body)
+    soup = BeautifulSoup(body, 'html.parser')
+    macros = []
+    for macro in soup.find_all(MACRO_TAG):
+        if macro.get('ac:name', '').lower() != GLIFFY_MACRO_NAME:
+            continue
+        start = offsets[macro.sourceline - 1] + macro.sourcepos
+        macros.append((start, _reference_parameters(macro)))
+    return macros
+
+
+def check_body(body: str):
+    """Compare find_gliffy_macros à la référence BeautifulSoup sur un contenu."""
+    macros = find_gliffy_macros(body)
+    expected = reference_gliffy_macros(body)
+    assert [(macro.start, macro.parameters) for macro in macros] == expected, body
+
+    for macro in macros:
+        # La fin doit délimiter exactement un élément macro complet
+        soup = BeautifulSoup(macro.html, 'html.parser')
+        assert len(soup.contents) == 1 and soup.contents[0].name == MACRO_TAG, macro.html
+        assert macro.html.endswith('</ac:structured-macro>') or macro.html.endswith('/>'), macro.html
+
+
+def random_body(rng: random.Random) -> str:
+    """Contenu aléatoire composé de fragments représentatifs."""
+    names = list(FRAGMENTS)
+    return '\n'.join(FRAGMENTS[rng.choice(names)] for _ in range(rng.randint(1, 12)))
+
+
+def check_index_offsets(index: MacroIndex):
+    """Vérifie les positions de l'index sur son contenu et contre une nouvelle analyse."""
+    body = index.body
+    fresh = MacroIndex(body)
+    assert len(fresh) == len(index)
+    for position, macro in enumerate(index.macros):
+        start, end = index.span(position)
+        assert body[start:end] == macro.html
+        assert (start, end) == fresh.span(position)
+        assert index.text_after(position) == fresh.text_after(position)
+
+
+def test_representative_fragments():
+    for name, fragment in FRAGMENTS.items():
+        check_body(fragment)
+        check_body(f'<p>avant {name}</p>\n{fragment}\n<p>après</p>')
+
+
+def test_expected_parameters():
+    macros = find_gliffy_macros(FRAGMENTS['data_center'])
+    assert macros[0].get('name') == 'Flux réseau' and macros[0].get('id') == 'test'
+    assert [macro.get('name') for macro in find_gliffy_macros(FRAGMENTS['nested_expand'])] == ['Imbriqué']
+    assert find_gliffy_macros(FRAGMENTS['cdata_code']) == []
+    assert find_gliffy_macros(FRAGMENTS['comment']) == []
+    macro = find_gliffy_macros(FRAGMENTS['markup_parameter'])[0]
+    assert macro.get('page') is None and macro.get('name') == 'Lien'
+    assert find_gliffy_macros(FRAGMENTS['duplicate_parameter'])[0].get('name') == 'Premier'
+    assert find_gliffy_macros(FRAGMENTS['case_and_quotes'])[0].get('macroId') == '33333333-cccc'
+
+
+def test_random_bodies():
+    rng = random.Random(1234)
+    for _ in range(500):
+        check_body(random_body(rng))
+
+
+def test_index_offsets_after_edits():
+    rng = random.Random(99)
+    image_html = FRAGMENTS['migrated_image']
+    for _ in range(200):
+        index = MacroIndex(random_body(rng))
+        check_index_offsets(index)
+        for _ in range(rng.randint(3, 8)):
+            position = rng.randint(-1, len(index) - 1)
+            operation = rng.choice(('insert', 'replace', 'remove', 'append'))
+            if operation == 'insert':
+                index.insert_after(position, image_html)
+            elif operation == 'append':
+                index.append(image_html)
+            elif operation == 'remove':
+                # Comme la migration : retrait d'une image insérée précédemment
+                gap = index.text_after(position)
+                start = gap.find(image_html)
+                if start != -1:
+                    index.replace_after(position, start, start + len(image_html), '')
+            else:
+                # Insertion au milieu du texte, avant une balise (le balisage existant reste intact)
+                gap = index.text_after(position)
+                boundaries = [match.start() for match in re.finditer('<', gap)] + [len(gap)]
+                start = rng.choice(boundaries)
+                index.replace_after(position, start, start, '<p>remplacé</p>')
+            check_index_offsets(index)
+
+
+def main():
+    tests = [test_representative_fragments, test_expected_parameters, test_random_bodies, test_index_offsets_after_edits]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\n✅ {len(tests)} test(s) réussi(s)")
+
+
+if __name__ == '__main__':
+    main()